@@ -0,0 +1,103 @@
+"""Benchmark: BI questions answered live (Django/Mongo per question) vs. from the analytics snapshot.
+
+Runs the same group-by, filtered-page and salary-summary questions through the MCP data-access
+layer with ANALYTICS_MODE off and on, and reports the median latency of each. The snapshot
+column also shows the one-off load time it pays on first use. Without --uri/--url the API runs
+on in-process mongomock, which exaggerates the live cost; treat that mode as a smoke run.
+
+    python benchmarks/bench_analytics.py --url http://localhost:8001/api
+    python benchmarks/bench_analytics.py --uri mongodb://localhost:27017 --docs 200000
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+
+from datasets import CITIES, DEPARTMENTS  # noqa: E402
+from loadtest_django import free_port, start_gunicorn, wait_ready  # noqa: E402
+
+QUESTIONS = {
+    "group avg salary by city": lambda bi: bi.create_plot("employees", "city", "salary", "bar", None, "avg"),
+    "page: dept + salary range": lambda bi: bi._employee_table(
+        {"department": DEPARTMENTS[0], "salary": {"$gte": 40000, "$lt": 90000}}, limit=50),
+    "summary per city": lambda bi: asyncio.gather(*(bi._salary_summary({"city": c}) for c in CITIES)),
+}
+
+
+async def measure(bi, rounds):
+    timings = {}
+    for label, ask in QUESTIONS.items():
+        samples = []
+        for _ in range(rounds):
+            started = time.perf_counter()
+            await ask(bi)
+            samples.append(time.perf_counter() - started)
+        timings[label] = statistics.median(samples) * 1000
+    return timings
+
+
+async def run(args):
+    import bi_universal as bi
+    from analytics import AnalyticsStore
+
+    bi.analytics = None
+    live = await measure(bi, args.rounds)
+
+    bi.analytics = AnalyticsStore(bi.export_documents, collections=["employees"],
+                                  max_staleness=float("inf"))
+    started = time.perf_counter()
+    await bi.analytics.refresh("employees")
+    load = (time.perf_counter() - started) * 1000
+    snapshot = await measure(bi, args.rounds)
+    status = bi.analytics.status()
+    await bi.close_http_client()
+    return live, snapshot, load, status
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", help="Base URL of a running Django API (e.g. http://localhost:8001/api)")
+    parser.add_argument("--uri", help="Start gunicorn against this MongoDB (seeded with --docs employees)")
+    parser.add_argument("--docs", type=int, default=20000)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--workers", type=int, default=2)
+    args = parser.parse_args()
+
+    proc = None
+    if args.url:
+        base = args.url.rstrip("/") + "/"
+    else:
+        if args.uri:
+            from pymongo import MongoClient
+
+            from datasets import seed
+            seed(MongoClient(args.uri)["loadtest"]["employees"], args.docs)
+        port = free_port()
+        gunicorn_args = argparse.Namespace(uri=args.uri, docs=args.docs, cache=False, worker_class="gthread")
+        proc = start_gunicorn(args.workers, port, gunicorn_args)
+        base = f"http://127.0.0.1:{port}/api/"
+    try:
+        asyncio.run(wait_ready(base))
+        os.environ["DJANGO_API_URL"] = base
+        sys.path.insert(0, os.path.join(HERE, "..", "mcp"))
+        live, snapshot, load, status = asyncio.run(run(args))
+    finally:
+        if proc:
+            proc.terminate()
+            proc.wait(timeout=30)
+
+    info = status["snapshots"].get("employees", {})
+    print(f"snapshot: {info.get('rows')} rows, {info.get('memory_mb')} MB, loaded in {load:.0f} ms; "
+          f"{status['hits']} answered from it, {status['fallbacks']} fell back to live")
+    print(f"{'question':<28} {'live ms':>9} {'snapshot ms':>12} {'speed-up':>9}")
+    for label in QUESTIONS:
+        print(f"{label:<28} {live[label]:>9.2f} {snapshot[label]:>12.2f} {live[label] / snapshot[label]:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
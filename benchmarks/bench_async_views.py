@@ -0,0 +1,109 @@
+"""Benchmark: requests in flight per Django process, sync (gthread/WSGI) vs. async views (uvicorn/ASGI).
+
+Starts one gunicorn worker per mode and keeps --slow concurrent slow queries running against
+it (a $where that sleeps --slow-ms on the server). Meanwhile it probes /health/ every 50 ms.
+It reports the slow-query throughput and the django_requests_in_flight_peak gauge from
+/api/metrics/. It also reports health latency while the slow queries are running: with sync
+views the probes queue behind the slow queries, and with async views they are answered
+between them. mongomock has no async client, so this needs a real MongoDB.
+
+    python benchmarks/bench_async_views.py --uri mongodb://localhost:27017
+    python benchmarks/bench_async_views.py --uri mongodb://localhost:27017 --slow 128 --threads 8
+"""
+import argparse
+import asyncio
+import os
+import re
+import sys
+import time
+
+import httpx
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+
+from loadtest_django import free_port, start_gunicorn, wait_ready  # noqa: E402
+
+MODES = {
+    "sync": {"worker_class": "gthread", "app": "loadtest_app:application", "ASYNC_VIEWS": "false"},
+    "async": {"worker_class": "uvicorn.workers.UvicornWorker", "app": "loadtest_app:asgi_application",
+              "ASYNC_VIEWS": "true"},
+}
+
+
+async def drive(base, slow, slow_ms, duration):
+    body = {"collection": "slow", "filter": {"$where": f"sleep({slow_ms}) || true"}, "limit": 1}
+    completed = errors = 0
+    health = []
+    stop = time.monotonic() + duration
+    limits = httpx.Limits(max_connections=slow + 4, max_keepalive_connections=slow + 4)
+
+    async with httpx.AsyncClient(base_url=base, limits=limits, timeout=120) as client:
+        async def slow_user():
+            nonlocal completed, errors
+            while time.monotonic() < stop:
+                try:
+                    r = await client.post("collections/query/", json=body)
+                    completed += r.status_code == 200
+                    errors += r.status_code != 200
+                except httpx.HTTPError:
+                    errors += 1
+
+        async def prober():
+            while time.monotonic() < stop:
+                started = time.perf_counter()
+                try:
+                    await client.get("health/")
+                except httpx.HTTPError:
+                    pass
+                health.append(time.perf_counter() - started)
+                await asyncio.sleep(0.05)
+
+        started = time.perf_counter()
+        await asyncio.gather(prober(), *(slow_user() for _ in range(slow)))
+        elapsed = time.perf_counter() - started
+        metrics = (await client.get("metrics/")).text
+
+    peak = re.search(r"^django_requests_in_flight_peak (\d+)", metrics, re.M)
+    health.sort()
+    pct = lambda p: health[min(len(health) - 1, int(len(health) * p))] * 1000  # noqa: E731
+    return completed / elapsed, int(peak.group(1)) if peak else None, pct(0.5), pct(0.99), errors
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--uri", default="mongodb://localhost:27017", help="MongoDB to run against (database 'loadtest')")
+    parser.add_argument("--slow", type=int, default=64, help="Concurrent slow queries")
+    parser.add_argument("--slow-ms", type=int, default=200, help="Server-side sleep per slow query")
+    parser.add_argument("--threads", type=int, default=4, help="gthread threads per sync worker")
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--modes", nargs="+", default=list(MODES), choices=list(MODES))
+    args = parser.parse_args()
+
+    from pymongo import MongoClient
+
+    slow = MongoClient(args.uri)["loadtest"]["slow"]
+    slow.drop()
+    slow.insert_one({"probe": True})
+
+    print(f"{args.slow} concurrent {args.slow_ms} ms queries, 1 worker, {args.threads} threads (sync)")
+    print(f"{'mode':<6} {'slow req/s':>11} {'in-flight peak':>15} {'health p50 ms':>14} {'health p99 ms':>14} {'errors':>7}")
+    for mode in args.modes:
+        conf = MODES[mode]
+        os.environ.update(ASYNC_VIEWS=conf["ASYNC_VIEWS"], GUNICORN_THREADS=str(args.threads))
+        port = free_port()
+        gunicorn_args = argparse.Namespace(uri=args.uri, docs=0, cache=False,
+                                           worker_class=conf["worker_class"], app=conf["app"])
+        proc = start_gunicorn(1, port, gunicorn_args)
+        base = f"http://127.0.0.1:{port}/api/"
+        try:
+            asyncio.run(wait_ready(base))
+            rps, peak, p50, p99, errors = asyncio.run(drive(base, args.slow, args.slow_ms, args.duration))
+            print(f"{mode:<6} {rps:>11.1f} {peak!s:>15} {p50:>14.1f} {p99:>14.1f} {errors:>7}")
+        finally:
+            proc.terminate()
+            proc.wait(timeout=30)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""Benchmark: loading employees through single-op insert_document vs. the bulk_write tool.
+
+Both paths go through the MCP tools (and so the pooled HTTP client) against a live Django
+API: the single-op path issues one /collections/insert/ request per document with
+--concurrency requests in flight, the bulk path sends --batch ops per /collections/bulk/
+request. Reports documents per second for each.
+
+    python benchmarks/bench_bulk.py --url http://localhost:8001/api --docs 5000
+    python benchmarks/bench_bulk.py --uri mongodb://localhost:27017     # starts gunicorn
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+
+from datasets import employee  # noqa: E402
+from loadtest_django import free_port, start_gunicorn, wait_ready  # noqa: E402
+
+
+async def single_op(bi, collection, docs, concurrency):
+    sem = asyncio.Semaphore(concurrency)
+
+    async def insert(doc):
+        async with sem:
+            return await bi.insert_document(collection, json.dumps(doc))
+
+    results = await asyncio.gather(*(insert(d) for d in docs))
+    return sum("error" in r for r in results)
+
+
+async def bulk(bi, collection, docs, batch, chunk_size):
+    errors = 0
+    for start in range(0, len(docs), batch):
+        ops = [{"op": "insert", "document": d} for d in docs[start:start + batch]]
+        r = await bi.bulk_write(collection, json.dumps(ops), chunk_size=chunk_size, errors_only=True)
+        errors += len(ops) if "error" in r else r["failed"]
+    return errors
+
+
+async def run(args):
+    import bi_universal as bi
+
+    docs = [employee(i) for i in range(args.docs)]
+    rows = []
+    for label, coro in (
+        ("single-op", lambda: single_op(bi, "bench_single", docs, args.concurrency)),
+        ("bulk", lambda: bulk(bi, "bench_bulk", docs, args.batch, args.chunk_size)),
+    ):
+        started = time.perf_counter()
+        errors = await coro()
+        elapsed = time.perf_counter() - started
+        rows.append((label, elapsed, args.docs / elapsed, errors))
+    await bi.close_http_client()
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", help="Base URL of a running Django API (e.g. http://localhost:8001/api)")
+    parser.add_argument("--uri", help="Start gunicorn against this MongoDB instead of --url")
+    parser.add_argument("--docs", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=16, help="In-flight single-op requests")
+    parser.add_argument("--batch", type=int, default=1000, help="Ops per /collections/bulk/ request")
+    parser.add_argument("--chunk-size", type=int, default=1000, help="Ops per server-side bulk_write")
+    parser.add_argument("--workers", type=int, default=2)
+    args = parser.parse_args()
+
+    proc = None
+    if args.url:
+        base = args.url.rstrip("/") + "/"
+    else:
+        port = free_port()
+        gunicorn_args = argparse.Namespace(uri=args.uri, docs=0, cache=True, worker_class="gthread")
+        proc = start_gunicorn(args.workers, port, gunicorn_args)
+        base = f"http://127.0.0.1:{port}/api/"
+    try:
+        asyncio.run(wait_ready(base))
+        os.environ["DJANGO_API_URL"] = base
+        sys.path.insert(0, os.path.join(HERE, "..", "mcp"))
+        rows = asyncio.run(run(args))
+    finally:
+        if proc:
+            proc.terminate()
+            proc.wait(timeout=30)
+
+    print(f"{'path':>10} {'seconds':>9} {'docs/s':>10} {'errors':>7}")
+    for label, elapsed, rate, errors in rows:
+        print(f"{label:>10} {elapsed:>9.2f} {rate:>10.1f} {errors:>7}")
+    print(f"bulk speedup: {rows[1][2] / rows[0][2]:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""Benchmark: a burst of identical read tool calls with request coalescing off vs. on.
+
+Fires --burst concurrent get_collection_info_via_django and query_collection calls (what
+several LibreChat conversations asking the same thing at once look like) through the MCP
+data-access layer. For each mode it reports wall time, the number of requests Django actually
+received and the number of callers that joined an in-flight request.
+
+    python benchmarks/bench_coalescing.py --url http://localhost:8001/api
+    python benchmarks/bench_coalescing.py --uri mongodb://localhost:27017 --docs 200000
+"""
+import argparse
+import asyncio
+import os
+import re
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+
+from loadtest_django import free_port, start_gunicorn, wait_ready  # noqa: E402
+
+CALLS = {
+    "info": lambda bi: bi.get_collection_info_via_django("employees"),
+    "query": lambda bi: bi.query_collection("employees", '{"department": "Engineer"}', limit=50),
+}
+
+
+def upstream_requests(bi):
+    """Django round trips recorded so far, from the MCP http histogram."""
+    return sum(int(n) for n in re.findall(r"^mcp_django_http_seconds_count\{.*\} (\d+)$", bi.render_metrics(), re.M))
+
+
+def coalesced(bi):
+    return sum(int(n) for n in re.findall(r"^mcp_coalesced_requests_total\{.*\} (\d+)$", bi.render_metrics(), re.M))
+
+
+async def run(args):
+    import bi_universal as bi
+
+    rows = []
+    for label, call in CALLS.items():
+        for mode in (False, True):
+            bi.COALESCE_REQUESTS = mode
+            before, joined = upstream_requests(bi), coalesced(bi)
+            started = time.perf_counter()
+            await asyncio.gather(*(call(bi) for _ in range(args.burst)))
+            rows.append((label, "on" if mode else "off", time.perf_counter() - started,
+                         upstream_requests(bi) - before, coalesced(bi) - joined))
+    await bi.close_http_client()
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", help="Base URL of a running Django API (e.g. http://localhost:8001/api)")
+    parser.add_argument("--uri", help="Start gunicorn against this MongoDB (seeded with --docs employees)")
+    parser.add_argument("--docs", type=int, default=20000)
+    parser.add_argument("--burst", type=int, default=32)
+    parser.add_argument("--workers", type=int, default=2)
+    args = parser.parse_args()
+
+    proc = None
+    if args.url:
+        base = args.url.rstrip("/") + "/"
+    else:
+        if args.uri:
+            from pymongo import MongoClient
+
+            from datasets import seed
+            seed(MongoClient(args.uri)["loadtest"]["employees"], args.docs)
+        port = free_port()
+        gunicorn_args = argparse.Namespace(uri=args.uri, docs=args.docs, cache=False, worker_class="gthread")
+        proc = start_gunicorn(args.workers, port, gunicorn_args)
+        base = f"http://127.0.0.1:{port}/api/"
+    try:
+        asyncio.run(wait_ready(base))
+        os.environ["DJANGO_API_URL"] = base
+        os.environ.setdefault("TOOL_CONCURRENCY_DEFAULT", str(args.burst))
+        sys.path.insert(0, os.path.join(HERE, "..", "mcp"))
+        rows = asyncio.run(run(args))
+    finally:
+        if proc:
+            proc.terminate()
+            proc.wait(timeout=30)
+
+    print(f"burst of {args.burst} identical calls")
+    print(f"{'call':<6} {'coalesce':>8} {'wall s':>8} {'upstream':>9} {'joined':>7}")
+    for label, mode, wall, upstream, joined in rows:
+        print(f"{label:<6} {mode:>8} {wall:>8.3f} {upstream:>9} {joined:>7}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""Benchmark: streaming export engine vs. the old materialize-everything export.
+
+Seeds an employees collection (mongomock by default, or a real mongod via --uri),
+then drains each export format and reports rows/s, Python peak allocation during
+the export (tracemalloc) and process peak RSS.
+
+mongomock copies every matching document when a cursor is opened, so its memory
+numbers grow with the collection; use --uri against a local mongod to see the
+flat memory profile of the streaming formats.
+
+    python benchmarks/bench_export.py --sizes 10000 1000000 10000000 --uri mongodb://localhost:27017
+    python benchmarks/bench_export.py --sizes 10000 100000            # mongomock
+"""
+import argparse
+import json
+import os
+import resource
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "django_project"))
+
+from datasets import seed  # noqa: E402
+from mongodb_api.export import stream_export  # noqa: E402
+
+def legacy_export(col, filter_):
+    """The pre-streaming view body: list(find) -> serialize -> DataFrame -> one JSON blob."""
+    import pandas as pd
+
+    docs = list(col.find(filter_))
+    for d in docs:
+        d["_id"] = str(d["_id"])
+    pd.DataFrame(docs)
+    yield json.dumps({"status": "success", "rows": len(docs), "data": docs}).encode()
+
+
+def measure(n, make_stream):
+    tracemalloc.start()
+    start = time.perf_counter()
+    out_bytes = sum(len(part) for part in make_stream())
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return n / elapsed, peak / 2 ** 20, rss_mb, out_bytes / 2 ** 20
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 1000000, 10000000])
+    parser.add_argument("--uri", help="MongoDB URI (default: in-memory mongomock)")
+    parser.add_argument("--formats", nargs="+", default=["legacy", "json", "ndjson", "csv", "parquet"])
+    parser.add_argument("--chunk-size", type=int, default=5000)
+    args = parser.parse_args()
+
+    if args.uri:
+        from pymongo import MongoClient
+        client = MongoClient(args.uri)
+    else:
+        import mongomock
+        client = mongomock.MongoClient()
+    col = client["bench_export"]["employees"]
+
+    print(f"{'rows':>10} {'format':>8} {'rows/s':>10} {'py peak MB':>11} {'max RSS MB':>11} {'out MB':>8}")
+    for n in args.sizes:
+        seed(col, n)
+        for fmt in args.formats:
+            if fmt == "legacy":
+                make = lambda: legacy_export(col, {})  # noqa: E731
+            else:
+                make = lambda: stream_export(col, {}, fmt=fmt, chunk_size=args.chunk_size)  # noqa: E731
+            rate, peak, rss, out = measure(n, make)
+            print(f"{n:>10} {fmt:>8} {rate:>10.0f} {peak:>11.1f} {rss:>11.1f} {out:>8.1f}")
+    col.drop()
+
+
+if __name__ == "__main__":
+    main()
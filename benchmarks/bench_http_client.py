@@ -0,0 +1,133 @@
+"""Benchmark: pooled async call_django_api vs. the old blocking requests path.
+
+Starts a local stub of the Django query endpoint (fixed server-side latency) and
+fires 1, 16 and 128 concurrent tool calls through both transports, reporting
+p50/p99 per-call latency.
+
+    python benchmarks/bench_http_client.py [--delay 0.005] [--rounds 20]
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import statistics
+import sys
+import time
+
+import requests
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "mcp"))
+
+DOCS = [{"_id": str(i), "name": f"emp{i}", "department": "Engineer", "salary": 50000 + i} for i in range(20)]
+BODY = json.dumps({"status": "success", "collection": "employees", "documents": DOCS}).encode()
+
+
+RESPONSE = (
+    b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+    b"Content-Length: " + str(len(BODY)).encode() + b"\r\n\r\n" + BODY
+)
+
+
+async def _handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter, delay: float) -> None:
+    """Minimal keep-alive HTTP/1.1 responder standing in for the Django query view."""
+    try:
+        while True:
+            head = await reader.readuntil(b"\r\n\r\n")
+            length = 0
+            for line in head.split(b"\r\n"):
+                if line.lower().startswith(b"content-length:"):
+                    length = int(line.split(b":", 1)[1])
+            if length:
+                await reader.readexactly(length)
+            await asyncio.sleep(delay)
+            writer.write(RESPONSE)
+            await writer.drain()
+    except (asyncio.IncompleteReadError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+
+def _serve(delay: float, port_queue) -> None:
+    async def run():
+        server = await asyncio.start_server(
+            lambda r, w: _handle(r, w, delay), "127.0.0.1", 0, backlog=1024
+        )
+        port_queue.put(server.sockets[0].getsockname()[1])
+        await server.serve_forever()
+
+    asyncio.run(run())
+
+
+def start_stub(delay: float):
+    """Run the stub in its own process so it does not share the benchmark's GIL."""
+    port_queue = multiprocessing.Queue()
+    proc = multiprocessing.Process(target=_serve, args=(delay, port_queue), daemon=True)
+    proc.start()
+    return proc, port_queue.get(timeout=10)
+
+
+def percentiles(samples):
+    samples = sorted(samples)
+    p50 = statistics.median(samples)
+    p99 = samples[min(len(samples) - 1, int(len(samples) * 0.99))]
+    return p50 * 1000, p99 * 1000
+
+
+async def run_legacy(url: str, concurrency: int, rounds: int):
+    """Old behaviour: a fresh blocking requests.post per call, run on the event loop."""
+    latencies = []
+
+    async def one(start):
+        requests.post(url, json={"collection": "employees"}, timeout=20).json()
+        latencies.append(time.perf_counter() - start)
+
+    for _ in range(rounds):
+        start = time.perf_counter()
+        await asyncio.gather(*(one(start) for _ in range(concurrency)))
+    return latencies
+
+
+async def run_pooled(bi, concurrency: int, rounds: int):
+    latencies = []
+
+    async def one(start):
+        await bi.call_django_api("collections/query/", method="POST", data={"collection": "employees"})
+        latencies.append(time.perf_counter() - start)
+
+    await one(time.perf_counter())  # warm-up: open the pool's first connection
+    latencies.clear()
+    for _ in range(rounds):
+        start = time.perf_counter()
+        await asyncio.gather(*(one(start) for _ in range(concurrency)))
+    await bi.close_http_client()
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--delay", type=float, default=0.005, help="Stub server latency per request (s)")
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 16, 128])
+    args = parser.parse_args()
+
+    proc, port = start_stub(args.delay)
+    base = f"http://127.0.0.1:{port}/api"
+    os.environ["DJANGO_API_URL"] = base
+    os.environ.setdefault("DJANGO_API_MAX_CONNECTIONS", "128")
+    import bi_universal as bi
+
+    print(f"{'concurrency':>11} {'transport':>9} {'p50 ms':>9} {'p99 ms':>9}")
+    for c in args.concurrency:
+        for label, coro in (
+            ("legacy", run_legacy(base + "/collections/query/", c, args.rounds)),
+            ("pooled", run_pooled(bi, c, args.rounds)),
+        ):
+            p50, p99 = percentiles(asyncio.run(coro))
+            print(f"{c:>11} {label:>9} {p50:>9.2f} {p99:>9.2f}")
+    proc.terminate()
+
+
+if __name__ == "__main__":
+    main()
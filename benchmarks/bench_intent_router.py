@@ -0,0 +1,99 @@
+"""Benchmark + golden check for the smart_command intent router.
+
+1. Routes every phrasing in data/intent_corpus.jsonl through bi_universal.router and
+   diffs the intent and slots against the expected parse (exit status 1 on mismatch).
+2. Times routing per command with the real registry, then with 10/100/1000 extra
+   synthetic intents registered, against a sequential scan of one precompiled regex per
+   intent (the shape of the old if/elif chain). Router cost should stay flat.
+
+    python benchmarks/bench_intent_router.py [--rounds 200]
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, "..", "mcp"))
+
+from intents import IntentRouter  # noqa: E402
+import bi_universal as bi  # noqa: E402
+
+CORPUS = os.path.join(HERE, "data", "intent_corpus.jsonl")
+
+
+def load_corpus():
+    with open(CORPUS) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def golden(corpus):
+    failures = 0
+    for case in corpus:
+        route = bi.router.route(case["text"])
+        got = {"intent": route.intent if route else None, "slots": route.slots if route else {}}
+        want = {"intent": case["intent"], "slots": case["slots"]}
+        if got != want:
+            failures += 1
+            print(f"MISMATCH {case['text']!r}\n  want {want}\n  got  {got}")
+    print(f"golden corpus: {len(corpus) - failures}/{len(corpus)} phrasings routed as expected")
+    return failures
+
+
+def router_with(extra):
+    router = IntentRouter()
+    for i in bi.router.intents:
+        router.register(i.name, i.requires, i.any_of, i.excludes, i.priority, i.handler)
+    for n in range(extra):
+        router.add_phrases({f"synthetic{n}": ("verb", f"synthetic{n}")})
+        router.register(f"synthetic_{n}", requires={f"synthetic{n}"}, priority=n % 200)
+    return router
+
+
+def sequential_with(extra):
+    patterns = [re.compile(rf"\bsynthetic{n}\b") for n in range(extra)]
+    patterns += [re.compile(p) for p in (r"\bcollections?\b", r"\blist\b.*\bemployees?\b", r"who (?:owns|has|own) (.+)",
+                                         r"(?:which|who).*\bfrom\b\s+(\w+)", r"\b(show|find|filter)\b",
+                                         r"\b(add|insert|create)\b", r"\b(remove|delete)\b")]
+
+    def route(text):
+        cmd = text.lower()
+        for p in patterns:
+            if p.search(cmd):
+                return p
+        return None
+    return route
+
+
+def per_call_us(fn, texts, rounds):
+    fn(texts[0])
+    started = time.perf_counter()
+    for _ in range(rounds):
+        for t in texts:
+            fn(t)
+    return (time.perf_counter() - started) / (rounds * len(texts)) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rounds", type=int, default=200)
+    args = parser.parse_args()
+
+    corpus = load_corpus()
+    failures = golden(corpus)
+    texts = [c["text"] for c in corpus]
+
+    print(f"{'extra intents':>13} {'router us':>10} {'parse us':>9} {'sequential us':>14}")
+    for extra in (0, 10, 100, 1000):
+        router = router_with(extra)
+        routed = per_call_us(router.route, texts, args.rounds)
+        parsed = per_call_us(router.parse, texts, args.rounds)
+        sequential = per_call_us(sequential_with(extra), texts, args.rounds)
+        print(f"{extra:>13} {routed:>10.2f} {parsed:>9.2f} {sequential:>14.2f}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
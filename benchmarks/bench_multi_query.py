@@ -0,0 +1,98 @@
+"""Benchmark: N dashboard sub-queries as sequential tool calls vs. one multi_query fan-out.
+
+Issues the same per-city aggregation specs through aggregate_collection one after another
+(what an LLM does turn by turn) and through a single multi_query call, and reports wall
+time for each. With a real MongoDB, fan-out wall time should track the slowest query
+rather than the sum. Without --uri/--url the workers use in-process mongomock, which holds
+the GIL while it runs each query, so there is nothing to overlap and the two paths take about
+the same time. Use that mode only as a smoke run.
+
+    python benchmarks/bench_multi_query.py --url http://localhost:8001/api
+    python benchmarks/bench_multi_query.py --uri mongodb://localhost:27017 --docs 200000
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+
+from datasets import CITIES, DEPARTMENTS  # noqa: E402
+from loadtest_django import free_port, start_gunicorn, wait_ready  # noqa: E402
+
+
+def specs():
+    out = []
+    for city in CITIES:
+        for dept in DEPARTMENTS:
+            out.append({"id": f"{city}/{dept}", "collection": "employees", "pipeline": [
+                {"$match": {"city": city, "department": dept}},
+                {"$group": {"_id": None, "n": {"$sum": 1}, "avg_salary": {"$avg": "$salary"},
+                            "max_salary": {"$max": "$salary"}}},
+            ]})
+    return out
+
+
+async def run(args):
+    import bi_universal as bi
+
+    queries = specs()
+    rows = []
+    for _ in range(args.rounds):
+        started = time.perf_counter()
+        for q in queries:
+            await bi.aggregate_collection(q["collection"], json.dumps(q["pipeline"]))
+        sequential = time.perf_counter() - started
+
+        started = time.perf_counter()
+        res = await bi.multi_query(json.dumps(queries), concurrency=args.concurrency)
+        fan_out = time.perf_counter() - started
+        rows.append((sequential, fan_out, res.get("failed", len(queries))))
+    await bi.close_http_client()
+    return len(queries), rows
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", help="Base URL of a running Django API (e.g. http://localhost:8001/api)")
+    parser.add_argument("--uri", help="Start gunicorn against this MongoDB (seeded with --docs employees)")
+    parser.add_argument("--docs", type=int, default=20000)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--workers", type=int, default=2)
+    args = parser.parse_args()
+
+    proc = None
+    if args.url:
+        base = args.url.rstrip("/") + "/"
+    else:
+        if args.uri:
+            from pymongo import MongoClient
+
+            from datasets import seed
+            seed(MongoClient(args.uri)["loadtest"]["employees"], args.docs)
+        port = free_port()
+        gunicorn_args = argparse.Namespace(uri=args.uri, docs=args.docs, cache=False, worker_class="gthread")
+        proc = start_gunicorn(args.workers, port, gunicorn_args)
+        base = f"http://127.0.0.1:{port}/api/"
+    try:
+        asyncio.run(wait_ready(base))
+        os.environ["DJANGO_API_URL"] = base
+        sys.path.insert(0, os.path.join(HERE, "..", "mcp"))
+        n, rows = asyncio.run(run(args))
+    finally:
+        if proc:
+            proc.terminate()
+            proc.wait(timeout=30)
+
+    print(f"{n} sub-queries, concurrency {args.concurrency}")
+    print(f"{'round':>5} {'sequential s':>13} {'multi_query s':>14} {'failed':>7}")
+    for i, (sequential, fan_out, failed) in enumerate(rows, 1):
+        print(f"{i:>5} {sequential:>13.3f} {fan_out:>14.3f} {failed:>7}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""Benchmark: cost of full documents vs. projected ones on each hop of a query.
+
+For a page of synthetic employees (with nested vehicles), compares the full document
+against the projections the tools now request (format_as_table columns, create_plot's
+x/y pair): BSON bytes and decode time (Mongo -> Django), JSON bytes and encode time
+(Django response) and JSON decode time (MCP side).
+
+    python benchmarks/bench_projection.py [--docs 500] [--repeat 50]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import bson
+from bson import ObjectId
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from datasets import employee  # noqa: E402
+
+PROJECTIONS = {
+    "full": None,
+    "table": ["_id", "name", "department", "salary", "city", "joinDate"],
+    "plot x/y": ["_id", "name", "salary"],
+}
+
+
+def project(doc, fields):
+    return doc if fields is None else {k: doc[k] for k in fields if k in doc}
+
+
+def best_of(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--docs", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    docs = [{"_id": ObjectId(), **employee(i)} for i in range(args.docs)]
+    print(f"{'projection':<10} {'BSON KB':>8} {'decode ms':>10} {'JSON KB':>8} {'encode ms':>10} {'parse ms':>9}")
+    for label, fields in PROJECTIONS.items():
+        page = [project(d, fields) for d in docs]
+        raw = [bson.encode(d) for d in page]
+        as_json = [{**d, "_id": str(d["_id"])} for d in page]
+        body = json.dumps({"status": "success", "documents": as_json})
+
+        bson_ms = best_of(lambda: [bson.decode(r) for r in raw], args.repeat)
+        encode_ms = best_of(lambda: json.dumps({"status": "success", "documents": as_json}), args.repeat)
+        parse_ms = best_of(lambda: json.loads(body), args.repeat)
+        print(f"{label:<10} {sum(map(len, raw)) / 1024:>8.1f} {bson_ms:>10.2f} "
+              f"{len(body) / 1024:>8.1f} {encode_ms:>10.2f} {parse_ms:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,245 @@
+"""Benchmark: replay a recorded tool-call trace through the MCP -> Django -> MongoDB stack.
+
+The trace is the JSONL the MCP server writes with MCP_RECORD=/path/trace.jsonl (see
+mcp/recorder.py); data/replay_trace.jsonl is a small mixed workload. Calls go through the MCP
+server in process (fastmcp's in-memory transport, so every middleware runs) or, with --mcp-url,
+to a running server. They are issued open-loop: at --rate calls/s, or at the trace's own pacing
+scaled by --speed when --rate is 0. The trace is cycled until --calls calls have been sent, and
+a slow call does not delay the next one. Django runs under gunicorn against --uri (seeded with
+--docs employees of --dataset) or against per-worker mongomock; --url uses a running API instead.
+mongomock scans every document in Python, so its defaults (2000 docs, 5 calls/s) are sized to
+stay below saturation; raise them only against a real MongoDB.
+
+The report is JSON with sorted keys and fixed rounding, so two runs diff cleanly. It holds
+throughput, latency percentiles overall and per tool, and, in process, each tool's mean time per
+stage: django_http (MCP -> Django round trips), django_view and mongo (from Django's
+Server-Timing). Stages can add up to more than the call when it runs requests concurrently.
+--compare BASELINE prints the change against an earlier report. With --max-regression PCT the
+run fails when the overall p50/p99 or any tool's p50 got more than PCT% slower.
+
+    python benchmarks/bench_replay.py --rate 20 --calls 400 --out replay.json
+    python benchmarks/bench_replay.py --uri mongodb://localhost:27017 --docs 200000 --rate 50 --calls 2000
+    python benchmarks/bench_replay.py --trace prod.jsonl --speed 4 --compare replay.json --max-regression 10
+"""
+import argparse
+import asyncio
+import collections
+import itertools
+import json
+import os
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+sys.path.insert(0, os.path.join(HERE, "..", "mcp"))
+
+from loadtest_django import free_port, start_gunicorn, stop_gunicorn, wait_ready  # noqa: E402
+
+DEFAULT_TRACE = os.path.join(HERE, "data", "replay_trace.jsonl")
+STAGES = ("django_http", "django_view", "mongo")
+
+
+def load_trace(path, exclude):
+    with open(path) as f:
+        calls = [json.loads(line) for line in f if line.strip()]
+    calls = [c for c in calls if c["tool"] not in exclude]
+    if not calls:
+        raise SystemExit(f"no calls to replay in {path}")
+    return calls
+
+
+def schedule(calls, n, rate, speed):
+    """(seconds after start, call) for n calls, cycling the trace."""
+    if rate:
+        return [(i / rate, call) for i, call in zip(range(n), itertools.cycle(calls))]
+    # Recorded pacing: keep each gap, and treat the trace's span (+ a mean gap) as one lap.
+    offsets = [c["ts"] - calls[0]["ts"] for c in calls]
+    lap = offsets[-1] + (offsets[-1] / (len(calls) - 1) if len(calls) > 1 else 1.0)
+    return [((i // len(calls) * lap + offsets[i % len(calls)]) / speed, calls[i % len(calls)]) for i in range(n)]
+
+
+def percentiles(samples):
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    pick = lambda p: ordered[min(len(ordered) - 1, int(len(ordered) * p))]  # noqa: E731
+    return {"mean": round(sum(ordered) / len(ordered), 2), "p50": round(pick(0.5), 2), "p90": round(pick(0.9), 2),
+            "p99": round(pick(0.99), 2), "max": round(ordered[-1], 2)}
+
+
+async def replay(client, plan, call_status):
+    results = []
+    loop = asyncio.get_running_loop()
+
+    async def one(due, call):
+        lag = (loop.time() - start - due) * 1000
+        started = time.perf_counter()
+        try:
+            result = await client.call_tool(call["tool"], call.get("args") or {}, raise_on_error=False)
+            status = call_status(result)
+        except Exception:
+            status = "exception"
+        results.append((call["tool"], status, (time.perf_counter() - started) * 1000, lag))
+
+    start = loop.time()
+    tasks = []
+    for due, call in plan:
+        delay = start + due - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.ensure_future(one(due, call)))
+    await asyncio.gather(*tasks)
+    return results, loop.time() - start
+
+
+async def run(args, plan):
+    from fastmcp import Client
+
+    from tracing import call_status
+
+    records = []
+    if args.mcp_url:
+        target = args.mcp_url
+    else:
+        os.environ.pop("MCP_RECORD", None)  # never append the replay to a trace
+        import bi_universal as bi
+
+        bi.recorder.add_sink(records.append)
+        target = bi.mcp
+    async with Client(target, timeout=120) as client:
+        results, wall = await replay(client, plan, call_status)
+    if not args.mcp_url:
+        await bi.close_http_client()
+    return results, wall, records
+
+
+def report(args, plan, results, wall, records):
+    by_tool = collections.defaultdict(list)
+    for tool, status, ms, _ in results:
+        by_tool[tool].append((status, ms))
+    stages = collections.defaultdict(list)
+    for record in records:
+        stages[record["tool"]].append(record["stages"])
+    statuses = collections.Counter(status for _, status, _, _ in results)
+
+    tools = {}
+    for tool, calls in sorted(by_tool.items()):
+        entry = {"calls": len(calls), "errors": sum(s != "ok" for s, _ in calls),
+                 "latency_ms": percentiles([ms for _, ms in calls])}
+        if stages.get(tool):
+            rows = stages[tool]
+            entry["stages_ms"] = {s: round(sum(r[f"{s}_ms"] for r in rows) / len(rows), 2) for s in STAGES}
+            entry["django_requests"] = round(sum(r["django_requests"] for r in rows) / len(rows), 2)
+        tools[tool] = entry
+    return {
+        "config": {"trace": os.path.basename(args.trace), "calls": len(plan), "rate": args.rate,
+                   "speed": None if args.rate else args.speed, "target": args.mcp_url or "in-process",
+                   "backend": args.url or (None if args.mcp_url else args.uri or "mongomock"),
+                   **({} if args.url or args.mcp_url else
+                      {"docs": args.docs, "dataset": args.dataset, "workers": args.workers})},
+        "totals": {"calls": len(results), "wall_s": round(wall, 3), "throughput_rps": round(len(results) / wall, 2),
+                   "target_rps": round(len(plan) / plan[-1][0], 2) if plan[-1][0] else None,
+                   "statuses": dict(sorted(statuses.items())),
+                   "schedule_lag_ms": percentiles([lag for *_, lag in results])},
+        "latency_ms": percentiles([ms for _, _, ms, _ in results]),
+        "tools": tools,
+    }
+
+
+def change(old, new):
+    return (new - old) / old * 100 if old else 0.0
+
+
+def compare(baseline, current, max_regression):
+    """Print current vs. baseline to stderr; return the regressions beyond max_regression %."""
+    differs = sorted(k for k in set(baseline["config"]) | set(current["config"])
+                     if baseline["config"].get(k) != current["config"].get(k))
+    if differs:
+        print(f"note: runs differ in {', '.join(differs)}", file=sys.stderr)
+    rows = [("overall p50", baseline["latency_ms"]["p50"], current["latency_ms"]["p50"]),
+            ("overall p99", baseline["latency_ms"]["p99"], current["latency_ms"]["p99"])]
+    for tool, entry in current["tools"].items():
+        if tool in baseline["tools"]:
+            rows.append((f"{tool} p50", baseline["tools"][tool]["latency_ms"]["p50"], entry["latency_ms"]["p50"]))
+    print(f"{'':<36} {'baseline':>10} {'current':>10} {'change':>8}", file=sys.stderr)
+    print(f"{'throughput req/s':<36} {baseline['totals']['throughput_rps']:>10.2f} "
+          f"{current['totals']['throughput_rps']:>10.2f} "
+          f"{change(baseline['totals']['throughput_rps'], current['totals']['throughput_rps']):>+7.1f}%", file=sys.stderr)
+    regressions = []
+    for label, old, new in rows:
+        delta = change(old, new)
+        print(f"{label + ' ms':<36} {old:>10.2f} {new:>10.2f} {delta:>+7.1f}%", file=sys.stderr)
+        if max_regression is not None and delta > max_regression:
+            regressions.append(f"{label} {delta:+.1f}%")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--trace", default=DEFAULT_TRACE, help="JSONL trace recorded with MCP_RECORD")
+    parser.add_argument("--calls", type=int, default=200, help="Calls to send (the trace is cycled)")
+    parser.add_argument("--rate", type=float, default=5.0, help="Calls per second; 0 keeps the recorded pacing")
+    parser.add_argument("--speed", type=float, default=1.0, help="With --rate 0: replay this many times faster")
+    parser.add_argument("--exclude", nargs="*", default=[], help="Tools to leave out (e.g. insert_document)")
+    parser.add_argument("--mcp-url", help="Drive a running MCP server (e.g. http://localhost:8000/mcp) instead")
+    parser.add_argument("--url", help="Base URL of a running Django API (e.g. http://localhost:8001/api)")
+    parser.add_argument("--uri", help="Start gunicorn against this MongoDB (seeded with --docs employees)")
+    parser.add_argument("--docs", type=int, help="Employees to seed (default 20000 with --uri, 2000 on mongomock)")
+    parser.add_argument("--dataset", default="realistic", choices=["simple", "realistic"])
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--out", help="Write the JSON report here instead of stdout")
+    parser.add_argument("--compare", help="Earlier JSON report to compare against")
+    parser.add_argument("--max-regression", type=float, help="Fail if latency grew more than this many percent")
+    args = parser.parse_args()
+    if args.docs is None:
+        args.docs = 20000 if args.uri else 2000
+
+    plan = schedule(load_trace(args.trace, set(args.exclude)), args.calls, args.rate, args.speed)
+    proc = base = None
+    if args.url:
+        base = args.url.rstrip("/") + "/"
+    elif not args.mcp_url:
+        if args.uri:
+            from pymongo import MongoClient
+
+            from datasets import seed
+            sys.path.insert(0, os.path.join(HERE, "..", "django_project"))
+            from mongodb_api.vehicles import ensure_vehicle_index, with_vehicle_tokens
+
+            col = MongoClient(args.uri)["loadtest"]["employees"]
+            seed(col, args.docs, transform=with_vehicle_tokens, dataset=args.dataset)
+            ensure_vehicle_index(col)
+        port = free_port()
+        gunicorn_args = argparse.Namespace(uri=args.uri, docs=args.docs, cache=False, worker_class="gthread",
+                                           dataset=args.dataset)
+        proc = start_gunicorn(args.workers, port, gunicorn_args)
+        base = f"http://127.0.0.1:{port}/api/"
+    try:
+        if base:  # the in-process server talks to this API; a --mcp-url server has its own
+            asyncio.run(wait_ready(base))
+            os.environ["DJANGO_API_URL"] = base
+        results, wall, records = asyncio.run(run(args, plan))
+        # Written before gunicorn stops, so a slow shutdown cannot lose the run.
+        current = report(args, plan, results, wall, records)
+        text = json.dumps(current, indent=2, sort_keys=True) + "\n"
+        if args.out:
+            with open(args.out, "w") as f:
+                f.write(text)
+        else:
+            sys.stdout.write(text)
+            sys.stdout.flush()
+    finally:
+        if proc:
+            stop_gunicorn(proc)
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(json.load(f), current, args.max_regression)
+        if regressions:
+            print("REGRESSION: " + "; ".join(regressions), file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
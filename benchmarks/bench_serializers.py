@@ -0,0 +1,99 @@
+"""Benchmark: JSON rendering of a page of employee documents on each backend.
+
+Documents carry the BSON types a cursor really returns (ObjectId _id, datetimes, Decimal128,
+nested vehicles with their own ObjectIds). Compares the previous path (copy _id to str, then
+the stdlib encoder with a str() fallback) against mongodb_api.renderers on the stdlib,
+orjson and msgspec backends (skipped when not installed), plus decoding the batch as
+RawBSONDocument before encoding. The last column is the MCP-side parse of the rendered body
+with json.loads vs orjson.loads.
+
+    python benchmarks/bench_serializers.py [--docs 500] [--repeat 50]
+"""
+import argparse
+import datetime
+import json
+import os
+import sys
+import time
+
+import bson
+from bson import CodecOptions, Decimal128, ObjectId
+from bson.raw_bson import RawBSONDocument
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+sys.path.insert(0, os.path.join(HERE, "..", "django_project"))
+
+from datasets import employee  # noqa: E402
+from mongodb_api import renderers  # noqa: E402
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def bson_employee(i):
+    doc = {"_id": ObjectId(), **employee(i)}
+    doc["hired_at"] = datetime.datetime(2010 + i % 15, 1 + i % 12, 1 + i % 28, 9, 30)
+    doc["bonus"] = Decimal128(f"{(i * 37) % 5000}.{i % 100:02d}")
+    for vehicle in doc["vehicles"].values():
+        vehicle["registration_id"] = ObjectId()
+    return doc
+
+
+class LegacyEncoder(json.JSONEncoder):
+    def default(self, o):
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return str(o)
+
+
+def legacy(docs):
+    docs = [{**d, "_id": str(d["_id"])} for d in docs]
+    return json.dumps({"status": "success", "documents": docs}, cls=LegacyEncoder).encode()
+
+
+def best_of(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--docs", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    docs = [bson_employee(i) for i in range(args.docs)]
+    batch = b"".join(bson.encode(d) for d in docs)
+    raw_options = CodecOptions(document_class=RawBSONDocument)
+
+    variants = {"legacy": legacy}
+    for name in ("stdlib", "orjson", "msgspec"):
+        backend, dumps = renderers._make_dumps(name)
+        if backend == name:
+            variants[name] = lambda d, dumps=dumps: dumps({"status": "success", "documents": d})
+    if "orjson" in variants:
+        variants["raw+orjson"] = lambda d: variants["orjson"](bson.decode_all(batch, raw_options))
+
+    print(f"{args.docs} documents, renderer in use: {renderers.RENDERER}")
+    header = f"{'encoder':<11} {'encode ms':>10} {'KB':>7} {'json.loads ms':>14}"
+    if orjson:
+        header += f" {'orjson.loads ms':>16}"
+    print(header)
+    for label, encode in variants.items():
+        body = encode(docs)
+        encode_ms = best_of(lambda: encode(docs), args.repeat)
+        line = f"{label:<11} {encode_ms:>10.2f} {len(body) / 1024:>7.1f} {best_of(lambda: json.loads(body), args.repeat):>14.2f}"
+        if orjson:
+            line += f" {best_of(lambda: orjson.loads(body), args.repeat):>16.2f}"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
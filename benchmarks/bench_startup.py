@@ -0,0 +1,108 @@
+"""Benchmark: MCP server cold start over stdio (time to first tool response, baseline RSS).
+
+Launches `bi_universal.py --transport stdio` the way LibreChat does and speaks MCP JSON-RPC on
+its stdin/stdout. It measures the time from spawn to the `initialize` reply and to the first
+`tools/call` reply (analytics_snapshot, which needs neither Django nor the plotting stack). It
+then reads the process RSS and whether pandas/matplotlib are loaded. Each configuration is
+started --runs times and the median is reported. The warm-up row runs with MCP_WARMUP=true
+and samples RSS after --settle seconds, so it includes the plotting stack.
+
+--max-first-call-ms / --max-rss-mb turn the lazy-start row into a regression gate (exit 1).
+
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --runs 5 --max-first-call-ms 2500 --max-rss-mb 150
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SERVER = os.path.join(HERE, "..", "mcp", "bi_universal.py")
+
+def rss_mb(pid):
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return float("nan")
+
+
+def rpc(proc, msg_id, method, params):
+    proc.stdin.write(json.dumps({"jsonrpc": "2.0", "id": msg_id, "method": method, "params": params}) + "\n")
+    proc.stdin.flush()
+    while True:
+        line = proc.stdout.readline()
+        if not line:
+            raise RuntimeError(f"server exited before answering {method}")
+        reply = json.loads(line)
+        if reply.get("id") == msg_id:
+            return reply
+
+
+def start_once(env, settle):
+    started = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, SERVER, "--transport", "stdio"], env=env, text=True,
+                            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    try:
+        rpc(proc, 1, "initialize", {"protocolVersion": "2025-06-18", "capabilities": {},
+                                    "clientInfo": {"name": "bench_startup", "version": "1"}})
+        initialized = time.perf_counter() - started
+        proc.stdin.write(json.dumps({"jsonrpc": "2.0", "method": "notifications/initialized"}) + "\n")
+        proc.stdin.flush()
+        reply = rpc(proc, 2, "tools/call", {"name": "analytics_snapshot", "arguments": {}})
+        first_call = time.perf_counter() - started
+        if "error" in reply:
+            raise RuntimeError(reply["error"])
+        time.sleep(settle)
+        return initialized * 1000, first_call * 1000, rss_mb(proc.pid)
+    finally:
+        proc.stdin.close()
+        proc.terminate()
+        proc.wait(timeout=10)
+
+
+def loaded_modules(env):
+    """Which heavy modules importing bi_universal pulls in (checked in a separate interpreter)."""
+    code = (f"import json, sys; sys.path.insert(0, {os.path.dirname(SERVER)!r}); import bi_universal; "
+            "print(json.dumps({m: m in sys.modules for m in ('pandas', 'matplotlib')}))")
+    out = subprocess.run([sys.executable, "-c", code], env=env, capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--settle", type=float, default=2.0, help="Seconds before sampling RSS in the warm-up row")
+    parser.add_argument("--max-first-call-ms", type=float, help="Fail if lazy start's first tool reply is slower")
+    parser.add_argument("--max-rss-mb", type=float, help="Fail if lazy start's RSS is higher")
+    args = parser.parse_args()
+
+    base = dict(os.environ, ANALYTICS_MODE="off", PYTHONUNBUFFERED="1")
+    configs = {"lazy": dict(base, MCP_WARMUP="false"), "warm-up": dict(base, MCP_WARMUP="true")}
+
+    print(f"modules loaded by `import bi_universal`: {loaded_modules(configs['lazy'])}")
+    print(f"{'start':<8} {'initialize ms':>14} {'first call ms':>14} {'RSS MB':>8}")
+    results = {}
+    for label, env in configs.items():
+        runs = [start_once(env, args.settle if label == "warm-up" else 0) for _ in range(args.runs)]
+        init, first, rss = (statistics.median(col) for col in zip(*runs))
+        results[label] = (first, rss)
+        print(f"{label:<8} {init:>14.0f} {first:>14.0f} {rss:>8.1f}")
+
+    first, rss = results["lazy"]
+    failed = []
+    if args.max_first_call_ms and first > args.max_first_call_ms:
+        failed.append(f"first tool reply {first:.0f} ms > {args.max_first_call_ms:.0f} ms")
+    if args.max_rss_mb and rss > args.max_rss_mb:
+        failed.append(f"RSS {rss:.1f} MB > {args.max_rss_mb:.1f} MB")
+    if failed:
+        print("REGRESSION: " + "; ".join(failed))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""Benchmark: legacy ".*X.*" regex vehicle search vs. the indexed vehicle_tokens lookup.
+
+Seeds N employees (with vehicle_tokens maintained as the Django API does on insert),
+creates the multikey index, then times the filters smart_command sends for
+"who owns ..." questions and reports latency plus docs examined (from explain).
+
+    python benchmarks/bench_vehicle_search.py --uri mongodb://localhost:27017 --size 200000
+    python benchmarks/bench_vehicle_search.py --mongomock --size 20000   # no real indexes
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+HERE = os.path.dirname(__file__)
+sys.path.insert(0, os.path.join(HERE, "..", "django_project"))
+sys.path.insert(0, os.path.join(HERE, "..", "mcp"))
+
+from datasets import seed  # noqa: E402
+from mongodb_api.vehicles import ensure_vehicle_index, with_vehicle_tokens  # noqa: E402
+import bi_universal as bi  # noqa: E402
+
+QUERIES = ["honda shine", "royal enfield classic 350", "tata nexon", "activa", "honda"]
+
+
+def docs_examined(col, filter_):
+    try:
+        plan = col.find(filter_).explain()
+        return plan["executionStats"]["totalDocsExamined"]
+    except Exception:
+        return None
+
+
+def time_filter(col, filter_, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        n = len(list(col.find(filter_, {"_id": 1})))
+        samples.append(time.perf_counter() - start)
+    samples.sort()
+    return n, statistics.median(samples) * 1000, samples[int(len(samples) * 0.99)] * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--uri", default="mongodb://localhost:27017")
+    parser.add_argument("--mongomock", action="store_true", help="Use in-memory mongomock (no index effect)")
+    parser.add_argument("--size", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    if args.mongomock:
+        import mongomock
+        client = mongomock.MongoClient()
+    else:
+        from pymongo import MongoClient
+        client = MongoClient(args.uri)
+    col = client["bench_vehicles"]["employees"]
+    seed(col, args.size, transform=with_vehicle_tokens)
+    ensure_vehicle_index(col)
+
+    print(f"{'query':<28} {'mode':>6} {'matches':>8} {'examined':>9} {'p50 ms':>9} {'p99 ms':>9}")
+    for text in QUERIES:
+        for mode, filter_ in (("regex", bi._build_vehicle_regex_filter(text)),
+                              ("tokens", bi._build_vehicle_token_filter(text))):
+            n, p50, p99 = time_filter(col, filter_, args.repeat)
+            examined = docs_examined(col, filter_)
+            print(f"{text:<28} {mode:>6} {n:>8} {str(examined):>9} {p50:>9.2f} {p99:>9.2f}")
+    col.drop()
+
+
+if __name__ == "__main__":
+    main()
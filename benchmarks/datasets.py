@@ -0,0 +1,165 @@
+"""Synthetic employees data shared by the benchmarks.
+
+`employee(i)` is the simple, deterministic-per-index document most benchmarks use. The
+"realistic" dataset (`realistic_employees`) has skewed city/department mixes, salaries that
+depend on the department, and 0-3 vehicles per employee with make/model/variant, fuel and
+registration. Car ownership rises with salary and some employees have no `vehicles` at all.
+It is deterministic for a given seed.
+
+Write either dataset to MongoDB or to an NDJSON file (for mongoimport) at any scale:
+
+    python benchmarks/datasets.py --docs 200000 --dataset realistic --uri mongodb://localhost:27017
+    python benchmarks/datasets.py --docs 1000000 --dataset realistic --out employees.ndjson
+"""
+import argparse
+import itertools
+import json
+import math
+import os
+import random
+import sys
+
+CITIES = ["Pune", "Thane", "Mumbai", "Nashik", "Nagpur"]
+DEPARTMENTS = ["Engineer", "Sales", "Finance", "HR", "Marketing"]
+BIKES = ["Honda Shine 125", "Bajaj Pulsar 150", "Hero Splendor Plus", "TVS Apache RTR 160", "Royal Enfield Classic 350"]
+SCOOTIES = ["Honda Activa 6G", "TVS Jupiter", "Suzuki Access 125"]
+CARS = ["Maruti Swift VXI", "Hyundai Creta SX", "Tata Nexon XZ", "Honda City ZX"]
+
+# Realistic dataset: most staff in a few cities and departments.
+CITY_WEIGHTS = [0.3, 0.15, 0.35, 0.1, 0.1]
+DEPARTMENT_WEIGHTS = [0.4, 0.25, 0.12, 0.08, 0.15]
+# Median salary and log-normal spread per department.
+DEPARTMENT_SALARY = {"Engineer": (85000, 0.35), "Sales": (55000, 0.45), "Finance": (70000, 0.3),
+                     "HR": (50000, 0.25), "Marketing": (60000, 0.35)}
+RTO_CODES = {"Pune": "MH12", "Thane": "MH04", "Mumbai": "MH01", "Nashik": "MH15", "Nagpur": "MH31"}
+FIRST_NAMES = ["Aarav", "Vivaan", "Aditya", "Ishaan", "Rohan", "Priya", "Ananya", "Sneha", "Kavya", "Pooja",
+               "Rahul", "Amit", "Neha", "Sanjay", "Meera", "Vikram", "Nikhil", "Shreya", "Tanvi", "Omkar"]
+LAST_NAMES = ["Patil", "Deshmukh", "Kulkarni", "Joshi", "Shinde", "Pawar", "Jadhav", "Sharma", "Mehta", "Gupta",
+              "Iyer", "Nair", "Kale", "More", "Gaikwad"]
+# (make, model, variant, fuel) per vehicle category; `type` is "make model variant".
+VEHICLE_MODELS = {
+    "two_wheeler_bike": [("Honda", "Shine", "125", "petrol"), ("Bajaj", "Pulsar", "150", "petrol"),
+                         ("Hero", "Splendor", "Plus", "petrol"), ("TVS", "Apache", "RTR 160", "petrol"),
+                         ("Royal Enfield", "Classic", "350", "petrol"), ("Ather", "450X", "Gen 3", "electric")],
+    "two_wheeler_scooty": [("Honda", "Activa", "6G", "petrol"), ("TVS", "Jupiter", "ZX", "petrol"),
+                           ("Suzuki", "Access", "125", "petrol"), ("Ola", "S1", "Pro", "electric")],
+    "four_wheeler": [("Maruti", "Swift", "VXI", "petrol"), ("Hyundai", "Creta", "SX", "diesel"),
+                     ("Tata", "Nexon", "XZ", "petrol"), ("Tata", "Nexon EV", "Max", "electric"),
+                     ("Honda", "City", "ZX", "petrol"), ("Maruti", "Ertiga", "VXI", "cng")],
+}
+
+
+def employee(i):
+    vehicles = {"two_wheeler_bike": {"type": BIKES[i % len(BIKES)], "year": 2015 + i % 10}}
+    if i % 3 == 0:
+        vehicles["four_wheeler"] = {"type": CARS[i % len(CARS)], "year": 2012 + i % 12}
+    if i % 4 == 1:
+        vehicles["two_wheeler_scooty"] = {"type": SCOOTIES[i % len(SCOOTIES)]}
+    return {
+        "name": f"Employee {i}",
+        "department": DEPARTMENTS[i % len(DEPARTMENTS)],
+        "salary": 30000 + (i * 7919) % 90000,
+        "city": CITIES[(i // 7) % len(CITIES)],
+        "joinDate": f"20{10 + i % 15}-0{1 + i % 9}-1{i % 10}",
+        "vehicles": vehicles,
+    }
+
+
+def simple_employees(n):
+    return (employee(i) for i in range(n))
+
+
+def _vehicle(rng, category, city, join_year):
+    make, model, variant, fuel = rng.choice(VEHICLE_MODELS[category])
+    letters = "".join(rng.choice("ABCDEFGHJKLMNPRSTUVWXZ") for _ in range(2))
+    return {
+        "type": f"{make} {model} {variant}",
+        "make": make,
+        "model": model,
+        "variant": variant,
+        "fuel": fuel,
+        "year": rng.randint(max(2008, join_year - 6), 2025),
+        "registration": f"{RTO_CODES[city]} {letters} {rng.randint(1, 9999):04d}",
+    }
+
+
+def realistic_employee(rng, i):
+    first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+    city = rng.choices(CITIES, CITY_WEIGHTS)[0]
+    department = rng.choices(DEPARTMENTS, DEPARTMENT_WEIGHTS)[0]
+    median, spread = DEPARTMENT_SALARY[department]
+    salary = int(round(rng.lognormvariate(math.log(median), spread), -2))
+    join_year = rng.randint(2008, 2025)
+    doc = {
+        "name": f"{first} {last}",
+        "email": f"{first.lower()}.{last.lower()}{i}@example.com",
+        "department": department,
+        "salary": salary,
+        "city": city,
+        "joinDate": f"{join_year}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+    }
+    vehicles = {}
+    if rng.random() < 0.55:
+        vehicles["two_wheeler_bike"] = _vehicle(rng, "two_wheeler_bike", city, join_year)
+    if rng.random() < 0.25:
+        vehicles["two_wheeler_scooty"] = _vehicle(rng, "two_wheeler_scooty", city, join_year)
+    if rng.random() < min(0.8, salary / 150000):
+        vehicles["four_wheeler"] = _vehicle(rng, "four_wheeler", city, join_year)
+    if vehicles:
+        doc["vehicles"] = vehicles
+    return doc
+
+
+def realistic_employees(n, rng_seed=42):
+    rng = random.Random(rng_seed)
+    return (realistic_employee(rng, i) for i in range(n))
+
+
+DATASETS = {"simple": simple_employees, "realistic": realistic_employees}
+
+
+def seed(col, n, batch=10000, transform=None, dataset="simple"):
+    """Drop `col` and insert n employees in batches; `transform` can post-process each doc."""
+    col.drop()
+    docs = DATASETS[dataset](n)
+    while True:
+        chunk = list(itertools.islice(docs, batch))
+        if not chunk:
+            break
+        if transform:
+            chunk = [transform(d) for d in chunk]
+        col.insert_many(chunk)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic employees collection.")
+    parser.add_argument("--docs", type=int, default=100000)
+    parser.add_argument("--dataset", default="realistic", choices=list(DATASETS))
+    parser.add_argument("--uri", help="Write to this MongoDB (the collection is dropped first)")
+    parser.add_argument("--db", default="loadtest")
+    parser.add_argument("--collection", default="employees")
+    parser.add_argument("--out", help="Write NDJSON to this file ('-' for stdout) instead")
+    args = parser.parse_args()
+
+    if args.uri:
+        from pymongo import MongoClient
+
+        sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "django_project"))
+        from mongodb_api.vehicles import ensure_vehicle_index, with_vehicle_tokens
+
+        # Stored the way the Django API stores inserts: with vehicle_tokens and their index.
+        col = MongoClient(args.uri)[args.db][args.collection]
+        seed(col, args.docs, transform=with_vehicle_tokens, dataset=args.dataset)
+        ensure_vehicle_index(col)
+        print(f"inserted {args.docs} {args.dataset} employees into {args.db}.{args.collection}", file=sys.stderr)
+    elif args.out:
+        out = sys.stdout if args.out == "-" else open(args.out, "w", encoding="utf-8")
+        with out:
+            for doc in DATASETS[args.dataset](args.docs):
+                out.write(json.dumps(doc) + "\n")
+    else:
+        parser.error("pass --uri or --out")
+
+
+if __name__ == "__main__":
+    main()
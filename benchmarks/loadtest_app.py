@@ -0,0 +1,34 @@
+"""WSGI/ASGI entry points for load tests (served by gunicorn from loadtest_django.py).
+
+With LOADTEST_MONGO=mongomock every worker gets its own in-memory MongoDB seeded with
+LOADTEST_DOCS employees from LOADTEST_DATASET ("simple" or "realistic", see datasets.py);
+otherwise the workers use MONGO_URI like production.
+`asgi_application` (with ASYNC_VIEWS=true) needs a real MongoDB: mongomock has no async client.
+"""
+import os
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+sys.path.insert(0, os.path.join(HERE, "..", "django_project"))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "loadtest_settings")
+
+from mongodb_api import mongo  # noqa: E402
+
+if os.getenv("LOADTEST_MONGO", "mongomock") == "mongomock":
+    import mongomock
+
+    from datasets import seed
+    from mongodb_api.vehicles import with_vehicle_tokens
+
+    mongo.MongoClient = mongomock.MongoClient
+    mongo.MONGO_CLIENT_OPTIONS = {}
+    # vehicle_tokens as the API maintains them on insert, so "who owns ..." lookups find matches.
+    mongo.on_connect(lambda db: seed(db["employees"], int(os.getenv("LOADTEST_DOCS", "2000")),
+                                     transform=with_vehicle_tokens, dataset=os.getenv("LOADTEST_DATASET", "simple")))
+
+from django.core.asgi import get_asgi_application  # noqa: E402
+from django.core.wsgi import get_wsgi_application  # noqa: E402
+
+application = get_wsgi_application()
+asgi_application = get_asgi_application()
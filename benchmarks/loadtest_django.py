@@ -0,0 +1,141 @@
+"""Load test: Django API throughput under gunicorn at 1, 2, 4 and 8 workers.
+
+Starts gunicorn with gunicorn.conf.py for each worker count, drives a mix of
+query/info/health requests from an async client for a fixed duration, and reports
+req/s and latency percentiles.
+
+    python benchmarks/loadtest_django.py                          # mongomock per worker
+    python benchmarks/loadtest_django.py --uri mongodb://localhost:27017
+"""
+import argparse
+import asyncio
+import itertools
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import httpx
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DJANGO_DIR = os.path.join(HERE, "..", "django_project")
+
+REQUESTS = [
+    ("POST", "collections/query/", {"collection": "employees", "filter": {"department": "Engineer"},
+                                    "limit": 50, "projection": ["name", "department", "salary", "city"]}),
+    ("POST", "collections/query/", {"collection": "employees", "filter": {"salary": {"$gt": 90000}}, "limit": 20}),
+    ("GET", "collections/employees/info/", None),
+    ("GET", "health/", None),
+]
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_gunicorn(workers, port, args):
+    # The load mix is read-only, so per-worker caches cannot go stale here.
+    env = dict(os.environ, QUERY_CACHE_BACKEND="local" if args.cache else "off", QUERY_CACHE_ALLOW_STALE="true")
+    if args.uri:
+        env.update(LOADTEST_MONGO="real", MONGO_URI=args.uri, MONGO_DB="loadtest")
+    else:
+        env.update(LOADTEST_MONGO="mongomock", LOADTEST_DOCS=str(args.docs),
+                   LOADTEST_DATASET=getattr(args, "dataset", "simple"))
+    cmd = [
+        sys.executable, "-m", "gunicorn", "-c", os.path.join(DJANGO_DIR, "gunicorn.conf.py"), "--chdir", DJANGO_DIR,
+        "--pythonpath", HERE, "-w", str(workers), "-b", f"127.0.0.1:{port}",
+        "--worker-class", args.worker_class, getattr(args, "app", "loadtest_app:application"),
+    ]
+    return subprocess.Popen(cmd, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def stop_gunicorn(proc, timeout=10):
+    """Stop gunicorn; kill it if in-flight requests keep it past `timeout` seconds."""
+    proc.terminate()
+    try:
+        proc.wait(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+        proc.wait()
+
+
+async def wait_ready(base, timeout=60):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient(base_url=base) as client:
+        while time.monotonic() < deadline:
+            try:
+                # Hit the query path once per worker-ish so lazy clients and seeds are warm.
+                if (await client.get("health/")).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError("gunicorn did not become ready")
+
+
+async def drive(base, concurrency, duration):
+    latencies = []
+    errors = 0
+    stop = time.monotonic() + duration
+    mix = itertools.cycle(REQUESTS)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base, limits=limits, timeout=30) as client:
+        async def user():
+            nonlocal errors
+            while time.monotonic() < stop:
+                method, path, body = next(mix)
+                start = time.perf_counter()
+                try:
+                    r = await client.request(method, path, json=body)
+                    if r.status_code != 200:
+                        errors += 1
+                except httpx.HTTPError:
+                    errors += 1
+                latencies.append(time.perf_counter() - start)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(user() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+    latencies.sort()
+    pct = lambda p: latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000  # noqa: E731
+    return len(latencies) / elapsed, pct(0.5), pct(0.99), errors
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--docs", type=int, default=2000, help="Employees seeded per mongomock worker")
+    parser.add_argument("--uri", help="Use a real MongoDB (database 'loadtest', seeded once)")
+    parser.add_argument("--worker-class", default="gthread")
+    parser.add_argument("--cache", action="store_true", help="Enable the query result cache")
+    args = parser.parse_args()
+
+    if args.uri:
+        from pymongo import MongoClient
+
+        sys.path.insert(0, HERE)
+        from datasets import seed
+        seed(MongoClient(args.uri)["loadtest"]["employees"], args.docs)
+
+    print(f"{'workers':>7} {'req/s':>9} {'p50 ms':>9} {'p99 ms':>9} {'errors':>7}")
+    for workers in args.workers:
+        port = free_port()
+        proc = start_gunicorn(workers, port, args)
+        base = f"http://127.0.0.1:{port}/api/"
+        try:
+            asyncio.run(wait_ready(base))
+            asyncio.run(drive(base, args.concurrency, 1))  # warm every worker
+            rps, p50, p99, errors = asyncio.run(drive(base, args.concurrency, args.duration))
+            print(f"{workers:>7} {rps:>9.1f} {p50:>9.2f} {p99:>9.2f} {errors:>7}")
+        finally:
+            stop_gunicorn(proc)
+
+
+if __name__ == "__main__":
+    main()
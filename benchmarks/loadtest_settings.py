@@ -0,0 +1,5 @@
+"""Django settings for load tests: the API only talks to MongoDB via pymongo, so no ORM database."""
+from django_api.settings import *  # noqa: F401,F403
+
+DATABASES = {"default": {"ENGINE": "django.db.backends.dummy"}}
+DEBUG = False
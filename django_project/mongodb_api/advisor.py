@@ -0,0 +1,225 @@
+# advisor.py - Query-shape statistics and index recommendations
+# Each read/write filter is reduced to its shape ({"salary": {"$gt": "?"}}) and timed.
+# Slow shapes (and a small sample of the rest) are explained in the background to record
+# docs/keys examined and whether the winning plan scanned the collection. Recommendations
+# follow the equality -> sort -> range (ESR) rule for compound indexes. Explains are throttled
+# per shape and the background queue is bounded, so a burst of slow calls cannot pile up work.
+
+import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+INDEX_ADVISOR_ENABLED = os.getenv("INDEX_ADVISOR_ENABLED", "true").lower() in ("1", "true", "yes")
+INDEX_ADVISOR_SLOW_MS = float(os.getenv("INDEX_ADVISOR_SLOW_MS", "50"))
+INDEX_ADVISOR_SAMPLE_RATE = float(os.getenv("INDEX_ADVISOR_SAMPLE_RATE", "0.01"))
+INDEX_ADVISOR_MAX_SHAPES = int(os.getenv("INDEX_ADVISOR_MAX_SHAPES", "500"))
+INDEX_ADVISOR_EXPLAIN_INTERVAL_S = float(os.getenv("INDEX_ADVISOR_EXPLAIN_INTERVAL_S", "60"))
+EXPLAIN_QUEUE_MAX = int(os.getenv("EXPLAIN_QUEUE_MAX", "32"))
+
+EQUALITY_OPS = {"$eq", "$in"}
+
+
+def filter_shape(value):
+    """Replace literal values with "?" so filters that differ only in constants share a shape."""
+    if isinstance(value, dict):
+        return {k: filter_shape(v) for k, v in sorted(value.items())}
+    if isinstance(value, list):
+        shapes = [filter_shape(v) for v in value]
+        return shapes if any(isinstance(v, (dict, list)) for v in shapes) else "?"
+    return "?"
+
+
+def _plan_stages(plan):
+    stages = set()
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            stages.add(plan["stage"])
+        for v in plan.values():
+            stages |= _plan_stages(v)
+    elif isinstance(plan, list):
+        for v in plan:
+            stages |= _plan_stages(v)
+    return stages
+
+
+def summarize_explain(explain):
+    stats = explain.get("executionStats", {})
+    stages = _plan_stages(explain.get("queryPlanner", {}).get("winningPlan", {}))
+    return {
+        "docs_examined": stats.get("totalDocsExamined"),
+        "keys_examined": stats.get("totalKeysExamined"),
+        "n_returned": stats.get("nReturned"),
+        "collection_scan": "COLLSCAN" in stages,
+        "plan_stages": sorted(stages),
+    }
+
+
+def shape_fields(shape):
+    """Split a shape into (equality fields, range fields); $or branches are not indexable as one."""
+    eq, rng = [], []
+    for field, cond in shape.items():
+        if field == "$and" and isinstance(cond, list):
+            for sub in cond:
+                if isinstance(sub, dict):
+                    e, r = shape_fields(sub)
+                    eq += e
+                    rng += r
+        elif field.startswith("$"):
+            continue
+        elif isinstance(cond, dict) and any(k.startswith("$") for k in cond):
+            ops = set(cond)
+            (eq if ops <= EQUALITY_OPS else rng).append(field)
+        else:
+            eq.append(field)
+    return eq, rng
+
+
+def recommend_keys(shape, sort=None):
+    """ESR compound index keys for a shape, or [] if the shape has nothing indexable."""
+    eq, rng = shape_fields(shape)
+    keys = [(f, 1) for f in dict.fromkeys(sorted(eq))]
+    if sort and sort.lstrip("-") != "_id":
+        keys.append((sort.lstrip("-"), -1 if sort.startswith("-") else 1))
+    keys += [(f, 1) for f in dict.fromkeys(sorted(rng)) if f not in dict(keys)]
+    return keys
+
+
+def _covered(keys, index_information):
+    """An existing index whose leading keys equal the recommendation already serves it."""
+    for info in index_information.values():
+        existing = [(k, v) for k, v in info["key"]]
+        if existing[:len(keys)] == keys:
+            return True
+    return False
+
+
+class ExplainQueue:
+    """
+    One background thread for explains. A key is run at most once at a time and no more often
+    than every `interval` seconds, and submissions are dropped while `max_queued` jobs wait.
+    """
+
+    def __init__(self, name, interval, max_queued=EXPLAIN_QUEUE_MAX):
+        self.interval = interval
+        self.max_queued = max_queued
+        self.throttled = 0
+        self.dropped = 0
+        self._busy = set()
+        self._last = {}  # key -> monotonic time its last explain finished
+        self._queued = 0
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=name)
+
+    def submit(self, key, fn, *args):
+        """Run fn(*args) in the background; False if the key is busy or recent, or the queue is full."""
+        with self._lock:
+            last = self._last.get(key)
+            if key in self._busy or (last is not None and time.monotonic() - last < self.interval):
+                self.throttled += 1
+                return False
+            if self._queued >= self.max_queued:
+                self.dropped += 1
+                return False
+            self._busy.add(key)
+            self._queued += 1
+        self._executor.submit(self._run, key, fn, args)
+        return True
+
+    def _run(self, key, fn, args):
+        try:
+            fn(*args)
+        finally:
+            now = time.monotonic()
+            with self._lock:
+                self._busy.discard(key)
+                self._queued -= 1
+                self._last[key] = now
+                if len(self._last) > 4 * INDEX_ADVISOR_MAX_SHAPES:
+                    # Keys past their interval behave as if never explained; forget them.
+                    self._last = {k: t for k, t in self._last.items() if now - t < self.interval}
+
+    def stats(self):
+        with self._lock:
+            return {"queued": self._queued, "throttled": self.throttled, "dropped": self.dropped}
+
+
+class ShapeRecorder:
+    """Per-process statistics for normalized filter shapes."""
+
+    def __init__(self, max_shapes=INDEX_ADVISOR_MAX_SHAPES):
+        self.max_shapes = max_shapes
+        self._shapes = {}
+        self._lock = threading.Lock()
+        self._explainer = ExplainQueue("index-advisor", INDEX_ADVISOR_EXPLAIN_INTERVAL_S)
+
+    def record(self, collection, op, filter_, elapsed_ms, sort=None, explain=None):
+        """Record one execution; `explain` is a zero-arg callable run off the request thread."""
+        shape = filter_shape(filter_ or {})
+        key = (collection, op, json.dumps(shape, sort_keys=True), sort)
+        with self._lock:
+            entry = self._shapes.get(key)
+            if entry is None:
+                if len(self._shapes) >= self.max_shapes:
+                    # Forget the least-executed shape to stay bounded.
+                    del self._shapes[min(self._shapes, key=lambda k: self._shapes[k]["count"])]
+                entry = self._shapes[key] = {
+                    "collection": collection, "op": op, "shape": shape, "sort": sort,
+                    "count": 0, "total_ms": 0.0, "max_ms": 0.0, "explain": None,
+                }
+            entry["count"] += 1
+            entry["total_ms"] += elapsed_ms
+            entry["max_ms"] = max(entry["max_ms"], elapsed_ms)
+            wants_explain = explain is not None and (
+                entry["explain"] is None
+                or elapsed_ms >= INDEX_ADVISOR_SLOW_MS
+                or random.random() < INDEX_ADVISOR_SAMPLE_RATE
+            )
+        if wants_explain:
+            self._explainer.submit(key, self._explain, key, explain)
+
+    def _explain(self, key, explain):
+        try:
+            summary = summarize_explain(explain())
+        except Exception as e:
+            summary = {"error": str(e)}
+        with self._lock:
+            if key in self._shapes:
+                self._shapes[key]["explain"] = summary
+
+    def explain_stats(self):
+        return self._explainer.stats()
+
+    def shapes(self, collection=None):
+        with self._lock:
+            entries = [dict(e) for e in self._shapes.values() if collection in (None, e["collection"])]
+        for e in entries:
+            e["avg_ms"] = round(e["total_ms"] / e["count"], 3)
+            e["total_ms"] = round(e["total_ms"], 3)
+            e["max_ms"] = round(e["max_ms"], 3)
+        return sorted(entries, key=lambda e: e["total_ms"], reverse=True)
+
+    def recommend(self, collection, index_information, limit=5, min_avg_ms=0.0):
+        """Compound index suggestions for the hottest shapes that scan or over-examine."""
+        suggestions = {}
+        for e in self.shapes(collection):
+            ex = e["explain"] or {}
+            explained = bool(ex) and "error" not in ex
+            returned = ex.get("n_returned") or 0
+            examined = ex.get("docs_examined") or 0
+            inefficient = ex.get("collection_scan") or examined > 10 * max(returned, 1)
+            if e["avg_ms"] < min_avg_ms or (explained and not inefficient):
+                continue
+            keys = recommend_keys(e["shape"], e["sort"])
+            if not keys or _covered(keys, index_information):
+                continue
+            name = "_".join(f"{k}_{d}" for k, d in keys)
+            s = suggestions.setdefault(name, {"keys": keys, "name": name, "score_ms": 0.0, "shapes": []})
+            s["score_ms"] += e["total_ms"]
+            s["shapes"].append({k: e[k] for k in ("op", "shape", "sort", "count", "avg_ms", "max_ms", "explain")})
+        ranked = sorted(suggestions.values(), key=lambda s: s["score_ms"], reverse=True)
+        for s in ranked:
+            s["score_ms"] = round(s["score_ms"], 3)
+        return ranked[:limit]
@@ -0,0 +1,37 @@
+# aggregation.py - Validation for client-supplied aggregation pipelines
+# Only read-only analytics stages are accepted, so the endpoint cannot write
+# ($out/$merge), run server-side JavaScript, or join other collections.
+
+ALLOWED_STAGES = {"$match", "$group", "$project", "$sort", "$limit", "$facet", "$bucketAuto"}
+FORBIDDEN_OPERATORS = {"$where", "$function", "$accumulator", "$out", "$merge"}
+
+
+def _check_operators(value):
+    if isinstance(value, dict):
+        for k, v in value.items():
+            if k in FORBIDDEN_OPERATORS:
+                raise ValueError(f"Operator not allowed: {k}")
+            _check_operators(v)
+    elif isinstance(value, list):
+        for v in value:
+            _check_operators(v)
+
+
+def validate_pipeline(pipeline, allowed=ALLOWED_STAGES):
+    """Raise ValueError unless every stage is whitelisted and free of forbidden operators."""
+    if not isinstance(pipeline, list):
+        raise ValueError("pipeline must be a list of stages")
+    for stage in pipeline:
+        if not isinstance(stage, dict) or len(stage) != 1:
+            raise ValueError("each pipeline stage must be an object with exactly one key")
+        (name, spec), = stage.items()
+        if name not in allowed:
+            raise ValueError(f"Stage not allowed: {name} (allowed: {', '.join(sorted(allowed))})")
+        if name == "$facet":
+            if not isinstance(spec, dict):
+                raise ValueError("$facet must map names to sub-pipelines")
+            for sub in spec.values():
+                validate_pipeline(sub, allowed - {"$facet"})
+        else:
+            _check_operators(spec)
+    return pipeline
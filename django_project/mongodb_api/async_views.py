@@ -0,0 +1,356 @@
+# async_views.py - Async counterparts of the collection endpoints for ASGI deployments
+# With ASYNC_VIEWS=true, urls.py routes query/aggregate/insert/update/delete/info/export/
+# indexes/health (and the collection list) here. They await an AsyncMongoClient (mongo.get_async_db) instead of
+# blocking a worker thread on each round trip, so one uvicorn worker keeps many requests in
+# flight and a slow aggregation no longer holds up health checks. Only use this under ASGI
+# (e.g. gunicorn with uvicorn.workers.UvicornWorker on django_api.asgi:application); under
+# WSGI every request would spin up its own event loop and async client.
+#
+# Cancellation: when the caller disconnects, Django cancels the view task. The pending driver
+# call is abandoned (its pooled connection is discarded) and open cursors are closed in
+# `finally`, which kills them on the server instead of letting them run to exhaustion.
+#
+# Request parsing, cache keys, cursor tokens and the response bodies are shared with views.py,
+# so both deployments answer identically.
+#
+# Still sync under ASYNC_VIEWS: multi (fans out on its own thread pool), bulk (NDJSON upload
+# parsing and chunked bulk_write), indexes/recommend, cache/stats and metrics. Django runs each
+# of those requests on a worker thread, so they do not block the event loop, but every one holds
+# a thread for its whole duration.
+
+import inspect
+import os
+import time
+
+from asgiref.sync import sync_to_async
+from django.http import StreamingHttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_http_methods
+
+from .export import DEFAULT_CHUNK_SIZE, astream_export, content_headers
+from .mongo import MONGO_DB, get_async_client, get_async_db, get_db
+from .renderers import JsonResponse, dumps, dumps_line, loads
+from .vehicles import hide_vehicle_tokens, refresh_vehicle_tokens, touches_vehicles, with_vehicle_tokens
+from .aggregation import validate_pipeline
+from .views import (
+    AGGREGATE_MAX_RESULTS, AGGREGATE_MAX_TIME_MS, _catalog_writes, _parse_index_keys, as_update,
+    decode_extended, encode_cursor, paged_find, parse_limit, parse_projection, query_cache, schema_catalog,
+    shape_recorder, strip_fields,
+)
+
+ASYNC_VIEWS = os.getenv("ASYNC_VIEWS", "false").lower() in ("1", "true", "yes")
+
+
+def async_api_view(methods):
+    """Async stand-in for DRF's @api_view (which only wraps sync views): method check + CSRF exemption."""
+    def decorator(view):
+        return csrf_exempt(require_http_methods(methods)(view))
+    return decorator
+
+
+async def _record_shape(*args, **kwargs):
+    """shape_recorder.record on a worker thread: it hashes the filter shape and takes the advisor lock."""
+    await sync_to_async(shape_recorder.record, thread_sensitive=False)(*args, **kwargs)
+
+
+async def _andjson(cursor):
+    """Async renderers.ndjson: one JSON line per document; closes the cursor."""
+    try:
+        async for doc in cursor:
+            yield dumps_line(doc)
+    finally:
+        await cursor.close()
+
+
+async def _andjson_stream(find, limit, sort_key, hidden=()):
+    """Async _ndjson_stream: one JSON line per document, then the trailer; closes the cursor."""
+    last = None
+    sent = 0
+    try:
+        async for doc in find:
+            if sent == limit:
+                yield dumps_line({"next_cursor": encode_cursor(last, sort_key)})
+                return
+            last = doc
+            sent += 1
+            yield dumps_line(strip_fields(dict(doc), hidden) if hidden else doc)
+        yield dumps_line({"next_cursor": None})
+    finally:
+        await find.close()
+
+
+@async_api_view(["GET"])
+async def list_collections(request):
+    """List all collections in MongoDB."""
+    try:
+        collections = await get_async_db().list_collection_names()
+        return JsonResponse({
+            "status": "success",
+            "database": MONGO_DB,
+            "collections": collections
+        })
+    except Exception as e:
+        return JsonResponse({"error": str(e)}, status=500)
+
+
+@async_api_view(["POST"])
+async def query_collection(request):
+    """Query documents with filters and limits (same body keys as views.query_collection)."""
+    try:
+        body = loads(request.body)
+        collection = body.get("collection")
+        filter_ = decode_extended(body.get("filter", {}))
+        try:
+            limit = parse_limit(body.get("limit", 100))
+        except (TypeError, ValueError) as e:
+            return JsonResponse({"error": f"invalid limit: {e}"}, status=400)
+        batch_size = int(body["batch_size"]) if body.get("batch_size") else None
+        projection = parse_projection(body.get("projection"))
+
+        cache_key = None
+        if query_cache and not body.get("stream"):
+            cache_key = await query_cache.akey(collection, filter_, limit=limit, sort=body.get("sort"),
+                                               cursor=body.get("cursor"), projection=projection)
+            cached = await query_cache.aget(cache_key)
+            if cached is not None:
+                return JsonResponse(cached)
+
+        find, sort_key, hidden = paged_find(
+            get_async_db()[collection], filter_, limit,
+            sort=body.get("sort"), cursor=body.get("cursor"), batch_size=batch_size,
+            projection=projection,
+        )
+
+        if body.get("stream"):
+            return StreamingHttpResponse(
+                _andjson_stream(find, limit, sort_key, hidden), content_type="application/x-ndjson"
+            )
+
+        started = time.perf_counter()
+        try:
+            docs = await find.to_list(None)
+        finally:
+            await find.close()
+        if shape_recorder:
+            # The explain runs on the advisor's thread, so it uses the blocking client.
+            await _record_shape(collection, "query", filter_, (time.perf_counter() - started) * 1000,
+                                sort=body.get("sort"),
+                                explain=lambda: paged_find(get_db()[collection], filter_, limit, sort=body.get("sort"),
+                                                           cursor=body.get("cursor"), projection=projection)[0].explain())
+        next_cursor = encode_cursor(docs[limit - 1], sort_key) if len(docs) > limit else None
+        docs = [strip_fields(d, hidden) for d in docs[:limit]] if hidden else docs[:limit]
+
+        payload = dumps({
+            "status": "success",
+            "collection": collection,
+            "documents": docs,
+            "next_cursor": next_cursor
+        })
+        if cache_key:
+            await query_cache.aset(cache_key, payload)
+        return JsonResponse(payload)
+    except Exception as e:
+        return JsonResponse({"error": str(e)}, status=500)
+
+
+@async_api_view(["POST"])
+async def aggregate_collection(request):
+    """Run a whitelisted aggregation pipeline (same body keys as views.aggregate_collection)."""
+    try:
+        body = loads(request.body)
+        collection = body.get("collection")
+        try:
+            pipeline = decode_extended(validate_pipeline(body.get("pipeline", [])))
+            limit = min(parse_limit(body.get("limit", AGGREGATE_MAX_RESULTS)), AGGREGATE_MAX_RESULTS)
+            max_time_ms = min(int(body.get("max_time_ms", AGGREGATE_MAX_TIME_MS)), AGGREGATE_MAX_TIME_MS)
+            batch_size = int(body.get("batch_size", 1000))
+        except (TypeError, ValueError) as e:
+            return JsonResponse({"error": f"invalid aggregation: {e}"}, status=400)
+
+        cursor = get_async_db()[collection].aggregate(
+            pipeline + [{"$limit": limit}],
+            allowDiskUse=True,
+            maxTimeMS=max_time_ms,
+            batchSize=batch_size,
+        )
+        if inspect.isawaitable(cursor):  # AsyncMongoClient; motor returns the cursor directly
+            cursor = await cursor
+
+        if body.get("stream"):
+            return StreamingHttpResponse(_andjson(cursor), content_type="application/x-ndjson")
+
+        try:
+            results = await cursor.to_list(None)
+        finally:
+            await cursor.close()
+        return JsonResponse({
+            "status": "success",
+            "collection": collection,
+            "results": results
+        })
+    except Exception as e:
+        return JsonResponse({"error": str(e)}, status=500)
+
+
+@async_api_view(["POST"])
+async def insert_document(request):
+    """Insert a new document into MongoDB."""
+    try:
+        body = loads(request.body)
+        collection = body.get("collection")
+        document = body.get("document")
+
+        result = await get_async_db()[collection].insert_one(with_vehicle_tokens(document))
+        if query_cache:
+            await query_cache.ainvalidate(collection)
+        await sync_to_async(_catalog_writes, thread_sensitive=False)(collection, inserted=[document])
+        return JsonResponse({
+            "status": "success",
+            "inserted_id": str(result.inserted_id)
+        })
+    except Exception as e:
+        return JsonResponse({"error": str(e)}, status=500)
+
+
+@async_api_view(["POST"])
+async def update_document(request):
+    """Update documents in MongoDB."""
+    try:
+        body = loads(request.body)
+        collection = body.get("collection")
+        filter_ = body.get("filter", {})
+        update = as_update(body.get("update", {}))
+        col = get_async_db()[collection]
+
+        # Capture targets first: the update itself may change whether they match filter_.
+        vehicle_ids = None
+        if touches_vehicles(update):
+            vehicle_ids = [d["_id"] async for d in col.find(filter_, {"_id": 1})]
+
+        started = time.perf_counter()
+        result = await col.update_many(filter_, update)
+        if shape_recorder:
+            await _record_shape(collection, "update", filter_, (time.perf_counter() - started) * 1000,
+                                explain=lambda: get_db()[collection].find(filter_).explain())
+        if vehicle_ids:
+            await sync_to_async(refresh_vehicle_tokens, thread_sensitive=False)(
+                get_db()[collection], {"_id": {"$in": vehicle_ids}})
+        if query_cache:
+            await query_cache.ainvalidate(collection)
+        await sync_to_async(_catalog_writes, thread_sensitive=False)(collection, changes=result.modified_count)
+        return JsonResponse({
+            "status": "success",
+            "matched": result.matched_count,
+            "modified": result.modified_count
+        })
+    except Exception as e:
+        return JsonResponse({"error": str(e)}, status=500)
+
+
+@async_api_view(["POST"])
+async def delete_document(request):
+    """Delete documents matching a filter."""
+    try:
+        body = loads(request.body)
+        collection = body.get("collection")
+        filter_ = body.get("filter", {})
+
+        started = time.perf_counter()
+        result = await get_async_db()[collection].delete_many(filter_)
+        if shape_recorder:
+            await _record_shape(collection, "delete", filter_, (time.perf_counter() - started) * 1000,
+                                explain=lambda: get_db()[collection].find(filter_).explain())
+        if query_cache:
+            await query_cache.ainvalidate(collection)
+        await sync_to_async(_catalog_writes, thread_sensitive=False)(collection, changes=result.deleted_count)
+        return JsonResponse({
+            "status": "success",
+            "deleted_count": result.deleted_count
+        })
+    except Exception as e:
+        return JsonResponse({"error": str(e)}, status=500)
+
+
+@async_api_view(["GET"])
+async def get_collection_info(request, collection):
+    """Document count plus the catalogued schema (see views.get_collection_info)."""
+    try:
+        count = await get_async_db()[collection].estimated_document_count()
+        if schema_catalog:
+            refresh = request.GET.get("refresh", "").lower() in ("1", "true", "yes")
+            # Cached after the first build; that build samples on a worker thread.
+            profile = await sync_to_async(schema_catalog.describe, thread_sensitive=False)(
+                get_db()[collection], refresh=refresh)
+        else:
+            sample = await get_async_db()[collection].find({}, hide_vehicle_tokens(None)).limit(2).to_list(None)
+            profile = {"fields": list(sample[0].keys()) if sample else [], "sample_documents": sample}
+
+        return JsonResponse({
+            "collection": collection,
+            "document_count": count,
+            **profile,
+            "status": "success"
+        })
+    except Exception as e:
+        return JsonResponse({"error": str(e)}, status=500)
+
+
+@async_api_view(["POST"])
+async def export_collection(request):
+    """Stream filtered documents as JSON (default), NDJSON, CSV or Parquet (see views.export_collection)."""
+    try:
+        body = loads(request.body)
+        collection = body.get("collection")
+        filter_ = decode_extended(body.get("filter", {}))
+        fmt = body.get("format", "json")
+        compression = body.get("compression")
+
+        stream = astream_export(
+            get_async_db()[collection], filter_, fmt=fmt, fields=body.get("projection") or body.get("fields"),
+            compression=compression,
+            chunk_size=int(body.get("chunk_size", DEFAULT_CHUNK_SIZE)),
+        )
+        content_type, filename = content_headers(collection, fmt, compression)
+        response = StreamingHttpResponse(stream, content_type=content_type)
+        if fmt != "json" or compression:
+            response["Content-Disposition"] = f'attachment; filename="{filename}"'
+        return response
+    except Exception as e:
+        return JsonResponse({"error": str(e)}, status=500)
+
+
+@async_api_view(["GET", "POST", "DELETE"])
+async def collection_indexes(request, collection):
+    """List, create or drop indexes (see views.collection_indexes)."""
+    try:
+        col = get_async_db()[collection]
+        if request.method == "POST":
+            body = loads(request.body)
+            options = {"unique": bool(body.get("unique", False))}
+            if body.get("name"):
+                options["name"] = body["name"]
+            name = await col.create_index(_parse_index_keys(body.get("keys")), **options)
+            return JsonResponse({"status": "success", "collection": collection, "created": name})
+        if request.method == "DELETE":
+            name = request.GET.get("name")
+            if not name or name == "_id_":
+                return JsonResponse({"error": "name query parameter (not _id_) is required"}, status=400)
+            await col.drop_index(name)
+            return JsonResponse({"status": "success", "collection": collection, "dropped": name})
+        return JsonResponse({
+            "status": "success",
+            "collection": collection,
+            "indexes": await col.index_information()
+        })
+    except Exception as e:
+        return JsonResponse({"error": str(e)}, status=500)
+
+
+@async_api_view(["GET"])
+async def health(request):
+    """Simple health check for Django ↔ MongoDB."""
+    try:
+        await get_async_client().admin.command("ping")
+        return JsonResponse({"status": "healthy", "mongo_db": MONGO_DB})
+    except Exception as e:
+        return JsonResponse({"status": "unhealthy", "error": str(e)}, status=500)
@@ -0,0 +1,158 @@
+# bulk.py - Mixed insert/update/delete batches for /collections/bulk/
+# Operations are converted to pymongo write models and sent as unordered bulk_write calls of
+# at most `chunk_size` ops, so a load of thousands of documents costs a handful of round trips.
+# One bad op never aborts the batch: it is reported in its own per-op result.
+
+import os
+
+from pymongo import DeleteMany, DeleteOne, InsertOne, UpdateMany, UpdateOne
+from pymongo.errors import BulkWriteError
+
+from .renderers import loads
+from .vehicles import refresh_vehicle_tokens, touches_vehicles, with_vehicle_tokens
+
+BULK_CHUNK_SIZE = int(os.getenv("BULK_CHUNK_SIZE", "1000"))
+BULK_MAX_CHUNK_SIZE = int(os.getenv("BULK_MAX_CHUNK_SIZE", "10000"))
+
+BULK_OPS = ("insert", "update", "delete")
+
+
+def as_update(update):
+    """Plain field dicts are treated as $set, like /collections/update/."""
+    if not any(k.startswith("$") for k in update):
+        return {"$set": update}
+    return update
+
+
+def to_request(op):
+    """
+    Translate one {"op": ...} entry into (kind, write model, payload) where payload is the
+    inserted document or the update document. Raises ValueError if the entry is malformed.
+    """
+    if isinstance(op, Exception):
+        raise op
+    if not isinstance(op, dict):
+        raise ValueError("Operation must be an object")
+    kind = op.get("op")
+    if kind == "insert":
+        document = op.get("document")
+        if not isinstance(document, dict):
+            raise ValueError("insert requires a 'document' object")
+        document = with_vehicle_tokens(document)
+        return kind, InsertOne(document), document
+    if kind not in BULK_OPS:
+        raise ValueError(f"Unknown op {kind!r}; expected one of {', '.join(BULK_OPS)}")
+    filter_ = op.get("filter", {})
+    if not isinstance(filter_, dict):
+        raise ValueError(f"{kind} requires a 'filter' object")
+    many = bool(op.get("many", True))
+    if kind == "delete":
+        return kind, (DeleteMany if many else DeleteOne)(filter_), None
+    update = op.get("update")
+    if not isinstance(update, dict) or not update:
+        raise ValueError("update requires a non-empty 'update' object")
+    update = as_update(update)
+    return kind, (UpdateMany if many else UpdateOne)(filter_, update, upsert=bool(op.get("upsert"))), update
+
+
+def iter_ndjson_ops(readline):
+    """Yield one op per non-blank NDJSON line; unparsable lines yield the ValueError instead."""
+    for line in iter(readline, b""):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield loads(line)
+        except ValueError as e:
+            yield ValueError(f"Invalid JSON: {e}")
+
+
+def _chunks(ops, chunk_size):
+    chunk = []
+    for index, op in enumerate(ops):
+        chunk.append((index, op))
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _write_chunk(col, chunk, results, totals):
+    requests, prepared, refresh_filters = [], [], []
+    for index, op in chunk:
+        try:
+            kind, request, payload = to_request(op)
+        except ValueError as e:
+            results.append({"index": index, "op": op.get("op") if isinstance(op, dict) else None,
+                            "ok": False, "error": str(e)})
+            totals["failed"] += 1
+            continue
+        vehicles = kind == "update" and touches_vehicles(payload)
+        if vehicles:
+            # Capture targets first: the update itself may change whether they match.
+            ids = [d["_id"] for d in col.find(op.get("filter", {}), {"_id": 1})]
+            if ids:
+                refresh_filters.append({"_id": {"$in": ids}})
+        requests.append(request)
+        prepared.append((index, kind, payload, vehicles))
+    if not requests:
+        return
+
+    errors = {}
+    try:
+        result = col.bulk_write(requests, ordered=False)
+        counts = {
+            "inserted": result.inserted_count, "matched": result.matched_count,
+            "modified": result.modified_count, "deleted": result.deleted_count,
+            "upserted": result.upserted_count,
+        }
+        upserted = result.upserted_ids or {}
+    except BulkWriteError as e:
+        details = e.details
+        errors = {err["index"]: err for err in details.get("writeErrors", [])}
+        counts = {
+            "inserted": details.get("nInserted", 0), "matched": details.get("nMatched", 0),
+            "modified": details.get("nModified", 0), "deleted": details.get("nRemoved", 0),
+            "upserted": details.get("nUpserted", 0),
+        }
+        upserted = {u["index"]: u["_id"] for u in details.get("upserted", [])}
+    for key, value in counts.items():
+        totals[key] += value
+
+    for pos, (index, kind, payload, vehicles) in enumerate(prepared):
+        entry = {"index": index, "op": kind, "ok": pos not in errors}
+        if pos in errors:
+            entry.update(error=errors[pos].get("errmsg"), code=errors[pos].get("code"))
+            totals["failed"] += 1
+        elif kind == "insert":
+            entry["inserted_id"] = str(payload["_id"])  # assigned client-side by bulk_write
+        elif pos in upserted:
+            entry["upserted_id"] = str(upserted[pos])
+            if vehicles:
+                refresh_filters.append({"_id": upserted[pos]})
+        results.append(entry)
+
+    for filter_ in refresh_filters:
+        refresh_vehicle_tokens(col, filter_)
+
+
+def run_bulk(col, ops, chunk_size=BULK_CHUNK_SIZE, errors_only=False, on_chunk=None):
+    """
+    Execute an iterable of ops chunk by chunk. Returns (totals, per-op results); with
+    errors_only=True only failed ops are listed. `on_chunk` runs after every written chunk
+    (the view uses it to invalidate the query cache).
+    """
+    chunk_size = max(1, min(int(chunk_size), BULK_MAX_CHUNK_SIZE))
+    totals = dict.fromkeys(("ops", "chunks", "inserted", "matched", "modified", "deleted", "upserted", "failed"), 0)
+    results = []
+    for chunk in _chunks(ops, chunk_size):
+        chunk_results = []
+        _write_chunk(col, chunk, chunk_results, totals)
+        chunk_results.sort(key=lambda r: r["index"])
+        totals["ops"] += len(chunk)
+        totals["chunks"] += 1
+        if on_chunk:
+            on_chunk()
+        results += [r for r in chunk_results if not r["ok"]] if errors_only else chunk_results
+    return totals, results
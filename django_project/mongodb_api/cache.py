@@ -0,0 +1,356 @@
+# cache.py - Read-through result cache for /collections/query/
+# Entries are keyed by (collection, normalized filter, limit, sort, cursor, projection) and
+# namespaced by a per-collection generation number: writes bump the generation, which
+# invalidates every cached result for that collection at once on any backend.
+# Only the worker that served a write bumps its own generation, so a per-process cache is
+# only coherent with a single worker, or when a change stream invalidates every worker.
+
+import hashlib
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from asgiref.sync import sync_to_async
+from bson import json_util
+from pymongo.errors import PyMongoError
+
+QUERY_CACHE_BACKEND = os.getenv("QUERY_CACHE_BACKEND", "auto")  # auto | local | django | off
+QUERY_CACHE_TTL = float(os.getenv("QUERY_CACHE_TTL", "30"))
+QUERY_CACHE_MAX_ENTRIES = int(os.getenv("QUERY_CACHE_MAX_ENTRIES", "1024"))
+QUERY_CACHE_ALIAS = os.getenv("QUERY_CACHE_ALIAS", "default")
+# Accept a per-process cache with several workers anyway (read-only deployments, benchmarks)
+QUERY_CACHE_ALLOW_STALE = os.getenv("QUERY_CACHE_ALLOW_STALE", "false").lower() in ("1", "true", "yes")
+CHANGE_STREAM_MAX_RETRIES = int(os.getenv("CHANGE_STREAM_MAX_RETRIES", "8"))
+CHANGE_STREAM_MAX_BACKOFF = float(os.getenv("CHANGE_STREAM_MAX_BACKOFF", "30"))
+_NO_CHANGE_STREAMS = {40573}  # "$changeStream is only supported on replica sets"
+_HISTORY_LOST = 286  # ChangeStreamHistoryLost: the resume point fell off the oplog
+
+log = logging.getLogger("mongodb_api.cache")
+
+
+def normalize_filter(value, top_level=True):
+    """
+    Canonical form of a Mongo filter for hashing. Key order is irrelevant at the top level
+    and inside operator objects ({"$gt": 1, "$lt": 5}), but significant for embedded-document
+    equality, so those are left as given.
+    """
+    if isinstance(value, dict):
+        items = [(k, normalize_filter(v, False)) for k, v in value.items()]
+        if top_level or all(k.startswith("$") for k in value):
+            items.sort(key=lambda kv: kv[0])
+        return [[k, v] for k, v in items]
+    if isinstance(value, list):
+        return [normalize_filter(v, False) for v in value]
+    return value
+
+
+class LocalLRUCache:
+    """In-process TTL + LRU backend (per worker process)."""
+
+    name = "local"
+
+    def __init__(self, max_entries=QUERY_CACHE_MAX_ENTRIES, ttl=QUERY_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._generations = {}
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def generation(self, collection):
+        with self._lock:
+            return self._generations.get(collection, 0)
+
+    def bump_generation(self, collection):
+        with self._lock:
+            self._generations[collection] = self._generations.get(collection, 0) + 1
+            # Stale generations can never be hit again; free their memory now.
+            prefix = f"{collection}:"
+            for key in [k for k in self._data if k.startswith(prefix)]:
+                del self._data[key]
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def size(self):
+        return len(self._data)
+
+    # In memory, so the async API (used by the async views) never blocks.
+    async def ageneration(self, collection):
+        return self.generation(collection)
+
+    async def abump_generation(self, collection):
+        self.bump_generation(collection)
+
+    async def aget(self, key):
+        return self.get(key)
+
+    async def aset(self, key, value):
+        self.set(key, value)
+
+
+class DjangoCacheBackend:
+    """Shared backend on top of a Django cache alias (e.g. Redis or Memcached in settings.CACHES)."""
+
+    name = "django"
+
+    def __init__(self, alias=QUERY_CACHE_ALIAS, ttl=QUERY_CACHE_TTL):
+        from django.core.cache import caches
+
+        self._cache = caches[alias]
+        self.ttl = ttl
+        self.evictions = 0  # eviction is handled (and counted) by the cache server
+
+    def _gen_key(self, collection):
+        return f"qc:gen:{collection}"
+
+    def generation(self, collection):
+        return self._cache.get(self._gen_key(collection), 0)
+
+    def bump_generation(self, collection):
+        key = self._gen_key(collection)
+        self._cache.add(key, 0, timeout=None)
+        try:
+            self._cache.incr(key)
+        except ValueError:
+            self._cache.set(key, 1, timeout=None)
+
+    def get(self, key):
+        return self._cache.get(f"qc:{key}")
+
+    def set(self, key, value):
+        self._cache.set(f"qc:{key}", value, timeout=self.ttl)
+
+    def size(self):
+        return None
+
+    # Django's async cache API, so async views don't block the event loop on the cache server.
+    async def ageneration(self, collection):
+        return await self._cache.aget(self._gen_key(collection), 0)
+
+    async def abump_generation(self, collection):
+        key = self._gen_key(collection)
+        await self._cache.aadd(key, 0, timeout=None)
+        try:
+            await self._cache.aincr(key)
+        except ValueError:
+            await self._cache.aset(key, 1, timeout=None)
+
+    async def aget(self, key):
+        return await self._cache.aget(f"qc:{key}")
+
+    async def aset(self, key, value):
+        await self._cache.aset(f"qc:{key}", value, timeout=self.ttl)
+
+
+class QueryCache:
+    """Read-through facade with hit/miss counters used by the query view."""
+
+    def __init__(self, backend, needs_change_stream=False):
+        self.backend = backend
+        # Per-process cache kept coherent across workers only by the change stream.
+        self.needs_change_stream = needs_change_stream
+        self.disabled = None  # reason, once the cache can no longer be trusted
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._lock = threading.Lock()
+
+    def disable(self, reason):
+        """Stop serving and storing results (every lookup becomes a miss)."""
+        self.disabled = reason
+        log.error("Query cache disabled: %s", reason)
+
+    @staticmethod
+    def _digest(filter_, params):
+        blob = json_util.dumps([normalize_filter(filter_ or {}), sorted(params.items())])
+        return hashlib.sha256(blob.encode()).hexdigest()
+
+    def key(self, collection, filter_, **params):
+        return f"{collection}:{self.backend.generation(collection)}:{self._digest(filter_, params)}"
+
+    def _count(self, value):
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def get(self, key):
+        return self._count(None if self.disabled else self.backend.get(key))
+
+    def set(self, key, value):
+        if not self.disabled:
+            self.backend.set(key, value)
+
+    def invalidate(self, collection):
+        self.backend.bump_generation(collection)
+        with self._lock:
+            self.invalidations += 1
+
+    # Async counterparts for the async views.
+    async def akey(self, collection, filter_, **params):
+        # Normalizing and hashing a large filter is CPU work; keep it off the event loop.
+        digest = await sync_to_async(self._digest, thread_sensitive=False)(filter_, params)
+        return f"{collection}:{await self.backend.ageneration(collection)}:{digest}"
+
+    async def aget(self, key):
+        return self._count(None if self.disabled else await self.backend.aget(key))
+
+    async def aset(self, key, value):
+        if not self.disabled:
+            await self.backend.aset(key, value)
+
+    async def ainvalidate(self, collection):
+        await self.backend.abump_generation(collection)
+        with self._lock:
+            self.invalidations += 1
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "backend": self.backend.name,
+            "disabled": self.disabled,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "invalidations": self.invalidations,
+            "evictions": self.backend.evictions,
+            "entries": self.backend.size(),
+            "ttl_seconds": self.backend.ttl,
+        }
+
+
+def worker_count():
+    """Worker processes serving the API: WEB_CONCURRENCY, or None when it is not set."""
+    value = os.getenv("WEB_CONCURRENCY")
+    return int(value) if value else None
+
+
+def build_query_cache(backend=QUERY_CACHE_BACKEND, change_stream=False, workers=None):
+    """
+    Return a QueryCache for the configured backend, or None when caching is off.
+
+    A per-process cache (`local`, or `django` on a process-local cache such as LocMemCache) is
+    only used with a single worker or a change stream, since writes served by one worker
+    would leave the others returning stale rows until the TTL expires. `auto` picks `local`
+    when that is safe and turns caching off otherwise.
+    """
+    if backend == "off":
+        return None
+    workers = worker_count() if workers is None else workers
+    coherent = workers == 1 or change_stream or QUERY_CACHE_ALLOW_STALE
+    # Coherent only while the change stream runs; it disables the cache if it stops for good.
+    needs_stream = not (workers == 1 or QUERY_CACHE_ALLOW_STALE)
+    if backend == "django":
+        cache = QueryCache(DjangoCacheBackend())
+        process_local = type(cache.backend._cache).__name__ in ("LocMemCache", "DummyCache")
+        if process_local and not coherent:
+            log.warning("Query cache disabled: the %r Django cache is per process and there are %s workers; "
+                        "configure a shared cache (e.g. REDIS_URL) or MONGO_CHANGE_STREAM",
+                        QUERY_CACHE_ALIAS, workers or "several")
+            return None
+        cache.needs_change_stream = process_local and needs_stream
+        return cache
+    if not coherent:
+        if backend == "local":
+            log.warning("Query cache disabled: QUERY_CACHE_BACKEND=local with %s workers would serve stale "
+                        "results after writes; use QUERY_CACHE_BACKEND=django with a shared cache, "
+                        "MONGO_CHANGE_STREAM=true or WEB_CONCURRENCY=1", workers or "several")
+        return None
+    return QueryCache(LocalLRUCache(), needs_change_stream=needs_stream)
+
+
+class ChangeStreamInvalidator:
+    """
+    Invalidate cached results for writes made outside this API (requires a replica set).
+    A daemon thread watches the whole database; every change event is also passed to
+    `listeners` (e.g. the schema catalog). `query_cache` may be None.
+
+    Errors are logged and the stream is reopened with exponential backoff, resuming after
+    the last event seen so nothing is missed. If the server no longer has that point in its
+    oplog, every collection is invalidated and watching restarts from now. When the stream
+    cannot be (re)opened after `max_retries` attempts, or the deployment has no change
+    streams, the watcher stops: `alive` turns False (the views then track catalog writes
+    themselves) and a cache that depended on it is disabled.
+    """
+
+    def __init__(self, query_cache, *listeners, max_retries=CHANGE_STREAM_MAX_RETRIES,
+                 max_backoff=CHANGE_STREAM_MAX_BACKOFF):
+        self.query_cache = query_cache
+        self.listeners = listeners
+        self.max_retries = max_retries
+        self.max_backoff = max_backoff
+        self.alive = True
+        self.thread = None
+
+    def start(self, db):
+        self.thread = threading.Thread(target=self._watch, args=(db,), name="query-cache-change-stream", daemon=True)
+        self.thread.start()
+        return self.thread
+
+    def _invalidate_all(self, db):
+        if self.query_cache:
+            for name in db.list_collection_names():
+                self.query_cache.invalidate(name)
+
+    def _watch(self, db):
+        resume_token = None
+        failures = 0
+        while True:
+            try:
+                with db.watch(resume_after=resume_token) as stream:
+                    failures = 0
+                    resume_token = stream.resume_token
+                    for change in stream:
+                        ns = change.get("ns", {})
+                        if self.query_cache and ns.get("coll"):
+                            self.query_cache.invalidate(ns["coll"])
+                        for listener in self.listeners:
+                            listener(change)
+                        resume_token = stream.resume_token
+            except PyMongoError as e:
+                code = getattr(e, "code", None)
+                if code in _NO_CHANGE_STREAMS:
+                    return self._stop(f"change streams are unavailable ({e})")
+                failures += 1
+                if code == _HISTORY_LOST:
+                    log.warning("Change stream resume point is gone; invalidating every collection")
+                    resume_token = None
+                    try:
+                        self._invalidate_all(db)
+                    except PyMongoError:
+                        pass  # the reconnect below fails too and is retried
+                if failures > self.max_retries:
+                    return self._stop(f"change stream failed {failures} times in a row ({e})")
+                delay = min(self.max_backoff, 2 ** (failures - 1))
+                log.warning("Change stream error (%s); reconnecting in %ss", e, delay)
+                time.sleep(delay)
+            except Exception as e:  # a broken listener: same outcome as a dead stream
+                return self._stop(f"change stream watcher crashed ({e!r})")
+
+    def _stop(self, reason):
+        self.alive = False
+        log.error("Change stream stopped: %s", reason)
+        if self.query_cache and self.query_cache.needs_change_stream:
+            self.query_cache.disable(f"{reason}; other workers' writes would not invalidate it")
@@ -0,0 +1,359 @@
+# catalog.py - Per-collection schema and statistics catalog
+# A profile is built from a $sample scan (or a full read of small collections): every dotted
+# field path with its BSON types, presence and null rates, a distinct-count estimate, the most
+# common values of low-cardinality fields, and min/max/mean/histogram for numeric fields.
+# Inserts seen by the API are folded in incrementally; updates and deletes only mark the
+# profile dirty, and it is rebuilt in the background once enough has changed or it expires.
+# Sampled documents are weighted by (collection size / sample size) so that both sources
+# contribute to the same estimated counts.
+
+import math
+import os
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+from bson import Decimal128, ObjectId
+
+from .vehicles import hide_vehicle_tokens, without_vehicle_tokens
+
+CATALOG_ENABLED = os.getenv("CATALOG_ENABLED", "true").lower() in ("1", "true", "yes")
+CATALOG_SAMPLE_SIZE = int(os.getenv("CATALOG_SAMPLE_SIZE", "1000"))
+CATALOG_TTL = float(os.getenv("CATALOG_TTL", "600"))
+CATALOG_REFRESH_FRACTION = float(os.getenv("CATALOG_REFRESH_FRACTION", "0.1"))
+CATALOG_MAX_FIELDS = int(os.getenv("CATALOG_MAX_FIELDS", "300"))
+CATALOG_MAX_DEPTH = int(os.getenv("CATALOG_MAX_DEPTH", "6"))
+CATALOG_MAX_DISTINCT = int(os.getenv("CATALOG_MAX_DISTINCT", "5000"))
+CATALOG_TOP_VALUES = int(os.getenv("CATALOG_TOP_VALUES", "20"))
+CATALOG_HISTOGRAM_BINS = int(os.getenv("CATALOG_HISTOGRAM_BINS", "10"))
+CATALOG_SAMPLE_DOCUMENTS = 2
+
+
+def bson_type(value):
+    if value is None:
+        return "null"
+    if isinstance(value, bool):
+        return "bool"
+    if isinstance(value, int):
+        return "int" if -2**31 <= value < 2**31 else "long"
+    if isinstance(value, float):
+        return "double"
+    if isinstance(value, str):
+        return "string"
+    if isinstance(value, dict):
+        return "object"
+    if isinstance(value, list):
+        return "array"
+    if isinstance(value, ObjectId):
+        return "objectId"
+    if isinstance(value, datetime):
+        return "date"
+    if isinstance(value, Decimal128):
+        return "decimal"
+    return type(value).__name__
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value)
+
+
+def iter_paths(doc, prefix="", depth=0):
+    """Yield (dotted path, value) for every field; array elements share the array's path."""
+    for key, value in doc.items():
+        path = f"{prefix}{key}"
+        yield path, value
+        if depth + 1 >= CATALOG_MAX_DEPTH:
+            continue
+        if isinstance(value, dict):
+            yield from iter_paths(value, path + ".", depth + 1)
+        elif isinstance(value, list):
+            for item in value:
+                if isinstance(item, dict):
+                    yield from iter_paths(item, path + ".", depth + 1)
+
+
+class FieldStats:
+    """Weighted statistics for one field path."""
+
+    __slots__ = ("present", "nulls", "types", "values", "values_seen", "overflow",
+                 "num_weight", "num_sum", "num_min", "num_max", "edges", "bins", "_pending")
+
+    def __init__(self):
+        self.present = 0.0        # estimated documents containing the path
+        self.nulls = 0.0
+        self.types = Counter()
+        self.values = Counter()   # scalar value -> occurrences observed (unweighted)
+        self.values_seen = 0      # observations behind `values` (the distinct-estimate sample)
+        self.overflow = False     # stopped tracking new distinct values
+        self.num_weight = 0.0
+        self.num_sum = 0.0
+        self.num_min = None
+        self.num_max = None
+        self.edges = None         # histogram bin edges, fixed when the profile is built
+        self.bins = None
+        self._pending = []        # numeric (value, weight) seen before the edges exist
+
+    def add(self, value, weight):
+        kind = bson_type(value)
+        self.types[kind] += weight
+        if value is None:
+            self.nulls += weight
+            return
+        scalars = [v for v in value if not isinstance(v, (dict, list))] if isinstance(value, list) else (
+            [] if isinstance(value, dict) else [value])
+        for v in scalars:
+            self._add_scalar(v, weight)
+
+    def _add_scalar(self, value, weight):
+        key = int(value) if isinstance(value, float) and value.is_integer() else value
+        try:
+            hash(key)
+        except TypeError:
+            key = str(value)
+        self.values_seen += 1
+        if key in self.values or len(self.values) < CATALOG_MAX_DISTINCT:
+            self.values[key] += 1
+        else:
+            self.overflow = True
+        if _is_number(value):
+            self.num_weight += weight
+            self.num_sum += value * weight
+            self.num_min = value if self.num_min is None else min(self.num_min, value)
+            self.num_max = value if self.num_max is None else max(self.num_max, value)
+            if self.edges is None:
+                self._pending.append((value, weight))
+                if len(self._pending) >= CATALOG_SAMPLE_SIZE:  # field first seen after the build
+                    self.freeze_histogram()
+            else:
+                self._bin(value, weight)
+
+    def _bin(self, value, weight):
+        edges = self.edges
+        if len(edges) == 1:
+            self.bins[0] += weight
+            return
+        width = (edges[-1] - edges[0]) / (len(edges) - 1)
+        i = int((value - edges[0]) / width) if width else 0
+        self.bins[min(max(i, 0), len(self.bins) - 1)] += weight  # out-of-range values land in the end bins
+
+    def freeze_histogram(self, bins=CATALOG_HISTOGRAM_BINS):
+        """Fix equal-width edges over the sampled range and bin the pending values."""
+        if self.num_min is None or self.edges is not None:
+            return
+        lo, hi = self.num_min, self.num_max
+        if lo == hi:
+            self.edges, self.bins = [lo], [0.0]
+        else:
+            step = (hi - lo) / bins
+            self.edges = [lo + step * i for i in range(bins)] + [hi]
+            self.bins = [0.0] * bins
+        for value, weight in self._pending:
+            self._bin(value, weight)
+        self._pending = []
+
+    def distinct_estimate(self, population):
+        """
+        Chao1 estimate from the sample's frequency counts: distinct values seen plus
+        f1^2 / (2 * f2) unseen ones, where f1/f2 count values seen once/twice. A sample with
+        no repeats at all looks like a key, so it is estimated as one value per document.
+        """
+        if not self.values_seen:
+            return 0
+        if self.overflow or self.values_seen >= population:
+            seen = len(self.values)
+            return seen if not self.overflow else int(round(max(population, seen)))
+        freq = Counter(self.values.values())
+        singles, doubles = freq.get(1, 0), freq.get(2, 0)
+        if doubles:
+            estimate = len(self.values) + singles * singles / (2 * doubles)
+        else:
+            estimate = population if singles == len(self.values) else len(self.values) + singles * (singles - 1) / 2
+        return int(round(min(max(estimate, len(self.values)), max(population, len(self.values)))))
+
+    def summary(self, total):
+        total = total or 1.0
+        out = {
+            "types": {t: round(w / self.present, 4) for t, w in self.types.most_common()} if self.present else {},
+            "presence": round(self.present / total, 4),
+            "null_rate": round((total - self.present + self.nulls) / total, 4),
+        }
+        if self.values_seen:
+            out["cardinality"] = self.distinct_estimate(self.present)
+            out["cardinality_exact"] = not self.overflow and self.present <= self.values_seen
+            repeated = self.values and self.values.most_common(1)[0][1] > 1
+            if repeated and len(self.values) <= CATALOG_TOP_VALUES and not self.overflow:
+                seen = self.values_seen
+                out["top_values"] = [[_plain(v), round(c / seen, 4)] for v, c in self.values.most_common()]
+        if self.num_weight:
+            if self.edges is None:
+                self.freeze_histogram()
+            numeric = {
+                "min": self.num_min,
+                "max": self.num_max,
+                "mean": round(self.num_sum / self.num_weight, 4),
+            }
+            if self.edges:
+                if len(self.edges) == 1:
+                    numeric["histogram"] = [{"min": self.edges[0], "max": self.edges[0], "count": round(self.bins[0])}]
+                else:
+                    numeric["histogram"] = [
+                        {"min": round(self.edges[i], 4), "max": round(self.edges[i + 1], 4), "count": round(c)}
+                        for i, c in enumerate(self.bins)
+                    ]
+            out["numeric"] = numeric
+        return out
+
+
+def _plain(value):
+    return value if isinstance(value, (str, int, float, bool)) else str(value)
+
+
+class CollectionProfile:
+    """Statistics for one collection; not thread-safe on its own (SchemaCatalog locks it)."""
+
+    def __init__(self, collection, estimated_count, sample_docs):
+        self.collection = collection
+        self.built_at = time.time()
+        self.built_count = estimated_count
+        self.sampled = len(sample_docs)
+        self.total = 0.0          # estimated documents represented
+        self.observed_inserts = 0
+        self.dirty = 0            # updates/deletes since the build
+        self.fields = {}
+        self.samples = [without_vehicle_tokens(d) for d in sample_docs[:CATALOG_SAMPLE_DOCUMENTS]]
+        weight = estimated_count / len(sample_docs) if sample_docs else 1.0
+        for doc in sample_docs:
+            self.add(doc, weight)
+        for stats in self.fields.values():
+            stats.freeze_histogram()
+
+    def add(self, doc, weight=1.0):
+        self.total += weight
+        seen = set()
+        for path, value in iter_paths(without_vehicle_tokens(doc)):
+            stats = self.fields.get(path)
+            if stats is None:
+                if len(self.fields) >= CATALOG_MAX_FIELDS:
+                    continue
+                stats = self.fields[path] = FieldStats()
+            if path not in seen:
+                stats.present += weight
+                seen.add(path)
+            stats.add(value, weight)
+
+    def observe_insert(self, doc):
+        self.add(doc)
+        self.observed_inserts += 1
+
+    def stale(self, ttl=CATALOG_TTL, fraction=CATALOG_REFRESH_FRACTION):
+        too_old = time.time() - self.built_at > ttl
+        too_dirty = self.dirty > fraction * max(self.built_count, 1)
+        return too_old or too_dirty
+
+    def summary(self):
+        return {
+            "fields": sorted(self.fields),
+            "schema": {path: s.summary(self.total) for path, s in sorted(self.fields.items())},
+            "catalog": {
+                "sampled_documents": self.sampled,
+                "observed_inserts": self.observed_inserts,
+                "pending_changes": self.dirty,
+                "estimated_documents": int(round(self.total)),
+                "built_at": datetime.fromtimestamp(self.built_at, timezone.utc).isoformat(),
+                "age_seconds": round(time.time() - self.built_at, 1),
+            },
+            "sample_documents": self.samples,
+        }
+
+
+def build_profile(col, sample_size=CATALOG_SAMPLE_SIZE):
+    """Scan a random sample ($sample) of the collection, or all of it when it is small."""
+    estimated = col.estimated_document_count()
+    if estimated > sample_size:
+        pipeline = [{"$sample": {"size": sample_size}}, {"$project": hide_vehicle_tokens(None)}]
+        docs = list(col.aggregate(pipeline, allowDiskUse=True))
+    else:
+        docs = list(col.find({}, hide_vehicle_tokens(None)).limit(sample_size))
+        estimated = len(docs)
+    return CollectionProfile(col.name, estimated, docs)
+
+
+class SchemaCatalog:
+    """Cached profiles per collection with background refresh."""
+
+    def __init__(self, ttl=CATALOG_TTL, sample_size=CATALOG_SAMPLE_SIZE):
+        self.ttl = ttl
+        self.sample_size = sample_size
+        self._profiles = {}
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        self._builder = ThreadPoolExecutor(max_workers=1, thread_name_prefix="schema-catalog")
+
+    def describe(self, col, refresh=False):
+        """
+        Summary for `col`. Built synchronously the first time (or with refresh=True);
+        afterwards a stale profile is served as-is while a rebuild runs in the background.
+        """
+        name = col.name
+        with self._lock:
+            profile = self._profiles.get(name)
+        if profile is None or refresh:
+            profile = build_profile(col, self.sample_size)
+            with self._lock:
+                self._profiles[name] = profile
+        elif profile.stale(self.ttl):
+            self._schedule(col)
+        with self._lock:
+            return profile.summary()
+
+    def _schedule(self, col):
+        with self._lock:
+            if col.name in self._refreshing:
+                return
+            self._refreshing.add(col.name)
+        self._builder.submit(self._rebuild, col)
+
+    def _rebuild(self, col):
+        try:
+            profile = build_profile(col, self.sample_size)
+            with self._lock:
+                self._profiles[col.name] = profile
+        except Exception:
+            pass  # keep serving the previous profile; the next stale read retries
+        finally:
+            with self._lock:
+                self._refreshing.discard(col.name)
+
+    def observe_insert(self, collection, docs):
+        """Fold newly inserted documents into an existing profile."""
+        with self._lock:
+            profile = self._profiles.get(collection)
+            if profile is not None:
+                for doc in docs:
+                    profile.observe_insert(doc)
+
+    def mark_dirty(self, collection, changes=1):
+        """Record updates/deletes that the incremental path cannot account for."""
+        with self._lock:
+            profile = self._profiles.get(collection)
+            if profile is not None:
+                profile.dirty += changes
+
+    def observe_change(self, change):
+        """Change-stream listener: inserts are folded in, everything else marks the profile dirty."""
+        coll = change.get("ns", {}).get("coll")
+        if not coll:
+            return
+        if change.get("operationType") == "insert" and change.get("fullDocument") is not None:
+            self.observe_insert(coll, [change["fullDocument"]])
+        elif change.get("operationType") in ("drop", "rename", "dropDatabase"):
+            with self._lock:
+                self._profiles.pop(coll, None)
+        else:
+            self.mark_dirty(coll)
+
+    def forget(self, collection):
+        with self._lock:
+            self._profiles.pop(collection, None)
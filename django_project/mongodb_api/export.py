@@ -0,0 +1,344 @@
+# export.py - Streaming export engine for /collections/export/
+# Documents are read from the Mongo cursor in fixed-size chunks and encoded chunk by chunk,
+# so memory stays bounded by `chunk_size` regardless of how many rows are exported.
+
+import csv
+import io
+import zlib
+from itertools import islice
+
+from .renderers import bson_default, dumps
+from .vehicles import hide_vehicle_tokens
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet export is optional
+    pa = None
+    pq = None
+
+try:
+    import zstandard
+except ImportError:  # zstd compression is optional
+    zstandard = None
+
+
+EXPORT_FORMATS = {
+    "json": ("application/json", "json"),
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "csv": ("text/csv", "csv"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+}
+COMPRESSIONS = {
+    "gzip": ("application/gzip", "gz"),
+    "zstd": ("application/zstd", "zst"),
+}
+DEFAULT_CHUNK_SIZE = 5000
+
+
+def _jsonable(value):
+    """Scalar-or-string form of a BSON value for CSV/Parquet cells."""
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    if isinstance(value, (dict, list)):
+        return dumps(value).decode()
+    return str(bson_default(value))
+
+
+def _get_path(doc, path):
+    """Value at a dotted path ("vehicles.four_wheeler.type"), or None where it is missing."""
+    value = doc
+    for part in path.split("."):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(part)
+    return value
+
+
+def _flat_row(doc, fields=None):
+    """One CSV/Parquet row: the projected (possibly dotted) fields, or else the top-level keys."""
+    if fields is None:
+        return {k: _jsonable(v) for k, v in doc.items()}
+    return {f: _jsonable(doc[f] if f in doc else _get_path(doc, f)) for f in fields}
+
+
+def _late_columns(fmt, rows, columns):
+    """Keys first seen after the columns were fixed can't be added; fail instead of dropping them."""
+    known = set(columns)
+    late = sorted({k for r in rows for k in r if k not in known})
+    if late:
+        raise ValueError(f"{fmt} export: field(s) {', '.join(late)} first appear after the first chunk; "
+                         "pass a projection listing the columns")
+
+
+def iter_chunks(col, filter_, projection=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Yield lists of at most `chunk_size` documents from a batched cursor."""
+    cursor = col.find(filter_, projection).batch_size(chunk_size)
+    while True:
+        chunk = list(islice(cursor, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+# ================= Format encoders (chunks of docs -> bytes) =================
+# Encoders are push-style (feed a chunk, get its bytes; close() for the trailer) so the same
+# encoding runs over a blocking pymongo cursor (stream_export) or an async one (astream_export).
+class JSONEncoder:
+    """Legacy JSON envelope, streamed: {"status": ..., "data": [...], "rows": N}."""
+
+    def __init__(self, fields=None):
+        self.rows = 0
+
+    def feed(self, chunk):
+        head = b'{"status": "success", "data": [' if not self.rows else b", "
+        self.rows += len(chunk)
+        return head + b", ".join(dumps(d) for d in chunk)
+
+    def close(self):
+        head = b"" if self.rows else b'{"status": "success", "data": ['
+        return head + f'], "rows": {self.rows}}}'.encode()
+
+
+class NDJSONEncoder:
+    def __init__(self, fields=None):
+        pass
+
+    def feed(self, chunk):
+        return b"".join(dumps(d) + b"\n" for d in chunk)
+
+    def close(self):
+        return b""
+
+
+class CSVEncoder:
+    """
+    CSV with a header row. Columns come from the projection (dotted paths such as
+    "vehicles.four_wheeler.type" are resolved), or else from the top-level keys of the first
+    chunk; a key that only appears in a later chunk fails the export rather than being
+    dropped. An empty export is just the header (`_id` alone when there is no projection).
+    """
+
+    def __init__(self, fields=None):
+        self.fields = fields
+        self.projected = fields is not None
+        self.buf = io.StringIO()
+        self.writer = None
+
+    def _start(self, chunk):
+        if not self.fields:
+            self.fields = list(dict.fromkeys(k for d in chunk for k in d)) or ["_id"]
+        self.writer = csv.DictWriter(self.buf, fieldnames=self.fields, extrasaction="ignore")
+        self.writer.writeheader()
+
+    def _take(self):
+        data = self.buf.getvalue().encode()
+        self.buf.seek(0)
+        self.buf.truncate()
+        return data
+
+    def feed(self, chunk):
+        if self.projected:
+            rows = [_flat_row(d, self.fields) for d in chunk]
+        else:
+            rows = [_flat_row(d) for d in chunk]
+            if self.writer is not None:
+                _late_columns("CSV", rows, self.fields)
+        if self.writer is None:
+            self._start(rows)
+        self.writer.writerows(rows)
+        return self._take()
+
+    def close(self):
+        if self.writer is None:
+            self._start([])
+        return self._take()
+
+
+class _Drain(io.RawIOBase):
+    """Write-only sink that hands accumulated bytes back to the encoder after each batch."""
+
+    def __init__(self):
+        self.parts = []
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self.parts.append(bytes(b))
+        return len(b)
+
+    def take(self):
+        data = b"".join(self.parts)
+        self.parts = []
+        return data
+
+
+def _cell_text(value):
+    return value if value is None or isinstance(value, str) else dumps(value).decode()
+
+
+def _parquet_array(values, type_=None):
+    """Arrow array for one column; string columns take any value (non-strings as JSON text)."""
+    try:
+        return pa.array(values, type=type_)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        if type_ is None or pa.types.is_string(type_):
+            return pa.array([_cell_text(v) for v in values], type=pa.string())
+        raise
+
+
+class ParquetEncoder:
+    """
+    Parquet written as one row group per chunk. The columns and their types come from the
+    projection (dotted paths resolved) or the first chunk, widened so later chunks fit:
+    columns that are all null or of mixed types there become strings. Later chunks are cast
+    column by column (ints into float columns, whole floats into int columns, anything into
+    string columns). A value that still doesn't fit, e.g. text in a numeric column, or a key
+    first seen after the first chunk, fails the export with a message naming the column.
+    An empty export is a valid file with the projected columns (or just `_id`).
+    """
+
+    def __init__(self, fields=None):
+        self.fields = fields
+        self.projected = fields is not None
+        self.sink = _Drain()
+        self.writer = None
+        self.schema = None
+
+    def _start(self, rows):
+        names = list(dict.fromkeys(k for r in rows for k in r)) or self.fields or ["_id"]
+        columns = []
+        for name in names:
+            values = [r.get(name) for r in rows]
+            array = _parquet_array(values)
+            if pa.types.is_null(array.type):
+                array = pa.array(values, type=pa.string())
+            columns.append(array)
+        table = pa.Table.from_arrays(columns, names=names)
+        self.schema = table.schema
+        self.writer = pq.ParquetWriter(self.sink, self.schema)
+        return table
+
+    def _fit(self, rows):
+        columns = []
+        for field in self.schema:
+            values = [r.get(field.name) for r in rows]
+            if pa.types.is_integer(field.type):
+                values = [int(v) if isinstance(v, float) and v.is_integer() else v for v in values]
+            try:
+                columns.append(_parquet_array(values, field.type))
+            except (pa.ArrowInvalid, pa.ArrowTypeError) as e:
+                raise ValueError(f"Parquet export: column {field.name!r} changed type after the first chunk "
+                                 f"({field.type}); use a projection or another format") from e
+        return pa.Table.from_arrays(columns, schema=self.schema)
+
+    def feed(self, chunk):
+        rows = [_flat_row(d, self.fields if self.projected else None) for d in chunk]
+        if self.writer is not None and not self.projected:
+            _late_columns("Parquet", rows, self.schema.names)
+        table = self._start(rows) if self.writer is None else self._fit(rows)
+        self.writer.write_table(table)
+        return self.sink.take()
+
+    def close(self):
+        if self.writer is None:
+            self._start([])
+        self.writer.close()
+        return self.sink.take()
+
+
+ENCODERS = {"json": JSONEncoder, "ndjson": NDJSONEncoder, "csv": CSVEncoder, "parquet": ParquetEncoder}
+
+
+# ================= Compression =================
+class _Identity:
+    def compress(self, data):
+        return data
+
+    def flush(self):
+        return b""
+
+
+def compressor(compression):
+    if not compression:
+        return _Identity()
+    if compression == "gzip":
+        return zlib.compressobj(wbits=31)  # 31 = gzip container
+    if compression == "zstd":
+        return zstandard.ZstdCompressor().compressobj()
+    raise ValueError(f"Unsupported compression: {compression}")
+
+
+def _export_plan(fmt, fields, compression):
+    """Validate the request; returns (projection, encoder, compressor)."""
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unsupported export format: {fmt}")
+    if compression and compression not in COMPRESSIONS:
+        raise ValueError(f"Unsupported compression: {compression}")
+    if fmt == "parquet" and pq is None:
+        raise ValueError("Parquet export requires pyarrow")
+    if compression == "zstd" and zstandard is None:
+        raise ValueError("zstd compression requires the zstandard package")
+
+    if isinstance(fields, dict):
+        projection = fields
+        fields = [f for f, v in fields.items() if v] if all(fields.values()) else None
+    else:
+        projection = {f: 1 for f in fields} if fields else None
+    columns = ["_id"] + [f for f in fields if f != "_id"] if fmt in ("csv", "parquet") and fields else None
+    return hide_vehicle_tokens(projection), ENCODERS[fmt](columns), compressor(compression)
+
+
+def stream_export(col, filter_, fmt="json", fields=None, compression=None,
+                  chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Return a generator of encoded (and optionally compressed) export bytes.
+    `fields` is an optional list of field names to project (``_id`` is always included),
+    or a Mongo projection object such as {"vehicles": 0}.
+    """
+    projection, encoder, comp = _export_plan(fmt, fields, compression)
+
+    def generate():
+        for chunk in iter_chunks(col, filter_, projection, chunk_size):
+            out = comp.compress(encoder.feed(chunk))
+            if out:
+                yield out
+        yield comp.compress(encoder.close()) + comp.flush()
+    return generate()
+
+
+def astream_export(col, filter_, fmt="json", fields=None, compression=None,
+                   chunk_size=DEFAULT_CHUNK_SIZE):
+    """stream_export for an async (AsyncMongoClient/Motor) collection: an async generator of bytes."""
+    projection, encoder, comp = _export_plan(fmt, fields, compression)
+
+    async def generate():
+        cursor = col.find(filter_, projection).batch_size(chunk_size)
+        try:
+            chunk = []
+            async for doc in cursor:
+                chunk.append(doc)
+                if len(chunk) == chunk_size:
+                    out = comp.compress(encoder.feed(chunk))
+                    chunk = []
+                    if out:
+                        yield out
+            if chunk:
+                out = comp.compress(encoder.feed(chunk))
+                if out:
+                    yield out
+            yield comp.compress(encoder.close()) + comp.flush()
+        finally:
+            await cursor.close()  # also on client disconnect: kill the server-side cursor
+    return generate()
+
+
+def content_headers(collection, fmt="json", compression=None):
+    """(content_type, filename) for the export response."""
+    content_type, ext = EXPORT_FORMATS[fmt]
+    filename = f"{collection}.{ext}"
+    if compression:
+        content_type, comp_ext = COMPRESSIONS[compression]
+        filename += f".{comp_ext}"
+    return content_type, filename
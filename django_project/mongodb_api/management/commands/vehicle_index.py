@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+
+from mongodb_api.vehicles import (
+    VEHICLE_INDEX_NAME,
+    VEHICLE_TEXT_INDEX_NAME,
+    ensure_vehicle_index,
+    refresh_vehicle_tokens,
+)
+from mongodb_api.mongo import get_db
+
+
+class Command(BaseCommand):
+    help = "Backfill vehicle_tokens and create (or drop) the vehicle search index."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--collection", default="employees")
+        parser.add_argument("--text", action="store_true", help="Create a text index instead of a multikey index")
+        parser.add_argument("--drop", action="store_true", help="Drop the vehicle search indexes and exit")
+        parser.add_argument("--skip-backfill", action="store_true", help="Only manage the index")
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        col = get_db()[options["collection"]]
+        if options["drop"]:
+            existing = col.index_information()
+            for name in (VEHICLE_INDEX_NAME, VEHICLE_TEXT_INDEX_NAME):
+                if name in existing:
+                    col.drop_index(name)
+                    self.stdout.write(f"Dropped {name}")
+            return
+
+        if not options["skip_backfill"]:
+            updated = refresh_vehicle_tokens(col, {"vehicles": {"$exists": True}}, options["batch_size"])
+            self.stdout.write(f"Backfilled vehicle_tokens on {updated} documents")
+        name = ensure_vehicle_index(col, text=options["text"])
+        self.stdout.write(self.style.SUCCESS(f"Index ready: {col.name}.{name}"))
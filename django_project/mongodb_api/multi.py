@@ -0,0 +1,100 @@
+# multi.py - Concurrent fan-out for /collections/multi/
+# A request carries N independent query specs (find, count or aggregation, each on any
+# collection). They run on a shared thread pool against the process's Mongo connection pool,
+# at most `concurrency` at a time per request, and results are yielded in completion order so
+# wall time is roughly the slowest query rather than the sum. Each query gets a deadline:
+# maxTimeMS makes the server abandon it, and the waiter reports a timeout even if the
+# server-side kill is late.
+
+import os
+import time
+from contextvars import copy_context
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from .aggregation import validate_pipeline
+from .vehicles import hide_vehicle_tokens
+
+MULTI_QUERY_WORKERS = int(os.getenv("MULTI_QUERY_WORKERS", "16"))
+MULTI_QUERY_MAX_SPECS = int(os.getenv("MULTI_QUERY_MAX_SPECS", "50"))
+MULTI_QUERY_CONCURRENCY = int(os.getenv("MULTI_QUERY_CONCURRENCY", "8"))
+MULTI_QUERY_TIMEOUT_MS = int(os.getenv("MULTI_QUERY_TIMEOUT_MS", "10000"))
+MULTI_QUERY_MAX_RESULTS = int(os.getenv("MULTI_QUERY_MAX_RESULTS", "1000"))
+
+_pool = ThreadPoolExecutor(max_workers=MULTI_QUERY_WORKERS, thread_name_prefix="multi-query")
+
+
+def validate_specs(specs):
+    """Normalize specs in place: each needs a collection; ids default to the list position."""
+    if not isinstance(specs, list) or not specs:
+        raise ValueError("queries must be a non-empty list")
+    if len(specs) > MULTI_QUERY_MAX_SPECS:
+        raise ValueError(f"At most {MULTI_QUERY_MAX_SPECS} queries per request")
+    for i, spec in enumerate(specs):
+        if not isinstance(spec, dict) or not spec.get("collection"):
+            raise ValueError(f"queries[{i}] needs a collection")
+        spec.setdefault("id", str(i))
+        if "pipeline" in spec:
+            validate_pipeline(spec["pipeline"])
+    return specs
+
+
+def run_spec(db, spec, timeout_ms):
+    """Execute one spec synchronously and return its result payload (a bad limit raises ValueError)."""
+    from .views import parse_limit  # views imports this module
+
+    col = db[spec["collection"]]
+    filter_ = spec.get("filter") or {}
+    try:
+        limit = min(parse_limit(spec.get("limit", 100)), MULTI_QUERY_MAX_RESULTS)
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"invalid limit: {e}") from e
+    if "pipeline" in spec:
+        cursor = col.aggregate(spec["pipeline"] + [{"$limit": limit}], allowDiskUse=True, maxTimeMS=timeout_ms)
+        return {"results": list(cursor)}
+    if spec.get("count"):
+        return {"count": col.count_documents(filter_, maxTimeMS=timeout_ms)}
+    cursor = col.find(filter_, hide_vehicle_tokens(spec.get("projection"))).limit(limit).max_time_ms(timeout_ms)
+    if spec.get("sort"):
+        sort = spec["sort"]
+        cursor = cursor.sort(sort.lstrip("-"), -1 if sort.startswith("-") else 1)
+    return {"documents": list(cursor)}
+
+
+def _timed(db, spec, timeout_ms):
+    started = time.perf_counter()
+    try:
+        payload = {"status": "success", **run_spec(db, spec, timeout_ms)}
+    except Exception as e:
+        payload = {"status": "error", "error": str(e)}
+    payload["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 2)
+    return payload
+
+
+def run_specs(db, specs, concurrency=MULTI_QUERY_CONCURRENCY, timeout_ms=MULTI_QUERY_TIMEOUT_MS):
+    """Yield one result per spec as it finishes (errors and timeouts included, never raised)."""
+    concurrency = max(1, min(int(concurrency), MULTI_QUERY_WORKERS))
+    timeout_ms = max(1, min(int(timeout_ms), MULTI_QUERY_TIMEOUT_MS))
+    pending = list(reversed(specs))
+    running = {}  # future -> (spec, deadline)
+
+    def head(spec):
+        return {"id": spec["id"], "collection": spec["collection"]}
+
+    while pending or running:
+        while pending and len(running) < concurrency:
+            spec = pending.pop()
+            # copy_context keeps the request's correlation ID on the worker thread.
+            future = _pool.submit(copy_context().run, _timed, db, spec, timeout_ms)
+            running[future] = (spec, time.monotonic() + timeout_ms / 1000)
+        next_deadline = min(deadline for _, deadline in running.values())
+        done, _ = wait(running, timeout=max(0.0, next_deadline - time.monotonic()), return_when=FIRST_COMPLETED)
+        for future in done:
+            spec, _ = running.pop(future)
+            yield {**head(spec), **future.result()}
+        now = time.monotonic()
+        for future, (spec, deadline) in list(running.items()):
+            if deadline <= now and not future.done():
+                # maxTimeMS will stop the server; free the slot now instead of waiting for it.
+                del running[future]
+                yield {**head(spec), "status": "timeout", "error": f"Query exceeded {timeout_ms} ms",
+                       "elapsed_ms": timeout_ms}
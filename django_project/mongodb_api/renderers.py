@@ -0,0 +1,125 @@
+# renderers.py - JSON encoding for API responses
+# Documents go straight from the pymongo cursor to the encoder: ObjectId, datetime, Decimal128,
+# Binary, UUID and friends are handled by one BSON-aware default hook wherever they appear
+# (nested vehicles, grouped _id keys), so views no longer patch `_id` by hand.
+# The backend is JSON_RENDERER=auto|orjson|msgspec|stdlib; auto prefers orjson, then msgspec,
+# and falls back to the stdlib encoder when neither is installed.
+
+import base64
+import datetime
+import decimal
+import json
+import os
+import uuid
+from collections.abc import Mapping
+
+from bson import Binary, Decimal128, ObjectId
+from bson.raw_bson import RawBSONDocument
+from django.http import HttpResponse
+
+try:
+    import orjson
+except ImportError:  # orjson is optional
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:  # msgspec is optional
+    msgspec = None
+
+JSON_RENDERER = os.getenv("JSON_RENDERER", "auto").lower()
+
+
+def _mapping(o):
+    return dict(o)
+
+
+def _b64(o):
+    return base64.b64encode(o).decode()
+
+
+# Exact-type dispatch first (one dict lookup for the common ObjectId case), isinstance after.
+_DEFAULTS = {
+    ObjectId: str,
+    Decimal128: lambda o: str(o.to_decimal()),
+    decimal.Decimal: str,
+    uuid.UUID: str,
+    datetime.datetime: datetime.datetime.isoformat,
+    datetime.date: datetime.date.isoformat,
+    Binary: _b64,
+    bytes: _b64,
+    RawBSONDocument: _mapping,
+    set: list,
+    frozenset: list,
+    tuple: list,
+}
+
+
+def bson_default(o):
+    """JSON form of values the encoders don't know: BSON types, dates, decimals, raw documents."""
+    convert = _DEFAULTS.get(type(o))
+    if convert is not None:
+        return convert(o)
+    for cls, convert in _DEFAULTS.items():
+        if isinstance(o, cls):
+            return convert(o)
+    if isinstance(o, Mapping):
+        return dict(o)
+    return str(o)
+
+
+class BSONJSONEncoder(json.JSONEncoder):
+    """stdlib fallback using the same hook as the fast backends."""
+
+    def default(self, o):
+        return bson_default(o)
+
+
+def _stdlib_dumps(obj):
+    return json.dumps(obj, cls=BSONJSONEncoder, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+def _make_dumps(name):
+    if name in ("auto", "orjson") and orjson is not None:
+        options = orjson.OPT_NON_STR_KEYS
+
+        def dumps(obj):
+            return orjson.dumps(obj, default=bson_default, option=options)
+        return "orjson", dumps
+    if name in ("auto", "msgspec") and msgspec is not None:
+        encoder = msgspec.json.Encoder(enc_hook=bson_default)
+        return "msgspec", encoder.encode
+    return "stdlib", _stdlib_dumps
+
+
+# dumps(obj) -> JSON bytes with the configured backend; loads accepts bytes or str.
+RENDERER, dumps = _make_dumps(JSON_RENDERER)
+loads = orjson.loads if RENDERER == "orjson" else json.loads
+
+
+def dumps_line(obj):
+    """One NDJSON line (bytes, newline-terminated)."""
+    return dumps(obj) + b"\n"
+
+
+def ndjson(items):
+    """Encode an iterable of documents as NDJSON lines for StreamingHttpResponse."""
+    return (dumps(item) + b"\n" for item in items)
+
+
+class JsonResponse(HttpResponse):
+    """
+    Drop-in for django.http.JsonResponse rendered with `dumps`, so cursor documents can be
+    returned as-is. Bytes are taken as an already rendered body (e.g. from the query cache).
+    `encoder` is accepted for compatibility and ignored.
+    """
+
+    def __init__(self, data, encoder=None, safe=True, **kwargs):
+        if isinstance(data, bytes):
+            content = data
+        elif safe and not isinstance(data, dict):
+            raise TypeError("In order to allow non-dict objects to be serialized set the safe parameter to False.")
+        else:
+            content = dumps(data)
+        kwargs.setdefault("content_type", "application/json")
+        super().__init__(content=content, **kwargs)
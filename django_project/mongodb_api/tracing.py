@@ -0,0 +1,327 @@
+# tracing.py - Correlation IDs, latency histograms and the slow-query log
+# Every request gets an ID (the caller's X-Request-ID, or a fresh one) that is echoed back in
+# the response and attached to every Mongo command it issues. View time and Mongo command time
+# (from pymongo command monitoring) go into per-process histograms served as Prometheus text
+# at /api/metrics/. Commands slower than SLOW_QUERY_MS are logged with their filter shape and,
+# once explained in the background, the documents and keys examined. The middleware works for
+# sync (WSGI) and async (ASGI) views alike and tracks requests in flight per process. Each
+# response carries a Server-Timing header with the view time and the Mongo command time the
+# request spent, so a caller can split its latency by stage. Streamed bodies run after the
+# view has returned, so their iterators are wrapped to keep the request's ID on the Mongo
+# commands they issue. Slow-query explains share the index advisor's throttled queue.
+
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from pymongo import monitoring
+
+from .advisor import ExplainQueue, filter_shape, summarize_explain
+
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "true").lower() in ("1", "true", "yes")
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "0"))  # 0 disables the slow-query log
+SLOW_QUERY_EXPLAIN = os.getenv("SLOW_QUERY_EXPLAIN", "true").lower() in ("1", "true", "yes")
+SLOW_QUERY_EXPLAIN_INTERVAL_S = float(os.getenv("SLOW_QUERY_EXPLAIN_INTERVAL_S", "60"))  # per command shape
+REQUEST_ID_HEADER = "X-Request-ID"
+SERVER_TIMING_HEADER = "Server-Timing"
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Commands whose filter shape is worth logging and which `explain` accepts.
+EXPLAINABLE = {"find": "filter", "aggregate": "pipeline", "count": "query", "distinct": "query",
+               "update": "updates", "delete": "deletes", "findAndModify": "query"}
+# Wire-protocol fields that must not be copied into an explain command.
+_SESSION_FIELDS = {"lsid", "$db", "$clusterTime", "txnNumber", "$readPreference", "cursor",
+                   "readConcern", "writeConcern", "startTransaction", "autocommit"}
+
+request_id = contextvars.ContextVar("request_id", default=None)
+mongo_time = contextvars.ContextVar("mongo_time", default=None)  # [seconds] of the current request
+slow_log = logging.getLogger("mongodb_api.slow_queries")
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names, values):
+    return ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values))
+
+
+class Histogram:
+    """Cumulative-bucket histogram per label set, in the Prometheus exposition format."""
+
+    def __init__(self, name, help_text, labels, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._series = {}  # label values -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted(self._series.items())
+        for values, series in items:
+            base = _labels(self.labels, values)
+            sep = "," if base else ""
+            for bound, count in zip(self.buckets, series):
+                lines.append(f'{self.name}_bucket{{{base}{sep}le="{bound}"}} {count}')
+            lines.append(f'{self.name}_bucket{{{base}{sep}le="+Inf"}} {series[-1]}')
+            lines.append(f"{self.name}_sum{{{base}}} {series[-2]:.6f}")
+            lines.append(f"{self.name}_count{{{base}}} {series[-1]}")
+        return "\n".join(lines)
+
+
+class Counter:
+    def __init__(self, name, help_text, labels):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for values, count in items:
+            lines.append(f"{self.name}{{{_labels(self.labels, values)}}} {count}")
+        return "\n".join(lines)
+
+
+class Gauge:
+    """Current value plus the peak since start (exported as <name>_peak)."""
+
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help = help_text
+        self.value = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def add(self, amount):
+        with self._lock:
+            self.value += amount
+            self.peak = max(self.peak, self.value)
+
+    def render(self):
+        return "\n".join([
+            f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge", f"{self.name} {self.value}",
+            f"# HELP {self.name}_peak Highest {self.name} since the process started.",
+            f"# TYPE {self.name}_peak gauge", f"{self.name}_peak {self.peak}",
+        ])
+
+
+view_seconds = Histogram("django_view_seconds", "Django view latency (request in to response out).",
+                         ("view", "method", "status"))
+mongo_seconds = Histogram("mongo_command_seconds", "MongoDB command latency seen by pymongo.",
+                          ("command", "collection"))
+mongo_failures = Counter("mongo_command_failures_total", "MongoDB commands that returned an error.",
+                         ("command", "collection"))
+slow_queries = Counter("mongo_slow_queries_total", "MongoDB commands slower than SLOW_QUERY_MS.",
+                       ("command", "collection"))
+in_flight = Gauge("django_requests_in_flight", "Requests being handled by this process.")
+METRICS = [view_seconds, in_flight, mongo_seconds, mongo_failures, slow_queries]
+
+
+def render_metrics():
+    return "\n".join(m.render() for m in METRICS) + "\n"
+
+
+def new_request_id():
+    return uuid.uuid4().hex
+
+
+class TracingMiddleware:
+    """Assign/propagate the correlation ID and time each view (sync or async)."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self._acall(request)
+        rid, tokens, started, mongo = self._start(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            self._stop(tokens)
+        return self._finish(request, response, rid, started, mongo)
+
+    async def _acall(self, request):
+        rid, tokens, started, mongo = self._start(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            self._stop(tokens)
+        return self._finish(request, response, rid, started, mongo)
+
+    def _start(self, request):
+        rid = request.headers.get(REQUEST_ID_HEADER) or new_request_id()
+        in_flight.add(1)
+        mongo = [0.0]
+        return rid, (request_id.set(rid), mongo_time.set(mongo)), time.perf_counter(), mongo
+
+    def _stop(self, tokens):
+        request_id.reset(tokens[0])
+        mongo_time.reset(tokens[1])
+        in_flight.add(-1)
+
+    def _finish(self, request, response, rid, started, mongo):
+        if getattr(response, "streaming", False):
+            bind = _abind_stream if response.is_async else _bind_stream
+            response.streaming_content = bind(response.streaming_content, rid, mongo)
+        if TRACING_ENABLED:
+            elapsed = time.perf_counter() - started
+            match = getattr(request, "resolver_match", None)
+            view = match.url_name if match and match.url_name else "unmatched"
+            view_seconds.observe(elapsed, view, request.method, response.status_code)
+            response[SERVER_TIMING_HEADER] = f"view;dur={elapsed * 1000:.2f}, mongo;dur={mongo[0] * 1000:.2f}"
+        response[REQUEST_ID_HEADER] = rid
+        return response
+
+
+def _bind_stream(content, rid, mongo):
+    """Run each step of a streamed body with the request's correlation ID and Mongo timer set."""
+    iterator = iter(content)
+    try:
+        while True:
+            tokens = request_id.set(rid), mongo_time.set(mongo)
+            try:
+                chunk = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                request_id.reset(tokens[0])
+                mongo_time.reset(tokens[1])
+            yield chunk
+    finally:
+        if hasattr(iterator, "close"):
+            iterator.close()
+
+
+async def _abind_stream(content, rid, mongo):
+    """Async _bind_stream."""
+    iterator = content.__aiter__()
+    try:
+        while True:
+            tokens = request_id.set(rid), mongo_time.set(mongo)
+            try:
+                chunk = await iterator.__anext__()
+            except StopAsyncIteration:
+                return
+            finally:
+                request_id.reset(tokens[0])
+                mongo_time.reset(tokens[1])
+            yield chunk
+    finally:
+        if hasattr(iterator, "aclose"):
+            await iterator.aclose()
+
+
+class MongoCommandTracer(monitoring.CommandListener):
+    """pymongo command listener feeding mongo_command_seconds and the slow-query log."""
+
+    def __init__(self, slow_ms=SLOW_QUERY_MS, explain=SLOW_QUERY_EXPLAIN):
+        self.slow_ms = slow_ms
+        self.explain = explain
+        # (connection, wire request id) -> (database, collection, correlation ID, command copy, request's mongo_time)
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._explainer = ExplainQueue("slow-query-explain", SLOW_QUERY_EXPLAIN_INTERVAL_S)
+
+    def started(self, event):
+        name = event.command_name
+        if name == "explain":
+            return
+        collection = event.command.get("collection" if name == "getMore" else name)
+        if not isinstance(collection, str):
+            collection = ""
+        command = None
+        if self.slow_ms and name in EXPLAINABLE:
+            # The event's document is only valid during this callback.
+            command = {k: v for k, v in event.command.items() if k not in _SESSION_FIELDS}
+        with self._lock:
+            self._pending[(event.connection_id, event.request_id)] = (
+                event.database_name, collection, request_id.get(), command, mongo_time.get())
+
+    def _finish(self, event):
+        with self._lock:
+            return self._pending.pop((event.connection_id, event.request_id), None)
+
+    def succeeded(self, event):
+        entry = self._finish(event)
+        if entry is None:
+            return
+        database, collection, rid, command, spent = entry
+        name = event.command_name
+        seconds = event.duration_micros / 1e6
+        if spent is not None:
+            spent[0] += seconds
+        mongo_seconds.observe(seconds, name, collection)
+        if self.slow_ms and seconds * 1000 >= self.slow_ms and name in EXPLAINABLE:
+            slow_queries.inc(name, collection)
+            record = {
+                "request_id": rid, "command": name, "database": database, "collection": collection,
+                "duration_ms": round(seconds * 1000, 2), "shape": _command_shape(name, command),
+            }
+            # One explain per command shape and interval; the rest are logged without one.
+            key = (database, collection, name, json.dumps(record["shape"], sort_keys=True))
+            if not (self.explain and command is not None
+                    and self._explainer.submit(key, self._explain_and_log, record, database, command)):
+                slow_log.warning(json.dumps(record, default=str))
+
+    def failed(self, event):
+        entry = self._finish(event)
+        if entry is not None:
+            mongo_failures.inc(event.command_name, entry[1])
+            if entry[4] is not None:
+                entry[4][0] += event.duration_micros / 1e6
+
+    def _explain_and_log(self, record, database, command):
+        from .mongo import get_client
+
+        try:
+            explain = get_client()[database].command({"explain": command, "verbosity": "executionStats"})
+            record.update(summarize_explain(explain))
+        except Exception as e:
+            record["explain_error"] = str(e)
+        slow_log.warning(json.dumps(record, default=str))
+
+
+def _command_shape(name, command):
+    """Filter shape ("?" for constants) of a command, for grouping slow queries."""
+    if not command:
+        return None
+    body = command.get(EXPLAINABLE[name])
+    if name == "aggregate":
+        return [filter_shape(stage) for stage in body or []]
+    if name in ("update", "delete"):
+        return [filter_shape(op.get("q", {})) for op in body or []]
+    return filter_shape(body or {})
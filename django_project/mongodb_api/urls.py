@@ -1,13 +1,23 @@
 from django.urls import path
-from . import views
+from . import async_views, views
+
+# ASYNC_VIEWS=true (ASGI deployments): the collection endpoints that have async versions use them.
+api = async_views if async_views.ASYNC_VIEWS else views
 
 urlpatterns = [
-    path("collections/", views.list_collections, name="list_collections"),
-    path("collections/query/", views.query_collection, name="query_collection"),
-    path("collections/insert/", views.insert_document, name="insert_document"),
-    path("collections/update/", views.update_document, name="update_document"),
-    path("collections/delete/", views.delete_document, name="delete_document"),
-    path("collections/export/", views.export_collection, name="export_collection"),
-    path("collections/<str:collection>/info/", views.get_collection_info, name="get_collection_info"),
-    path("health/", views.health, name="health"),
+    path("collections/", api.list_collections, name="list_collections"),
+    path("collections/query/", api.query_collection, name="query_collection"),
+    path("collections/aggregate/", api.aggregate_collection, name="aggregate_collection"),
+    path("collections/multi/", views.multi_query, name="multi_query"),
+    path("collections/insert/", api.insert_document, name="insert_document"),
+    path("collections/update/", api.update_document, name="update_document"),
+    path("collections/delete/", api.delete_document, name="delete_document"),
+    path("collections/bulk/", views.bulk_write, name="bulk_write"),
+    path("collections/export/", api.export_collection, name="export_collection"),
+    path("collections/<str:collection>/info/", api.get_collection_info, name="get_collection_info"),
+    path("collections/<str:collection>/indexes/", api.collection_indexes, name="collection_indexes"),
+    path("collections/<str:collection>/indexes/recommend/", views.recommend_indexes, name="recommend_indexes"),
+    path("cache/stats/", views.cache_stats, name="cache_stats"),
+    path("metrics/", views.metrics, name="metrics"),
+    path("health/", api.health, name="health"),
 ]
\ No newline at end of file
@@ -0,0 +1,96 @@
+# vehicles.py - Indexed vehicle search
+# Every document with a `vehicles` sub-document also carries `vehicle_tokens`: the lower-cased
+# words of its vehicle make/model/variant strings ("Honda Shine 125" -> honda, shine, 125).
+# A multikey index on that array turns "who owns ..." into an index lookup instead of a
+# collection scan with unanchored regexes.
+
+import re
+
+from pymongo import ASCENDING, TEXT, UpdateOne
+
+VEHICLE_TOKENS_FIELD = "vehicle_tokens"
+VEHICLE_INDEX_NAME = "vehicle_tokens_1"
+VEHICLE_TEXT_INDEX_NAME = "vehicle_tokens_text"
+VEHICLE_TEXT_KEYS = {"type", "make", "model", "variant", "name"}
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text):
+    return _TOKEN_RE.findall(str(text).lower())
+
+
+def _vehicle_strings(value):
+    if isinstance(value, dict):
+        for k, v in value.items():
+            if isinstance(v, str) and k in VEHICLE_TEXT_KEYS:
+                yield v
+            elif isinstance(v, (dict, list)):
+                yield from _vehicle_strings(v)
+    elif isinstance(value, list):
+        for v in value:
+            if isinstance(v, str):
+                yield v
+            else:
+                yield from _vehicle_strings(v)
+
+
+def vehicle_tokens(doc):
+    """Sorted unique tokens for every vehicle description in `doc["vehicles"]`."""
+    return sorted({t for s in _vehicle_strings(doc.get("vehicles")) for t in tokenize(s)})
+
+
+def with_vehicle_tokens(doc):
+    """Set the token array on a document about to be inserted (no-op without vehicles)."""
+    if isinstance(doc, dict) and "vehicles" in doc:
+        doc[VEHICLE_TOKENS_FIELD] = vehicle_tokens(doc)
+    return doc
+
+
+def hide_vehicle_tokens(projection):
+    """
+    Leave the internal token array out of a find() projection unless the caller listed it:
+    None becomes {"vehicle_tokens": 0}, exclusions gain it, inclusions are returned as is.
+    """
+    if not projection:
+        return {VEHICLE_TOKENS_FIELD: 0}
+    inclusion = any(v for f, v in projection.items() if f != "_id") or (len(projection) == 1 and projection.get("_id"))
+    if inclusion or VEHICLE_TOKENS_FIELD in projection:
+        return projection
+    return {**projection, VEHICLE_TOKENS_FIELD: 0}
+
+
+def without_vehicle_tokens(doc):
+    """Copy of `doc` without the token array (for documents that did not go through a projection)."""
+    return {k: v for k, v in doc.items() if k != VEHICLE_TOKENS_FIELD}
+
+
+def touches_vehicles(update):
+    """True if an update document ($set/$unset/... or a plain replacement) modifies vehicles."""
+    for op, spec in update.items():
+        fields = spec.keys() if op.startswith("$") and isinstance(spec, dict) else [op]
+        if any(f == "vehicles" or f.startswith("vehicles.") for f in fields):
+            return True
+    return False
+
+
+def refresh_vehicle_tokens(col, filter_, batch_size=1000):
+    """Recompute tokens for documents matching `filter_`; returns the number rewritten."""
+    ops = []
+    updated = 0
+    for doc in col.find(filter_, {"vehicles": 1}):
+        ops.append(UpdateOne({"_id": doc["_id"]}, {"$set": {VEHICLE_TOKENS_FIELD: vehicle_tokens(doc)}}))
+        if len(ops) >= batch_size:
+            updated += col.bulk_write(ops, ordered=False).modified_count
+            ops = []
+    if ops:
+        updated += col.bulk_write(ops, ordered=False).modified_count
+    return updated
+
+
+def ensure_vehicle_index(col, text=False):
+    """Create the multikey index (or a text index with text=True) on the token array."""
+    if text:
+        return col.create_index([(VEHICLE_TOKENS_FIELD, TEXT)], name=VEHICLE_TEXT_INDEX_NAME)
+    return col.create_index([(VEHICLE_TOKENS_FIELD, ASCENDING)], name=VEHICLE_INDEX_NAME)
+
@@ -0,0 +1,156 @@
+"""
+admission.py - Request coalescing and per-tool admission control for the MCP server.
+
+SingleFlight: identical read requests to the Django API that are in flight at the same time
+share one upstream round trip. Several conversations asking for the same collection info or
+the same query then cost Django and MongoDB one request instead of N. Every caller decodes
+its own copy of the response body, so callers never share mutable results.
+
+AdmissionMiddleware: each tool gets a concurrency limit (TOOL_CONCURRENCY, e.g.
+"create_plot=2,bulk_write=2"; TOOL_CONCURRENCY_DEFAULT for the rest). Calls beyond the limit
+wait in a bounded queue (TOOL_QUEUE_MAX per tool, at most TOOL_QUEUE_TIMEOUT seconds). When
+the queue is full or the wait times out, the call is shed at once with a structured "busy"
+error instead of piling more work onto a saturated server.
+
+Coalesced, queued and shed calls are counted in the Prometheus metrics served at /metrics.
+"""
+
+import asyncio
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+from fastmcp.server.middleware import Middleware
+from fastmcp.tools import ToolResult
+
+from tracing import Counter, Histogram, register
+
+COALESCE_REQUESTS = os.getenv("COALESCE_REQUESTS", "true").lower() in ("1", "true", "yes")
+TOOL_CONCURRENCY = os.getenv("TOOL_CONCURRENCY", "create_plot=2,bulk_write=2,multi_query=4")
+TOOL_CONCURRENCY_DEFAULT = int(os.getenv("TOOL_CONCURRENCY_DEFAULT", "32"))
+TOOL_QUEUE_MAX = int(os.getenv("TOOL_QUEUE_MAX", "16"))
+TOOL_QUEUE_TIMEOUT = float(os.getenv("TOOL_QUEUE_TIMEOUT", "10"))
+TOOL_RETRY_AFTER_MS = int(os.getenv("TOOL_RETRY_AFTER_MS", "1000"))
+
+coalesced_total = register(Counter(
+    "mcp_coalesced_requests_total", "Django API requests served by joining an identical in-flight request.",
+    ("endpoint",)))
+admission_total = register(Counter(
+    "mcp_tool_admission_total", "Tool calls by admission outcome (admitted, queued, shed_queue_full, shed_timeout).",
+    ("tool", "outcome")))
+queue_seconds = register(Histogram(
+    "mcp_tool_queue_seconds", "Time tool calls waited for a concurrency slot.", ("tool",)))
+
+
+def parse_limits(spec: str) -> Dict[str, int]:
+    """Parse "create_plot=2, bulk_write=2" into {"create_plot": 2, "bulk_write": 2}."""
+    limits = {}
+    for part in spec.split(","):
+        name, _, value = part.partition("=")
+        if name.strip() and value.strip():
+            limits[name.strip()] = int(value)
+    return limits
+
+
+class _Flight:
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Share one in-flight call among concurrent callers with the same key."""
+
+    def __init__(self):
+        self._flights: Dict[Hashable, _Flight] = {}
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]], label: str = "") -> Any:
+        """
+        Await fn() once per key at a time. The call runs as its own task, so a caller that is
+        cancelled doesn't fail the others; it is cancelled only when every caller has gone.
+        """
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = self._flights[key] = _Flight(asyncio.ensure_future(fn()))
+            flight.task.add_done_callback(lambda _, key=key, flight=flight: self._forget(key, flight))
+        else:
+            coalesced_total.inc(label)
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                flight.task.cancel()
+
+    def _forget(self, key: Hashable, flight: _Flight) -> None:
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+
+    def __len__(self) -> int:
+        return len(self._flights)
+
+
+class _Gate:
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.slots = asyncio.Semaphore(limit)
+        self.running = 0
+        self.waiting = 0
+
+
+class AdmissionMiddleware(Middleware):
+    """Per-tool concurrency limits with a bounded wait queue; overflow gets a fast "busy" error."""
+
+    def __init__(self, limits: Optional[Dict[str, int]] = None, default: int = TOOL_CONCURRENCY_DEFAULT,
+                 queue_max: int = TOOL_QUEUE_MAX, queue_timeout: float = TOOL_QUEUE_TIMEOUT):
+        self.limits = parse_limits(TOOL_CONCURRENCY) if limits is None else limits
+        self.default = default
+        self.queue_max = queue_max
+        self.queue_timeout = queue_timeout
+        self._gates: Dict[str, _Gate] = {}
+
+    def _gate(self, tool: str) -> _Gate:
+        gate = self._gates.get(tool)
+        if gate is None:
+            gate = self._gates[tool] = _Gate(self.limits.get(tool, self.default))
+        return gate
+
+    def _busy(self, tool: str, gate: _Gate, reason: str) -> ToolResult:
+        admission_total.inc(tool, f"shed_{reason}")
+        return ToolResult(structured_content={
+            "error": f"Server busy: {tool} has {gate.running} calls running and {gate.waiting} queued; retry shortly.",
+            "busy": True, "tool": tool, "reason": reason, "retry_after_ms": TOOL_RETRY_AFTER_MS,
+        })
+
+    async def on_call_tool(self, context, call_next):
+        tool = context.message.name
+        gate = self._gate(tool)
+        if gate.slots.locked():
+            if gate.waiting >= self.queue_max:
+                return self._busy(tool, gate, "queue_full")
+            admission_total.inc(tool, "queued")
+            gate.waiting += 1
+            started = time.perf_counter()
+            try:
+                await asyncio.wait_for(gate.slots.acquire(), self.queue_timeout)
+            except asyncio.TimeoutError:
+                return self._busy(tool, gate, "timeout")
+            finally:
+                gate.waiting -= 1
+                queue_seconds.observe(time.perf_counter() - started, tool)
+        else:
+            await gate.slots.acquire()
+            admission_total.inc(tool, "admitted")
+        gate.running += 1
+        try:
+            return await call_next(context)
+        finally:
+            gate.running -= 1
+            gate.slots.release()
+
+    def status(self) -> Dict[str, Any]:
+        return {tool: {"limit": g.limit, "running": g.running, "queued": g.waiting}
+                for tool, g in sorted(self._gates.items())}
@@ -0,0 +1,407 @@
+"""
+analytics.py - Optional in-process columnar snapshots for BI-style questions.
+
+With ANALYTICS_MODE=on, the collections in ANALYTICS_COLLECTIONS are loaded once through the
+Django export endpoint (NDJSON) into a pandas DataFrame with one typed column per (dotted) field
+path. Filters, group-bys and summaries then run as vectorized column operations in-process
+instead of a Django/Mongo round trip per question.
+
+Freshness: a snapshot older than ANALYTICS_MAX_STALENESS seconds is caught up before use by
+exporting only documents past its watermark (ObjectId order for "_id", or a date field such as
+"updatedAt" whose changed rows replace the old ones). Inserts made through this server trigger
+that catch-up on the next read. Updates and deletes made through this server force a full
+reload, because an _id watermark cannot see them; so does a snapshot older than
+ANALYTICS_FULL_REFRESH seconds. Anything the snapshot cannot answer exactly raises Unsupported,
+and the caller falls back to the live Django query.
+
+Refreshes run as a background task per collection, and frame building and merging run in a
+worker thread, so a large load never blocks the event loop. While a refresh runs, reads get the
+previous snapshot if it is merely past its staleness window. If there is no snapshot yet, a
+write through this server made it stale, the last refresh failed, or it is older than
+ANALYTICS_MAX_AGE seconds (default twice the staleness window), they fall back to the live query.
+"""
+
+import asyncio
+import operator
+import os
+import time
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+ANALYTICS_COLLECTIONS = [c.strip() for c in os.getenv("ANALYTICS_COLLECTIONS", "employees").split(",") if c.strip()]
+ANALYTICS_MAX_STALENESS = float(os.getenv("ANALYTICS_MAX_STALENESS", "30"))
+ANALYTICS_MAX_AGE = float(os.getenv("ANALYTICS_MAX_AGE", "0")) or None  # None: 2 x max_staleness
+ANALYTICS_FULL_REFRESH = float(os.getenv("ANALYTICS_FULL_REFRESH", "600"))
+ANALYTICS_WATERMARK = os.getenv("ANALYTICS_WATERMARK", "_id")
+ANALYTICS_MAX_ROWS = int(os.getenv("ANALYTICS_MAX_ROWS", "2000000"))
+
+# loader(collection, filter) yields the exported documents matching filter.
+Loader = Callable[[str, Dict[str, Any]], AsyncIterator[Dict[str, Any]]]
+
+_COMPARE = {"$gt": operator.gt, "$gte": operator.ge, "$lt": operator.lt, "$lte": operator.le}
+AGGREGATIONS = {"sum": "sum", "avg": "mean", "min": "min", "max": "max", "count": "size"}
+_NULL_GROUP = "\0null"
+
+
+class Unsupported(Exception):
+    """The snapshot cannot answer this exactly; use the live query instead."""
+
+
+# ---------- column building ----------
+def _flatten(doc: Dict[str, Any], prefix: str, out: Dict[str, Any]) -> Dict[str, Any]:
+    for key, value in doc.items():
+        if isinstance(value, dict) and value:
+            _flatten(value, f"{prefix}{key}.", out)
+        else:
+            out[prefix + key] = value
+    return out
+
+
+def _column(values: List[Any]) -> pd.Series:
+    """One typed column; its dtype records the Mongo type so filters can honour type bracketing."""
+    kinds = {type(v) for v in values if v is not None}
+    if kinds == {int}:
+        return pd.Series(pd.array(values, dtype="Int64"))
+    if kinds and kinds <= {int, float}:
+        return pd.Series(values, dtype="float64")
+    if kinds == {str}:
+        return pd.Series(values, dtype="string")
+    if kinds == {bool}:
+        return pd.Series(values, dtype="boolean")
+    return pd.Series(values, dtype=object)
+
+
+def build_frame(docs: List[Dict[str, Any]]) -> pd.DataFrame:
+    rows = [_flatten(d, "", {}) for d in docs]
+    names = list(dict.fromkeys(k for r in rows for k in r)) or ["_id"]
+    return pd.DataFrame({name: _column([r.get(name) for r in rows]) for name in names})
+
+
+def _sorted_frame(docs: List[Dict[str, Any]]) -> pd.DataFrame:
+    return build_frame(docs).sort_values("_id", kind="stable", ignore_index=True)
+
+
+def _merge(frame: pd.DataFrame, new: pd.DataFrame) -> pd.DataFrame:
+    """Catch-up rows replace the old ones by _id; the result stays in _id order."""
+    frame = pd.concat([frame, new], ignore_index=True)
+    frame = frame.drop_duplicates("_id", keep="last").sort_values("_id", kind="stable", ignore_index=True)
+    for name in frame.columns:
+        # A column absent from one side concatenates to object dtype; retype it from its values.
+        if frame[name].dtype == object:
+            frame[name] = _column(frame[name].where(frame[name].notna(), None).tolist())
+    return frame
+
+
+def _column_kind(col: pd.Series) -> str:
+    if pd.api.types.is_bool_dtype(col):
+        return "bool"
+    if pd.api.types.is_numeric_dtype(col):
+        return "number"
+    if isinstance(col.dtype, pd.StringDtype):
+        return "string"
+    return "null" if col.isna().all() else "mixed"
+
+
+def _value_kind(value: Any) -> str:
+    if value is None:
+        return "null"
+    if isinstance(value, bool):
+        return "bool"
+    if isinstance(value, (int, float)):
+        return "number"
+    if isinstance(value, str):
+        return "string"
+    raise Unsupported(f"comparison with {type(value).__name__}")
+
+
+def _scalar(value: Any) -> Any:
+    """numpy/pandas scalar -> plain Python (JSON-serializable); NaN/NA -> None."""
+    if value is pd.NA:
+        return None
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and value != value:
+        return None
+    return value
+
+
+class Snapshot:
+    """One collection as a DataFrame plus its watermark and sync state."""
+
+    def __init__(self, frame: pd.DataFrame, watermark: Any, loaded_at: float = None):
+        self.frame = frame
+        self.watermark = watermark
+        self.synced_at = time.monotonic()
+        self.loaded_at = self.synced_at if loaded_at is None else loaded_at
+        self.pending = None  # None | "catch_up" | "full"
+
+    def age(self) -> float:
+        return time.monotonic() - self.synced_at
+
+    # ---------- vectorized evaluation ----------
+    def column(self, field: str) -> pd.Series:
+        if field == "_id":
+            raise Unsupported("_id is an ObjectId in Mongo but a string here")
+        if field in self.frame:
+            col = self.frame[field]
+            if _column_kind(col) == "mixed":
+                raise Unsupported(f"{field!r} holds arrays, documents or mixed types")
+            return col
+        if any(c.startswith(field + ".") for c in self.frame.columns):
+            raise Unsupported(f"embedded document comparison on {field!r}")
+        return _column([None] * len(self.frame))
+
+    def _equals(self, col: pd.Series, value: Any) -> np.ndarray:
+        kind = _value_kind(value)
+        if kind == "null":
+            return col.isna().to_numpy()
+        if kind != _column_kind(col):
+            return np.zeros(len(col), dtype=bool)  # Mongo never matches across types
+        return (col == value).fillna(False).to_numpy(bool)
+
+    def _condition(self, col: pd.Series, op: str, value: Any) -> np.ndarray:
+        if op == "$eq":
+            return self._equals(col, value)
+        if op == "$ne":
+            return ~self._equals(col, value)
+        if op in ("$in", "$nin"):
+            if not isinstance(value, list):
+                raise Unsupported(f"{op} needs a list")
+            hit = np.zeros(len(col), dtype=bool)
+            same = [v for v in value if _value_kind(v) == _column_kind(col)]
+            if same:
+                hit |= col.isin(same).fillna(False).to_numpy(bool)
+            if None in value:
+                hit |= col.isna().to_numpy()
+            return hit if op == "$in" else ~hit
+        if op == "$exists":
+            return col.notna().to_numpy() if value else col.isna().to_numpy()
+        if op in _COMPARE:
+            kind = _value_kind(value)
+            if kind not in ("number", "string"):
+                raise Unsupported(f"{op} with {value!r}")
+            if kind != _column_kind(col):
+                return np.zeros(len(col), dtype=bool)
+            return _COMPARE[op](col, value).fillna(False).to_numpy(bool)
+        raise Unsupported(f"operator {op}")
+
+    def mask(self, filter_: Optional[Dict[str, Any]]) -> np.ndarray:
+        """Row mask for a Mongo filter: equality, $ne, $gt/$gte/$lt/$lte, $in/$nin, $exists, $and/$or."""
+        mask = np.ones(len(self.frame), dtype=bool)
+        for key, cond in (filter_ or {}).items():
+            if key in ("$and", "$or") and isinstance(cond, list):
+                parts = [self.mask(sub) for sub in cond]
+                if parts:
+                    mask &= np.logical_and.reduce(parts) if key == "$and" else np.logical_or.reduce(parts)
+                elif key == "$or":
+                    mask[:] = False
+            elif key.startswith("$"):
+                raise Unsupported(f"operator {key}")
+            elif isinstance(cond, dict) and cond and all(k.startswith("$") for k in cond):
+                col = self.column(key)
+                for op, value in cond.items():
+                    mask &= self._condition(col, op, value)
+            else:
+                mask &= self._equals(self.column(key), cond)
+        return mask
+
+    def rows(self, filter_: Optional[Dict[str, Any]], fields: Optional[List[str]] = None,
+             limit: int = 100) -> List[Dict[str, Any]]:
+        """Matching rows in _id order (like an unsorted Django page), as plain dicts."""
+        frame = self.frame[self.mask(filter_)].head(limit)
+        if fields:
+            frame = frame[[f for f in fields if f in frame.columns]]
+        frame = frame.astype(object).where(frame.notna(), None)
+        return frame.to_dict("records")
+
+    def summary(self, filter_: Optional[Dict[str, Any]], field: str) -> Dict[str, Any]:
+        """count plus avg/min/max of a numeric field (the same keys as the live $group)."""
+        mask = self.mask(filter_)
+        matched = int(mask.sum())
+        col = self.column(field)
+        if matched == 0:
+            return {"count": 0, f"avg_{field}": 0, f"min_{field}": 0, f"max_{field}": 0}
+        if _column_kind(col) not in ("number", "null"):
+            raise Unsupported(f"{field!r} is not numeric")
+        values = col[mask].dropna()
+        if values.empty:
+            return {"count": matched, f"avg_{field}": None, f"min_{field}": None, f"max_{field}": None}
+        return {"count": matched, f"avg_{field}": float(values.mean()),
+                f"min_{field}": _scalar(values.min()), f"max_{field}": _scalar(values.max())}
+
+    def group(self, filter_: Optional[Dict[str, Any]], by: str, field: str, agg: str) -> List[Dict[str, Any]]:
+        """[{"_id": group, "value": agg(field)}] sorted by group, as {$group} + {$sort: {_id: 1}} returns."""
+        if agg not in AGGREGATIONS:
+            raise Unsupported(f"aggregation {agg}")
+        mask = self.mask(filter_)
+        keys = self.column(by)[mask]
+        if _column_kind(keys) not in ("number", "string", "bool", "null"):
+            raise Unsupported(f"grouping by {by!r}")
+        keys = keys.astype(object).where(keys.notna(), _NULL_GROUP)
+        if agg == "count":
+            result = keys.value_counts(sort=False)
+        else:
+            values = self.column(field)[mask]
+            if _column_kind(values) not in ("number", "null"):
+                raise Unsupported(f"{agg} of non-numeric {field!r}")
+            result = values.astype("float64").groupby(keys, sort=False).agg(AGGREGATIONS[agg])
+        rows = [{"_id": None if k == _NULL_GROUP else _scalar(k), "value": _scalar(v)} for k, v in result.items()]
+        rows.sort(key=lambda r: (r["_id"] is not None, r["_id"] if r["_id"] is not None else 0))
+        return rows
+
+
+class AnalyticsStore:
+    """Snapshots by collection, loaded and caught up in the background (one refresh at a time per collection)."""
+
+    def __init__(self, loader: Loader, collections: Iterable[str] = ANALYTICS_COLLECTIONS,
+                 max_staleness: float = ANALYTICS_MAX_STALENESS, full_refresh: float = ANALYTICS_FULL_REFRESH,
+                 watermark: str = ANALYTICS_WATERMARK, max_rows: int = ANALYTICS_MAX_ROWS,
+                 max_age: Optional[float] = ANALYTICS_MAX_AGE):
+        self.loader = loader
+        self.collections = set(collections)
+        self.max_staleness = max_staleness
+        self.max_age = max_age if max_age is not None else 2 * max_staleness  # never served past this
+        self.full_refresh = full_refresh
+        self.watermark_field = watermark
+        self.max_rows = max_rows
+        self._snapshots: Dict[str, Snapshot] = {}
+        self._refreshing: Dict[str, asyncio.Task] = {}
+        self._missed: Dict[str, str] = {}  # writes seen while a refresh was running
+        self._errors: Dict[str, str] = {}  # last refresh failure, until a refresh succeeds
+        self.hits = 0
+        self.fallbacks = 0
+
+    def covers(self, collection: str) -> bool:
+        return collection in self.collections
+
+    def _fresh(self, snapshot: Optional[Snapshot]) -> bool:
+        return snapshot is not None and snapshot.pending is None and snapshot.age() <= self.max_staleness
+
+    def _unservable(self, collection: str, snapshot: Optional[Snapshot]) -> Optional[str]:
+        """Why a snapshot past its staleness window cannot be served meanwhile (None if it can)."""
+        if snapshot is None or snapshot.pending is not None:
+            return "snapshot is refreshing"
+        if collection in self._errors:
+            return self._errors[collection]
+        if snapshot.age() > self.max_age:
+            return f"snapshot is {snapshot.age():.1f}s old (limit {self.max_age:g}s)"
+        return None
+
+    def _watermark_filter(self, watermark: Any) -> Dict[str, Any]:
+        if watermark is None:
+            return {}
+        if self.watermark_field == "_id":
+            return {"_id": {"$gt": {"$oid": watermark}}}
+        # $gte: rows sharing the watermark timestamp are re-read and deduplicated by _id.
+        return {self.watermark_field: {"$gte": {"$date": watermark}}}
+
+    def _watermark(self, frame: pd.DataFrame) -> Any:
+        if self.watermark_field not in frame or frame.empty:
+            return None
+        return _scalar(frame[self.watermark_field].dropna().max())
+
+    async def _load(self, collection: str, filter_: Dict[str, Any], sort: bool = False) -> pd.DataFrame:
+        docs = []
+        async for doc in self.loader(collection, filter_):
+            docs.append(doc)
+            if len(docs) > self.max_rows:
+                raise Unsupported(f"{collection} has more than {self.max_rows} rows")
+        return await asyncio.to_thread(_sorted_frame if sort else build_frame, docs)
+
+    async def _full_load(self, collection: str) -> Snapshot:
+        frame = await self._load(collection, {}, sort=True)
+        return Snapshot(frame, self._watermark(frame))
+
+    async def _catch_up(self, snapshot: Snapshot, collection: str) -> Snapshot:
+        new = await self._load(collection, self._watermark_filter(snapshot.watermark))
+        if new.empty:
+            snapshot.synced_at = time.monotonic()
+            snapshot.pending = None
+            return snapshot
+        frame = await asyncio.to_thread(_merge, snapshot.frame, new)
+        return Snapshot(frame, self._watermark(frame), loaded_at=snapshot.loaded_at)
+
+    async def _refresh(self, collection: str) -> Snapshot:
+        snapshot = self._snapshots.get(collection)
+        full = (snapshot is None or snapshot.pending == "full"
+                or time.monotonic() - snapshot.loaded_at > self.full_refresh)
+        self._missed.pop(collection, None)
+        try:
+            snapshot = await (self._full_load(collection) if full else self._catch_up(snapshot, collection))
+        except Unsupported as e:
+            self._errors[collection] = str(e)
+            raise
+        except Exception as e:
+            self._errors[collection] = f"snapshot refresh failed: {e}"
+            raise Unsupported(self._errors[collection])
+        finally:
+            del self._refreshing[collection]
+        self._errors.pop(collection, None)
+        # Writes made while it loaded may be missing from the new snapshot.
+        snapshot.pending = self._missed.pop(collection, None)
+        self._snapshots[collection] = snapshot
+        return snapshot
+
+    def _start_refresh(self, collection: str) -> asyncio.Task:
+        task = self._refreshing.get(collection)
+        if task is None:
+            task = self._refreshing[collection] = asyncio.ensure_future(self._refresh(collection))
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())  # failures surface on the next read
+        return task
+
+    async def get(self, collection: str) -> Snapshot:
+        """
+        A snapshot to answer from now. A stale one starts a background refresh and is served
+        meanwhile unless a write through this server made it stale, the last refresh failed or
+        it is past max_age; raises Unsupported when there is none to serve, so the caller
+        queries live.
+        """
+        if not self.covers(collection):
+            raise Unsupported(f"{collection} is not snapshotted")
+        snapshot = self._snapshots.get(collection)
+        if self._fresh(snapshot):
+            return snapshot
+        self._start_refresh(collection)
+        reason = self._unservable(collection, snapshot)
+        if reason:
+            raise Unsupported(f"{collection} {reason}")
+        return snapshot
+
+    async def refresh(self, collection: str) -> Snapshot:
+        """Wait for a refresh (starting one if none is running); raises Unsupported if it fails."""
+        if not self.covers(collection):
+            raise Unsupported(f"{collection} is not snapshotted")
+        snapshot = await asyncio.shield(self._start_refresh(collection))
+        if snapshot.pending is not None:  # a write landed while it ran
+            snapshot = await asyncio.shield(self._start_refresh(collection))
+        return snapshot
+
+    def invalidate(self, collection: str, full: bool = False) -> None:
+        """After a write: catch up on next use, or reload entirely (updates/deletes)."""
+        snapshot = self._snapshots.get(collection)
+        if snapshot is not None and snapshot.pending != "full":
+            snapshot.pending = "full" if full else "catch_up"
+        if collection in self._refreshing and self._missed.get(collection) != "full":
+            self._missed[collection] = "full" if full else "catch_up"
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "collections": sorted(self.collections),
+            "max_staleness_s": self.max_staleness,
+            "max_age_s": self.max_age,
+            "full_refresh_s": self.full_refresh,
+            "watermark": self.watermark_field,
+            "hits": self.hits,
+            "fallbacks": self.fallbacks,
+            "refreshing": sorted(self._refreshing),
+            "refresh_errors": dict(self._errors),
+            "snapshots": {
+                name: {"rows": len(s.frame), "columns": len(s.frame.columns), "age_s": round(s.age(), 2),
+                       "watermark": s.watermark, "pending": s.pending,
+                       "serving": self._fresh(s) or self._unservable(name, s) is None,
+                       "memory_mb": round(float(s.frame.memory_usage(deep=True).sum()) / 2 ** 20, 2)}
+                for name, s in self._snapshots.items()
+            },
+        }
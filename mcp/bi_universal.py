@@ -4,82 +4,341 @@
 from fastmcp import FastMCP
 import os
 import json
-import pandas as pd
-import matplotlib.pyplot as plt
-import uuid
+import asyncio
+import datetime
+import random
+import threading
+import time
+import hashlib
+import io
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
-from typing import Any, Dict, List
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
 import sys
 import re
-import requests
-from urllib.parse import urljoin
+import httpx
+from urllib.parse import quote, urljoin
+from starlette.responses import PlainTextResponse
+
+try:
+    import orjson
+except ImportError:  # optional: faster encoding/decoding of Django API bodies
+    orjson = None
+
+from admission import COALESCE_REQUESTS, AdmissionMiddleware, SingleFlight
+from intents import FILTER_SLOTS, IntentRouter
+from shaping import OUTPUT_MAX_BYTES, HandleStore, fit_rows, format_table, summarize
+from recorder import RecorderMiddleware
+from tracing import (REQUEST_ID_HEADER, SERVER_TIMING_HEADER, TracingMiddleware, current_request_id, endpoint_label,
+                     observe_http, render_metrics)
 
 # ================= STEP 1: Load Environment =================
 load_dotenv()
 
+# pandas and matplotlib cost most of the import time and tens of MB of RSS but only create_plot
+# (and analytics snapshots) need them, so they load on first use (plot_backend) and the server
+# answers its first tool call without them. MCP_WARMUP=true loads them in a background thread
+# at startup instead. Matplotlib is preset to the headless Agg backend either way.
+os.environ.setdefault("MPLBACKEND", "Agg")
+MCP_WARMUP = os.getenv("MCP_WARMUP", "false").lower() in ("1", "true", "yes")
+ANALYTICS_MODE = os.getenv("ANALYTICS_MODE", "off").lower() in ("1", "on", "true", "yes")
+
 # ================= STEP 2: Initialize MCP =================
 mcp = FastMCP("bi-universal")
+mcp.add_middleware(TracingMiddleware())  # correlation IDs + tool latency (see tracing.py, /metrics)
+recorder = RecorderMiddleware()  # opt-in JSONL trace of tool calls for benchmarks/bench_replay.py (MCP_RECORD)
+mcp.add_middleware(recorder)
+admission = AdmissionMiddleware()  # per-tool concurrency limits + "busy" load shedding (admission.py)
+mcp.add_middleware(admission)
 
 # ================= STEP 3: Django API Configuration =================
 ENABLE_DJANGO_API = os.getenv("ENABLE_DJANGO_API", "true").lower() in ("1", "true", "yes")
 DJANGO_API_URL = os.getenv("DJANGO_API_URL", "http://django-api:8001/api")
 
+# Vehicle search: "tokens" (indexed vehicle_tokens array), "text" (text index), "regex" (legacy scan)
+# or "auto": tokens/text once `python manage.py vehicle_index` has backfilled and indexed the
+# collection (it builds the index last), regex until then. The index list is re-checked every
+# VEHICLE_INDEX_CHECK_S seconds.
+VEHICLE_SEARCH_MODE = os.getenv("VEHICLE_SEARCH_MODE", "auto").lower()
+VEHICLE_INDEX_CHECK_S = float(os.getenv("VEHICLE_INDEX_CHECK_S", "60"))
+
 OUTPUT_DIR = "/app/bi_outputs"
 os.makedirs(OUTPUT_DIR, exist_ok=True)
 
-
-def call_django_api(endpoint: str, method: str = "GET", data: dict = None) -> Dict[str, Any]:
-    """Make HTTP requests to Django API (small wrapper)."""
+# Rendered plots are cached in OUTPUT_DIR by content hash and evicted least-recently-used first.
+PLOT_WORKERS = int(os.getenv("PLOT_WORKERS", "2"))
+PLOT_CACHE_MAX_FILES = int(os.getenv("PLOT_CACHE_MAX_FILES", "500"))
+PLOT_CACHE_MAX_BYTES = int(os.getenv("PLOT_CACHE_MAX_MB", "200")) * 2 ** 20
+
+
+# Connection pool: one keep-alive AsyncClient shared by every tool call.
+# All traffic goes to a single Django host, so max_connections is effectively per-host.
+HTTP_MAX_CONNECTIONS = int(os.getenv("DJANGO_API_MAX_CONNECTIONS", "32"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("DJANGO_API_MAX_KEEPALIVE", "16"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("DJANGO_API_KEEPALIVE_EXPIRY", "30"))
+HTTP_GET_RETRIES = int(os.getenv("DJANGO_API_GET_RETRIES", "2"))
+HTTP_RETRY_BACKOFF = float(os.getenv("DJANGO_API_RETRY_BACKOFF", "0.1"))
+
+# Timeouts in seconds: the longest matching endpoint prefix wins, otherwise the method default.
+METHOD_TIMEOUTS = {"GET": 10.0, "POST": 20.0, "PUT": 20.0, "DELETE": 10.0}
+ENDPOINT_TIMEOUTS = {
+    "collections/export/": float(os.getenv("DJANGO_API_EXPORT_TIMEOUT", "120")),
+    "collections/bulk/": float(os.getenv("DJANGO_API_BULK_TIMEOUT", "120")),
+    "collections/multi/": float(os.getenv("DJANGO_API_MULTI_TIMEOUT", "120")),
+}
+RETRYABLE_STATUS = {502, 503, 504}
+
+# Read endpoints whose identical concurrent requests share one round trip (plus every GET).
+COALESCED_POSTS = ("collections/query/", "collections/aggregate/", "collections/multi/")
+_flights = SingleFlight()
+_writes = 0  # bumped when a write starts and again when it returns, so no later read joins an older flight
+
+# Documents per /collections/query/ round trip when paging through results.
+DJANGO_API_PAGE_SIZE = int(os.getenv("DJANGO_API_PAGE_SIZE", "100"))
+
+_http_client: Optional[httpx.AsyncClient] = None
+_http_client_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+if orjson is not None:
+    json_loads = orjson.loads
+
+    def json_body(data: Any) -> bytes:
+        return orjson.dumps(data, default=str)
+else:
+    json_loads = json.loads
+
+    def json_body(data: Any) -> bytes:
+        return json.dumps(data, default=str).encode()
+
+
+def _get_http_client() -> httpx.AsyncClient:
+    """Return the shared AsyncClient, creating it lazily on the running event loop."""
+    global _http_client, _http_client_loop
+    loop = asyncio.get_running_loop()
+    if _http_client is None or _http_client.is_closed or _http_client_loop is not loop:
+        _http_client = httpx.AsyncClient(
+            base_url=DJANGO_API_URL.rstrip("/") + "/",
+            headers={"Content-Type": "application/json"},
+            limits=httpx.Limits(
+                max_connections=HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+                keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+            ),
+        )
+        _http_client_loop = loop
+    return _http_client
+
+
+async def close_http_client() -> None:
+    """Close the shared AsyncClient (used on shutdown and by benchmarks)."""
+    global _http_client, _http_client_loop
+    if _http_client is not None:
+        await _http_client.aclose()
+    _http_client = None
+    _http_client_loop = None
+
+
+def _timeout_for(endpoint: str, method: str) -> float:
+    matches = [p for p in ENDPOINT_TIMEOUTS if endpoint.startswith(p)]
+    if matches:
+        return ENDPOINT_TIMEOUTS[max(matches, key=len)]
+    return METHOD_TIMEOUTS.get(method, 10.0)
+
+
+async def call_django_api(endpoint: str, method: str = "GET", data: dict = None) -> Dict[str, Any]:
+    """Make HTTP requests to Django API over the pooled keep-alive client.
+
+    Only GETs are retried (with full-jitter exponential backoff) since they are idempotent.
+    Identical concurrent reads (GETs and COALESCED_POSTS) share one round trip; each caller
+    still gets its own decoded copy of the response.
+    """
+    global _writes
     if not ENABLE_DJANGO_API:
         return {"error": "Django API disabled (ENABLE_DJANGO_API=false)"}
-    url = urljoin(DJANGO_API_URL.rstrip("/") + "/", endpoint.lstrip("/"))
+    if method not in METHOD_TIMEOUTS:
+        return {"error": f"Unsupported HTTP method: {method}"}
+    endpoint = endpoint.lstrip("/")
+    content = json_body(data) if method in ("POST", "PUT") else None
+    if COALESCE_REQUESTS and (method == "GET" or (method == "POST" and endpoint in COALESCED_POSTS)):
+        result = await _flights.do((_writes, method, endpoint, content),
+                                   lambda: _request_django(endpoint, method, content),
+                                   label=endpoint_label(endpoint))
+    else:
+        # A read that started while the write was in flight may have seen the old data, so
+        # bump again once it returns: reads from then on start their own round trip.
+        _writes += 1
+        try:
+            result = await _request_django(endpoint, method, content)
+        finally:
+            _writes += 1
+    return json_loads(result) if isinstance(result, bytes) else dict(result)
+
+
+async def _request_django(endpoint: str, method: str, content: Optional[bytes]) -> Any:
+    """One request with retries: the raw response body, or an {"error": ...} dict."""
+    url = urljoin(DJANGO_API_URL.rstrip("/") + "/", endpoint)
+    timeout = _timeout_for(endpoint, method)
+    attempts = 1 + (HTTP_GET_RETRIES if method == "GET" else 0)
+    client = _get_http_client()
+    headers = {REQUEST_ID_HEADER: current_request_id()}
+    for attempt in range(attempts):
+        last = attempt == attempts - 1
+        started = time.perf_counter()
+        try:
+            response = await client.request(method, endpoint, content=content, headers=headers, timeout=timeout)
+            observe_http(endpoint, method, response.status_code, started, response.headers.get(SERVER_TIMING_HEADER))
+            if response.status_code in RETRYABLE_STATUS and not last:
+                await asyncio.sleep(random.uniform(0, HTTP_RETRY_BACKOFF * 2 ** attempt))
+                continue
+            response.raise_for_status()
+            return response.content
+        except (httpx.TimeoutException, httpx.ConnectError) as e:
+            observe_http(endpoint, method, "timeout" if isinstance(e, httpx.TimeoutException) else "connect_error", started)
+            if not last:
+                await asyncio.sleep(random.uniform(0, HTTP_RETRY_BACKOFF * 2 ** attempt))
+                continue
+            if isinstance(e, httpx.TimeoutException):
+                return {"error": f"Django API request timeout at {url}"}
+            return {"error": f"Cannot connect to Django API at {url}"}
+        except httpx.HTTPStatusError as e:
+            # Django views report failures as {"error": ...}; surface that message to the caller.
+            try:
+                detail = json_loads(e.response.content).get("error") or str(e)
+            except ValueError:
+                detail = str(e)
+            return {"error": f"Django API request failed: {detail}"}
+        except httpx.HTTPError as e:
+            return {"error": f"Django API request failed: {str(e)}"}
+    return {"error": f"Django API request failed: {url}"}
+
+
+async def stream_django_api(endpoint: str, data: dict, read_timeout: float = None) -> AsyncIterator[Dict[str, Any]]:
+    """POST and yield each NDJSON line of the response as it arrives (raises DjangoAPIError)."""
+    if not ENABLE_DJANGO_API:
+        raise DjangoAPIError("Django API disabled (ENABLE_DJANGO_API=false)")
+    endpoint = endpoint.lstrip("/")
+    timeout = httpx.Timeout(_timeout_for(endpoint, "POST"), read=read_timeout)
+    headers = {REQUEST_ID_HEADER: current_request_id()}
+    started = time.perf_counter()
+    status: Any = "error"
+    server_timing = None
     try:
-        headers = {"Content-Type": "application/json"}
-        if method == "GET":
-            response = requests.get(url, headers=headers, timeout=10)
-        elif method == "POST":
-            response = requests.post(url, json=data, headers=headers, timeout=20)
-        elif method == "PUT":
-            response = requests.put(url, json=data, headers=headers, timeout=20)
-        elif method == "DELETE":
-            response = requests.delete(url, headers=headers, timeout=10)
-        else:
-            return {"error": f"Unsupported HTTP method: {method}"}
-        response.raise_for_status()
-        return response.json()
-    except requests.exceptions.Timeout:
-        return {"error": f"Django API request timeout at {url}"}
-    except requests.exceptions.ConnectionError:
-        return {"error": f"Cannot connect to Django API at {url}"}
-    except requests.exceptions.RequestException as e:
-        return {"error": f"Django API request failed: {str(e)}"}
+        async with _get_http_client().stream("POST", endpoint, content=json_body(data), headers=headers,
+                                             timeout=timeout) as response:
+            status = response.status_code
+            server_timing = response.headers.get(SERVER_TIMING_HEADER)
+            if response.status_code >= 400:
+                await response.aread()
+                try:
+                    detail = json_loads(response.content).get("error")
+                except ValueError:
+                    detail = None
+                raise DjangoAPIError(f"Django API request failed: {detail or response.status_code}")
+            async for line in response.aiter_lines():
+                if line.strip():
+                    yield json_loads(line)
+    except httpx.HTTPError as e:
+        raise DjangoAPIError(f"Django API request failed: {e!r}")
+    finally:
+        observe_http(endpoint, "POST", status, started, server_timing)  # whole stream, first byte to last line
+
+
+class DjangoAPIError(Exception):
+    """Raised by the paging helpers when the Django API returns an error payload."""
+
+
+async def iter_pages(collection: str, filter_: Dict[str, Any] = None, limit: int = 100,
+                     sort: str = None, cursor: str = None,
+                     projection: List[str] = None) -> AsyncIterator[Dict[str, Any]]:
+    """Lazily yield /collections/query/ pages, following `next_cursor` until `limit` docs are read."""
+    remaining = limit
+    while remaining > 0:
+        payload = {"collection": collection, "filter": filter_ or {},
+                   "limit": min(DJANGO_API_PAGE_SIZE, remaining), "sort": sort, "cursor": cursor,
+                   "projection": projection}
+        res = await call_django_api("collections/query/", method="POST", data=payload)
+        if "error" in res:
+            raise DjangoAPIError(res["error"])
+        yield res
+        remaining -= len(res.get("documents", []))
+        cursor = res.get("next_cursor")
+        if not cursor:
+            break
+
+
+async def iter_documents(collection: str, filter_: Dict[str, Any] = None, limit: int = 100,
+                         sort: str = None, projection: List[str] = None) -> AsyncIterator[Dict[str, Any]]:
+    """Yield documents one at a time; stop iterating to avoid fetching further pages."""
+    async for page in iter_pages(collection, filter_, limit, sort=sort, projection=projection):
+        for doc in page.get("documents", []):
+            yield doc
 
 
 # ================= STEP 4: Utilities =================
+# Columns rendered by format_as_table; also the projection smart_command asks Django for.
+TABLE_FIELDS = ["_id", "name", "department", "salary", "city", "joinDate"]
+
+
+def parse_projection(projection: str = None) -> Optional[List[str]]:
+    """Accept a JSON list ('["name", "salary"]') or a comma-separated string ("name,salary")."""
+    if not projection:
+        return None
+    projection = projection.strip()
+    if projection.startswith("["):
+        return [str(f) for f in json.loads(projection)]
+    return [f.strip() for f in projection.split(",") if f.strip()]
+
+
 def format_as_table(docs: List[Dict[str, Any]], keys=None) -> str:
     """Format a list of dicts into a simple markdown table string (unique by name)."""
     if not docs:
         return "No records found."
-    if keys is None:
-        keys = ["_id", "name", "department", "salary", "city", "joinDate"]
-    header = "| " + " | ".join(keys) + " |\n"
-    header += "| " + " | ".join(["---"] * len(keys)) + " |\n"
-    rows = ""
-    seen = set()
-    for d in docs:
-        name = d.get("name", "")
-        if name and name in seen:
-            continue
-        if name:
-            seen.add(name)
-        row = []
-        for k in keys:
-            v = d.get(k, "")
-            if isinstance(v, dict) or isinstance(v, list):
-                v = json.dumps(v, ensure_ascii=False)
-            row.append(str(v))
-        rows += "| " + " | ".join(row) + " |\n"
-    return header + rows
+    return format_table(docs, keys or TABLE_FIELDS)[0]
+
+
+# Rows cut from oversized results, retrievable with the fetch_more tool.
+_result_handles = HandleStore()
+
+
+def shape_rows(res: Dict[str, Any], key: str = "documents", max_bytes: int = OUTPUT_MAX_BYTES) -> Dict[str, Any]:
+    """
+    Keep res[key] within the output budget: the first rows that fit are returned with a
+    summary of all rows and a `handle` for fetch_more; small results pass through untouched.
+    """
+    rows = res.get(key)
+    if not isinstance(rows, list):
+        return res
+    k = fit_rows(rows, max_bytes)
+    if k >= len(rows):
+        return res
+    return {
+        **res,
+        key: rows[:k],
+        "truncated": True,
+        "returned": k,
+        "total_rows": len(rows),
+        "summary": summarize(rows),
+        "handle": _result_handles.put(rows[k:], {"key": key}),
+    }
+
+
+def table_response(docs: List[Dict[str, Any]], keys=None) -> Dict[str, Any]:
+    """{"table": ...} within the output budget, plus summary and handle when rows were left out."""
+    if not docs:
+        return {"table": "No records found."}
+    keys = keys or TABLE_FIELDS
+    table, shown, rest = format_table(docs, keys, OUTPUT_MAX_BYTES)
+    out: Dict[str, Any] = {"table": table}
+    if rest:
+        out.update(
+            truncated=True,
+            returned=len(shown),
+            total_rows=len(shown) + len(rest),
+            summary=summarize(docs),
+            handle=_result_handles.put(rest, {"table_keys": keys}),
+        )
+    return out
 
 
 def _build_vehicle_regex_filter(vehicle_text: str) -> Dict[str, Any]:
@@ -104,60 +363,459 @@ def _build_vehicle_regex_filter(vehicle_text: str) -> Dict[str, Any]:
     return {"$or": or_conditions}
 
 
-# ================= STEP 5: MCP Tools (Django-only data access) =================
+_VEHICLE_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def _build_vehicle_token_filter(vehicle_text: str, mode: str = "tokens") -> Dict[str, Any]:
+    """
+    Index-backed filter on the `vehicle_tokens` array maintained by the Django API:
+    leading words must match exactly and the last word as a prefix ("honda shi" -> Honda Shine).
+    """
+    tokens = _VEHICLE_TOKEN_RE.findall(vehicle_text.lower())
+    if not tokens:
+        return {"vehicle_tokens": {"$exists": True}}
+    if mode == "text":
+        return {"$text": {"$search": " ".join(f'"{t}"' for t in tokens)}}
+    *exact, last = tokens
+    prefix = {"vehicle_tokens": {"$regex": "^" + re.escape(last)}}
+    if not exact:
+        return prefix
+    return {"$and": [{"vehicle_tokens": {"$all": exact}}, prefix]}
+
+
+_vehicle_mode: Dict[str, Any] = {"mode": None, "checked": 0.0}
+
+
+async def vehicle_search_mode(collection: str = "employees") -> str:
+    """VEHICLE_SEARCH_MODE, with "auto" resolved from the collection's vehicle search indexes."""
+    if VEHICLE_SEARCH_MODE != "auto":
+        return VEHICLE_SEARCH_MODE
+    if _vehicle_mode["mode"] is None or time.monotonic() - _vehicle_mode["checked"] > VEHICLE_INDEX_CHECK_S:
+        try:
+            indexes = (await call_django_api(f"collections/{collection}/indexes/", method="GET")).get("indexes") or {}
+        except Exception:
+            indexes = {}
+        _vehicle_mode["mode"] = ("tokens" if "vehicle_tokens_1" in indexes
+                                 else "text" if "vehicle_tokens_text" in indexes else "regex")
+        _vehicle_mode["checked"] = time.monotonic()
+    return _vehicle_mode["mode"]
+
+
+def build_vehicle_filter(vehicle_text: str, mode: str = "tokens") -> Dict[str, Any]:
+    if mode == "regex":
+        return _build_vehicle_regex_filter(vehicle_text)
+    return _build_vehicle_token_filter(vehicle_text, mode)
+
+
+# ================= STEP 5: Typed data access (shared by MCP tools and smart_command) =================
+# Plain async functions over native Python values. The MCP tools below only decode their
+# JSON string arguments and call these; smart_command calls them directly, so composite
+# commands skip JSON re-encoding and tool dispatch.
+async def fetch_documents(collection: str, filter_: Dict[str, Any] = None, limit: int = 100,
+                          sort: str = None, cursor: str = None,
+                          fields: List[str] = None) -> Dict[str, Any]:
+    """Read up to `limit` documents across pages; raises DjangoAPIError on API errors."""
+    docs: List[Dict[str, Any]] = []
+    next_cursor = None
+    async for page in iter_pages(collection, filter_, limit, sort=sort, cursor=cursor, projection=fields):
+        docs.extend(page.get("documents", []))
+        next_cursor = page.get("next_cursor")
+    return {"status": "success", "collection": collection, "documents": docs, "next_cursor": next_cursor}
+
+
+async def run_aggregation(collection: str, pipeline: List[Dict[str, Any]], limit: int = 1000) -> Dict[str, Any]:
+    payload = {"collection": collection, "pipeline": pipeline, "limit": limit}
+    return await call_django_api("collections/aggregate/", method="POST", data=payload)
+
+
+async def insert_one(collection: str, document: Dict[str, Any]) -> Dict[str, Any]:
+    payload = {"collection": collection, "document": document}
+    res = await call_django_api("collections/insert/", method="POST", data=payload)
+    _snapshot_written(collection, full=False)
+    return res
+
+
+async def update_many(collection: str, filter_: Dict[str, Any], update: Dict[str, Any]) -> Dict[str, Any]:
+    payload = {"collection": collection, "filter": filter_, "update": update}
+    res = await call_django_api("collections/update/", method="POST", data=payload)
+    _snapshot_written(collection, full=True)
+    return res
+
+
+async def delete_many(collection: str, filter_: Dict[str, Any]) -> Dict[str, Any]:
+    payload = {"collection": collection, "filter": filter_}
+    res = await call_django_api("collections/delete/", method="POST", data=payload)
+    _snapshot_written(collection, full=True)
+    return res
+
+
+async def bulk_apply(collection: str, ops: List[Dict[str, Any]], chunk_size: int = 1000,
+                     errors_only: bool = False) -> Dict[str, Any]:
+    payload = {
+        "collection": collection,
+        "ops": ops,
+        "chunk_size": chunk_size,
+        "results": "errors" if errors_only else "all",
+    }
+    res = await call_django_api("collections/bulk/", method="POST", data=payload)
+    _snapshot_written(collection, full=any(op.get("op") != "insert" for op in ops))
+    return res
+
+
+async def fan_out(queries: List[Dict[str, Any]], concurrency: int = 8,
+                  timeout_ms: int = 10000) -> Dict[str, Any]:
+    """
+    Run independent queries concurrently via /collections/multi/. Results are collected in
+    completion order; if the stream breaks, what already arrived is returned as partial.
+    """
+    payload = {"queries": queries, "concurrency": concurrency, "timeout_ms": timeout_ms, "stream": True}
+    results: List[Dict[str, Any]] = []
+    error = None
+    try:
+        # Lines arrive as each query finishes, so gaps are bounded by the per-query timeout.
+        async for result in stream_django_api("collections/multi/", payload, read_timeout=timeout_ms / 1000 + 5):
+            results.append(result)
+    except DjangoAPIError as e:
+        if not results:
+            return {"error": str(e)}
+        error = str(e)
+    failed = sum(r.get("status") != "success" for r in results) + len(queries) - len(results)
+    out = {"status": "partial" if failed else "success", "failed": failed, "results": results}
+    if error:
+        out["error"] = error
+    return out
+
+
+async def list_collections() -> Dict[str, Any]:
+    return await call_django_api("collections/", method="GET")
+
+
+async def collection_info(collection: str) -> Dict[str, Any]:
+    return await call_django_api(f"collections/{quote(collection)}/info/", method="GET")
+
+
+# ----- Analytics snapshots (ANALYTICS_MODE=on; see analytics.py) -----
+async def export_documents(collection: str, filter_: Dict[str, Any] = None) -> AsyncIterator[Dict[str, Any]]:
+    """Stream every matching document through /collections/export/ (NDJSON)."""
+    payload = {"collection": collection, "filter": filter_ or {}, "format": "ndjson"}
+    async for doc in stream_django_api("collections/export/", payload):
+        yield doc
+
+
+if ANALYTICS_MODE:
+    from analytics import AnalyticsStore  # imports pandas; only when enabled
+
+    analytics = AnalyticsStore(export_documents)
+else:
+    analytics = None
+
+
+def _snapshot_written(collection: str, full: bool) -> None:
+    if analytics is not None:
+        analytics.invalidate(collection, full=full)
+
+
+async def from_snapshot(collection: str, answer: Callable[[Any], Any]) -> Any:
+    """answer(snapshot) from the in-process snapshot, or None when the caller must query live."""
+    if analytics is None or not analytics.covers(collection):
+        return None
+    from analytics import Unsupported  # already loaded with the store
+
+    try:
+        # Masks and group-bys over a large frame run off the event loop.
+        result = await asyncio.to_thread(answer, await analytics.get(collection))
+    except Unsupported:
+        analytics.fallbacks += 1
+        return None
+    analytics.hits += 1
+    return result
+
+
+# ================= STEP 5b: MCP Tools (Django-only data access) =================
+@mcp.tool()
+async def query_collection(collection: str, filter_dict: str = None, limit: int = 100,
+                           sort: str = None, cursor: str = None, projection: str = None) -> Dict[str, Any]:
+    """
+    Query a collection via Django API, paging through results with resume cursors.
+    Pass the returned `next_cursor` back as `cursor` to continue; `sort` is a field name
+    (prefix "-" for descending). `projection` limits the returned fields, e.g. "name,salary"
+    (fetch only what you need; nested `vehicles` are large).
+    """
+    try:
+        filter_ = json.loads(filter_dict) if filter_dict else {}
+        res = await fetch_documents(collection, filter_, limit, sort=sort, cursor=cursor,
+                                    fields=parse_projection(projection))
+        return shape_rows(res, "documents")
+    except Exception as e:
+        return {"error": str(e)}
+
+
+@mcp.tool()
+async def aggregate_collection(collection: str, pipeline: str, limit: int = 1000) -> Dict[str, Any]:
+    """
+    Run an aggregation pipeline inside MongoDB via Django API (group-bys, counts, averages,
+    percentiles) instead of fetching raw documents. `pipeline` is a JSON list of stages;
+    allowed stages: $match, $group, $project, $sort, $limit, $facet, $bucketAuto.
+    Example: [{"$group": {"_id": "$department", "avg_salary": {"$avg": "$salary"}}}]
+    """
+    try:
+        return shape_rows(await run_aggregation(collection, json.loads(pipeline), limit), "results")
+    except Exception as e:
+        return {"error": str(e)}
+
+
 @mcp.tool()
-def query_collection(collection: str, filter_dict: str = None, limit: int = 100) -> Dict[str, Any]:
-    """Query a collection via Django API (POST)."""
+async def insert_document(collection: str, document: str) -> Dict[str, Any]:
     try:
-        payload = {"collection": collection, "filter": json.loads(filter_dict) if filter_dict else {}, "limit": limit}
-        return call_django_api("collections/query/", method="POST", data=payload)
+        return await insert_one(collection, json.loads(document))
     except Exception as e:
         return {"error": str(e)}
 
 
 @mcp.tool()
-def insert_document(collection: str, document: str) -> Dict[str, Any]:
+async def update_document(collection: str, filter_dict: str, update_dict: str) -> Dict[str, Any]:
     try:
-        payload = {"collection": collection, "document": json.loads(document)}
-        return call_django_api("collections/insert/", method="POST", data=payload)
+        return await update_many(collection, json.loads(filter_dict), json.loads(update_dict))
     except Exception as e:
         return {"error": str(e)}
 
 
 @mcp.tool()
-def update_document(collection: str, filter_dict: str, update_dict: str) -> Dict[str, Any]:
+async def delete_document(collection: str, filter_dict: str) -> Dict[str, Any]:
     try:
-        payload = {"collection": collection, "filter": json.loads(filter_dict), "update": json.loads(update_dict)}
-        return call_django_api("collections/update/", method="POST", data=payload)
+        return await delete_many(collection, json.loads(filter_dict))
     except Exception as e:
         return {"error": str(e)}
 
 
 @mcp.tool()
-def delete_document(collection: str, filter_dict: str) -> Dict[str, Any]:
+async def bulk_write(collection: str, operations: str, chunk_size: int = 1000,
+                     errors_only: bool = False) -> Dict[str, Any]:
+    """
+    Apply many writes in one request. `operations` is a JSON list of
+    {"op": "insert", "document": {...}}, {"op": "update", "filter": {...}, "update": {...}}
+    or {"op": "delete", "filter": {...}} entries (updates/deletes accept "many": false).
+    """
     try:
-        payload = {"collection": collection, "filter": json.loads(filter_dict)}
-        return call_django_api("collections/delete/", method="POST", data=payload)
+        return await bulk_apply(collection, json.loads(operations), chunk_size, errors_only)
     except Exception as e:
         return {"error": str(e)}
 
 
 @mcp.tool()
-def list_collections_via_django() -> Dict[str, Any]:
+async def multi_query(queries: str, concurrency: int = 8, timeout_ms: int = 10000) -> Dict[str, Any]:
+    """
+    Answer several independent questions in one call; the queries run concurrently.
+    `queries` is a JSON list of specs, each with an optional "id" and a "collection" plus one of:
+      {"filter": {...}, "projection": [...], "sort": "-salary", "limit": 10}   (find)
+      {"filter": {...}, "count": true}                                        (count)
+      {"pipeline": [...]}                                                     (aggregation)
+    Example: [{"id": "emp", "collection": "employees", "pipeline": [{"$group": {"_id": "$city",
+    "n": {"$sum": 1}, "avg": {"$avg": "$salary"}}}]}, {"id": "ctr", "collection": "contractors", "count": true}]
+    Each result carries its own status (success/error/timeout); `timeout_ms` applies per query.
+    """
+    try:
+        res = await fan_out(json.loads(queries), concurrency, timeout_ms)
+        results = res.get("results", [])
+        budget = OUTPUT_MAX_BYTES // max(1, len(results))
+        res["results"] = [shape_rows(shape_rows(r, "documents", budget), "results", budget) for r in results]
+        return res
+    except Exception as e:
+        return {"error": str(e)}
+
+
+@mcp.tool()
+async def fetch_more(handle: str) -> Dict[str, Any]:
+    """
+    Continue a truncated result: pass the `handle` from a response that had "truncated": true
+    to get the next rows (another handle is returned if rows still remain).
+    """
+    try:
+        entry = _result_handles.pop(handle)
+        if entry is None:
+            return {"error": "Unknown or expired handle; run the query again."}
+        rows, context = entry
+        if "table_keys" in context:
+            return {"status": "success", **table_response(rows, context["table_keys"])}
+        key = context.get("key", "documents")
+        return shape_rows({"status": "success", key: rows}, key)
+    except Exception as e:
+        return {"error": str(e)}
+
+
+@mcp.tool()
+async def list_collections_via_django() -> Dict[str, Any]:
     """Return the list of collections via Django API."""
-    return call_django_api("collections/", method="GET")
+    return await list_collections()
 
 
 @mcp.tool()
-def get_collection_info_via_django(collection: str) -> Dict[str, Any]:
-    return call_django_api(f"collections/{collection}/info/", method="GET")
+async def get_collection_info_via_django(collection: str) -> Dict[str, Any]:
+    """
+    Schema of a collection: every field path with its types, null rate, cardinality, common
+    values (e.g. all departments) and numeric min/max/histogram. Check it before writing filters.
+    """
+    return await collection_info(collection)
+
+
+@mcp.tool()
+async def manage_indexes(collection: str, action: str = "list", keys: str = None,
+                         name: str = None, unique: bool = False) -> Dict[str, Any]:
+    """
+    Inspect and fix slow queries via the Django index advisor.
+    action: "list" (current indexes), "recommend" (observed slow filter shapes with explain
+    stats and suggested compound indexes), "create" (keys as JSON, e.g. [["department", 1],
+    ["salary", 1]]), or "drop" (by index name).
+    """
+    try:
+        base = f"collections/{collection}/indexes/"
+        if action == "list":
+            return await call_django_api(base, method="GET")
+        if action == "recommend":
+            return await call_django_api(base + "recommend/", method="GET")
+        if action == "create":
+            payload = {"keys": json.loads(keys) if keys else None, "name": name, "unique": unique}
+            return await call_django_api(base, method="POST", data=payload)
+        if action == "drop":
+            if not name:
+                return {"error": "name is required to drop an index"}
+            return await call_django_api(f"{base}?name={quote(name)}", method="DELETE")
+        return {"error": f"Unknown action '{action}' (use list, recommend, create or drop)"}
+    except Exception as e:
+        return {"error": str(e)}
 
 
 # ================= STEP 6: Natural-language command parser =================
+# Intents are feature rules over one parse of the command (see intents.py); register more
+# with @router.intent(...) and, if needed, router.add_phrases({...}) for new vocabulary.
+router = IntentRouter()
+
+
+def _employee_filter(slots: Dict[str, Any]) -> Dict[str, Any]:
+    return {k: slots[k] for k in FILTER_SLOTS if k in slots}
+
+
+async def _employee_table(filter_: Dict[str, Any], limit: int = 200) -> Dict[str, Any]:
+    rows = await from_snapshot("employees", lambda snap: snap.rows(filter_, TABLE_FIELDS, limit))
+    if rows is not None:
+        return {"status": "success", "collection": "employees", "documents": rows, "source": "snapshot"}
+    return await fetch_documents("employees", filter_, limit, fields=TABLE_FIELDS)
+
+
+@router.intent("list_collections", requires={"collection"}, any_of={"list", "show"}, priority=100)
+async def _list_collections_intent(slots: Dict[str, Any]) -> Dict[str, Any]:
+    return await list_collections()
+
+
+@router.intent("who_owns", requires={"own", "slot:vehicle"}, priority=90)
+async def _who_owns_intent(slots: Dict[str, Any]) -> Dict[str, Any]:
+    vehicle_text = slots["vehicle"]
+    # indexed token lookup, or the legacy regex scan until the collection has the token index
+    res = await _employee_table(build_vehicle_filter(vehicle_text, await vehicle_search_mode()))
+    if "error" in res:
+        return {"error": res["error"]}
+    docs = res.get("documents", [])
+    if not docs:
+        return {"status": "success", "message": f"No employees found owning '{vehicle_text}'", "table": "No records found."}
+    return {"status": "success", "vehicle": vehicle_text, **table_response(docs)}
+
+
+COMPARE_KEYS = ["count", "avg_salary", "min_salary", "max_salary"]
+
+
+async def _salary_summary(filter_: Dict[str, Any]) -> Dict[str, Any]:
+    summary = await from_snapshot("employees", lambda snap: snap.summary(filter_, "salary"))
+    if summary is not None:
+        return summary
+    pipeline = [
+        {"$match": filter_},
+        {"$group": {"_id": None, "count": {"$sum": 1}, "avg_salary": {"$avg": "$salary"},
+                    "min_salary": {"$min": "$salary"}, "max_salary": {"$max": "$salary"}}},
+    ]
+    res = await run_aggregation("employees", pipeline)
+    if "error" in res:
+        return res
+    results = res.get("results") or [{}]
+    return {k: results[0].get(k, 0) for k in COMPARE_KEYS}
+
+
+@router.intent("compare_groups", requires={"compare"}, priority=95)
+async def _compare_groups_intent(slots: Dict[str, Any]) -> Dict[str, Any]:
+    if "cities" in slots:
+        field, values = "city", slots["cities"]
+    elif "departments" in slots:
+        field, values = "department", slots["departments"]
+    else:
+        return {"error": "Name two or more cities or departments to compare."}
+    base = {k: v for k, v in _employee_filter(slots).items() if k != field}
+    # One aggregation per group, issued concurrently.
+    summaries = await asyncio.gather(*(_salary_summary({**base, field: v}) for v in values))
+    for s in summaries:
+        if "error" in s:
+            return {"error": s["error"]}
+    rows = [{field: v, **{k: round(s[k], 2) if isinstance(s[k], float) else s[k] for k in COMPARE_KEYS}}
+            for v, s in zip(values, summaries)]
+    return {"status": "success", "compare": field, "filter": base, "groups": rows,
+            "table": format_as_table(rows, keys=[field] + COMPARE_KEYS)}
+
+
+@router.intent("add_employee", requires={"add"}, priority=80)
+async def _add_employee_intent(slots: Dict[str, Any]) -> Dict[str, Any]:
+    if not all(k in slots for k in ("name", "department", "city")):
+        return {"error": "Missing required details (name, department, city)."}
+    salary = slots.get("salary")
+    doc = {
+        "name": slots["name"],
+        "department": slots["department"],
+        "salary": salary if isinstance(salary, (int, float)) else 50000,
+        "city": slots["city"],
+        "joinDate": datetime.datetime.now().isoformat()
+    }
+    return await insert_one("employees", doc)
+
+
+@router.intent("delete_employee", requires={"delete"}, priority=70)
+async def _delete_employee_intent(slots: Dict[str, Any]) -> Dict[str, Any]:
+    if "name" not in slots:
+        return {"error": "Missing employee name."}
+    f = {"name": slots["name"]}
+    if "department" in slots:
+        f["department"] = slots["department"]
+    return await delete_many("employees", f)
+
+
+@router.intent("employees_by_department", requires={"wh", "slot:department"},
+               excludes={"slot:city", "slot:salary"}, priority=60)
+async def _employees_by_department_intent(slots: Dict[str, Any]) -> Dict[str, Any]:
+    dept = slots["department"]
+    res = await _employee_table({"department": dept})
+    if "error" in res:
+        return {"error": res["error"]}
+    docs = res.get("documents", [])
+    if not docs:
+        return {"status": "success", "message": f"No employees found in department '{dept}'", "table": "No records found."}
+    return {"status": "success", "department": dept, **table_response(docs)}
+
+
+@router.intent("find_employees", requires={"has_filter"}, any_of={"show", "list", "wh", "employee"}, priority=50)
+async def _find_employees_intent(slots: Dict[str, Any]) -> Dict[str, Any]:
+    f = _employee_filter(slots)
+    res = await _employee_table(f)
+    if "error" in res:
+        return {"error": res["error"]}
+    return {"filter": f, "status": "success", **table_response(res.get("documents", []))}
+
+
+@router.intent("list_employees", any_of={"list", "show"}, requires={"employee"}, excludes={"has_filter"}, priority=40)
+async def _list_employees_intent(slots: Dict[str, Any]) -> Dict[str, Any]:
+    res = await _employee_table({}, limit=100)
+    return {"status": "success", **table_response(res.get("documents", []))}
+
+
 @mcp.tool()
-def smart_command(command: str) -> Dict[str, Any]:
+async def smart_command(command: str) -> Dict[str, Any]:
     """
-    Natural language handler (improved).
+    Natural language handler.
     Recognized intents (examples):
       - "who owns Honda Shine"
       - "who owns Honda Shine 125"
@@ -165,112 +823,23 @@ def smart_command(command: str) -> Dict[str, Any]:
       - "list employees"
       - "show engineers from Thane with salary above 60000"
       - "add new engineer named Rohan in Pune with salary 85000"
+      - "remove employee named Rohan from Sales"
+      - "compare Pune and Thane salaries"
     """
     try:
-        cmd = (command or "").strip().lower()
-
-        # ---------- 1) list all collections ----------
-        if ("list" in cmd or "show" in cmd) and "collection" in cmd:
-            return mcp.call_tool("list_collections_via_django")
-
-        # ---------- 2) list employees ----------
-        if "list" in cmd and "employee" in cmd:
-            res = mcp.call_tool("query_collection", collection="employees")
-            docs = res.get("documents", [])
-            return {"status": "success", "table": format_as_table(docs)}
-
-        # ---------- 3) who owns <vehicle> ----------
-        m = re.search(r"who (?:owns|has|own) (?:a |an |the )?(.+)", cmd)
-        if m:
-            vehicle_text = m.group(1).strip()
-            # sanitize short trailing punctuation
-            vehicle_text = re.sub(r"[^\w\s\-]", "", vehicle_text)
-            # build a Mongo-style filter searching nested vehicle type fields
-            vehicle_filter = _build_vehicle_regex_filter(vehicle_text)
-            # query via django
-            res = mcp.call_tool("query_collection", collection="employees", filter_dict=json.dumps(vehicle_filter), limit=200)
-            if "error" in res:
-                return {"error": res["error"]}
-            docs = res.get("documents", [])
-            if not docs:
-                return {"status": "success", "message": f"No employees found owning '{vehicle_text}'", "table": "No records found."}
-            return {"status": "success", "vehicle": vehicle_text, "table": format_as_table(docs)}
-
-        # ---------- 4) which employee is from <department> / <dept> ----------
-        m2 = re.search(r"(?:which|who).*\bfrom\b\s+([a-zA-Z0-9_\- ]+)(?:\s+department)?", cmd)
-        if m2 and ("department" in cmd or "dept" in cmd or "which" in cmd or "who" in cmd):
-            dept = m2.group(1).strip().title()
-            f = {"department": dept}
-            res = mcp.call_tool("query_collection", collection="employees", filter_dict=json.dumps(f), limit=200)
-            if "error" in res:
-                return {"error": res["error"]}
-            docs = res.get("documents", [])
-            if not docs:
-                return {"status": "success", "message": f"No employees found in department '{dept}'", "table": "No records found."}
-            return {"status": "success", "department": dept, "table": format_as_table(docs)}
-
-        # ---------- 5) natural filtering: show engineers from Thane with salary above X ----------
-        if "show" in cmd or "find" in cmd or "filter" in cmd:
-            f = {}
-            dep = re.search(r"(engineer|sales|finance|hr|marketing|frappe)", cmd)
-            if dep:
-                f["department"] = dep.group(1).capitalize()
-            city = re.search(r"from\s+([a-zA-Z]+)", cmd)
-            if city:
-                f["city"] = city.group(1).capitalize()
-            sal = re.search(r"(?:above|greater than|over)\s*(\d+)", cmd)
-            if sal:
-                f["salary"] = {"$gt": int(sal.group(1))}
-            res = mcp.call_tool("query_collection", collection="employees", filter_dict=json.dumps(f), limit=200)
-            if "error" in res:
-                return {"error": res["error"]}
-            docs = res.get("documents", [])
-            return {"filter": f, "status": "success", "table": format_as_table(docs)}
-
-        # ---------- 6) add / insert new employee ----------
-        if "add" in cmd or "insert" in cmd or "create" in cmd:
-            name_match = re.search(r"named\s+([a-zA-Z\s]+)", cmd)
-            city_match = re.search(r"in\s+([a-zA-Z]+)", cmd)
-            dept_match = re.search(r"(engineer|sales|finance|hr|marketing|frappe)", cmd)
-            sal_match = re.search(r"salary\s*(\d+)", cmd)
-            if not name_match or not dept_match or not city_match:
-                return {"error": "Missing required details (name, department, city)."}
-            name = name_match.group(1).strip().title()
-            city = city_match.group(1).capitalize()
-            dept = dept_match.group(1).capitalize()
-            salary = int(sal_match.group(1)) if sal_match else 50000
-            doc = {
-                "name": name,
-                "department": dept,
-                "salary": salary,
-                "city": city,
-                "joinDate": pd.Timestamp.now().isoformat()
-            }
-            return mcp.call_tool("insert_document", collection="employees", document=json.dumps(doc))
-
-        # ---------- 7) delete / remove ----------
-        if "remove" in cmd or "delete" in cmd:
-            name_match = re.search(r"(?:named|employee)\s+([a-zA-Z\s]+)", cmd)
-            dept_match = re.search(r"from\s+(?:the\s+)?([a-zA-Z]+)", cmd)
-            if not name_match:
-                return {"error": "Missing employee name."}
-            name = name_match.group(1).strip().title()
-            f = {"name": name}
-            if dept_match:
-                f["department"] = dept_match.group(1).capitalize()
-            return mcp.call_tool("delete_document", collection="employees", filter_dict=json.dumps(f))
-
-        return {"message": "Command not recognized. Try: 'who owns Honda Shine', 'list employees', 'show engineers from Thane above 60000', 'add new engineer named Rohan in Pune with salary 85000'."}
-
+        route = router.route(command)
+        if route is None:
+            return {"message": "Command not recognized. Try: 'who owns Honda Shine', 'list employees', 'show engineers from Thane above 60000', 'add new engineer named Rohan in Pune with salary 85000'."}
+        return await route.handler(route.slots)
     except Exception as e:
         return {"error": str(e)}
 
 
 # ================= STEP 7: Health & helper tools =================
 @mcp.tool()
-def django_health_check() -> Dict[str, Any]:
+async def django_health_check() -> Dict[str, Any]:
     try:
-        res = call_django_api("collections/", method="GET")
+        res = await list_collections()
         if "error" in res:
             return {"status": "unhealthy", "error": res["error"]}
         return {"status": "healthy", "collections": res.get("collections", [])}
@@ -278,24 +847,158 @@ def django_health_check() -> Dict[str, Any]:
         return {"status": "unhealthy", "error": str(e)}
 
 
+@mcp.custom_route("/metrics", methods=["GET"])
+async def metrics(request) -> PlainTextResponse:
+    """Tool and Django HTTP latency histograms in Prometheus text format (HTTP transport only)."""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+
 @mcp.tool()
-def create_plot(data_source: str, x_field: str, y_field: str, chart_type: str = "line") -> Dict[str, Any]:
-    """Generate charts from Django API results (keeps previous plot behavior)."""
+async def analytics_snapshot(refresh: bool = False) -> Dict[str, Any]:
+    """
+    Status of the in-process analytics snapshots (ANALYTICS_MODE=on): rows, age, watermark,
+    memory and how many questions were answered from them vs. sent to Django.
+    refresh=true reloads every snapshotted collection now.
+    """
     try:
-        data = {"collection": data_source, "limit": 500}
-        result = call_django_api("collections/query/", method="POST", data=data)
-        docs = result.get("documents", [])
-        df = pd.DataFrame(docs)
-        if df.empty:
+        if analytics is None:
+            return {"status": "disabled", "hint": "set ANALYTICS_MODE=on to enable"}
+        if refresh:
+            for collection in analytics.collections:
+                analytics.invalidate(collection, full=True)
+                await analytics.refresh(collection)
+        return {"status": "success", **analytics.status()}
+    except Exception as e:
+        return {"error": str(e)}
+
+
+PLOT_AGGREGATIONS = {"sum", "avg", "min", "max", "count"}
+_plot_pool = ThreadPoolExecutor(max_workers=PLOT_WORKERS, thread_name_prefix="plot")
+
+
+def _plot_pipeline(filter_: Dict[str, Any], x_field: str, y_field: str,
+                   agg: str = None, bins: int = None) -> List[Dict[str, Any]]:
+    """Aggregation that reduces the collection to plot-ready rows inside MongoDB."""
+    pipeline = [{"$match": filter_}] if filter_ else []
+    if bins:
+        # Histogram of y_field: one row per bucket, labelled by its range.
+        pipeline.append({"$bucketAuto": {"groupBy": f"${y_field}", "buckets": int(bins)}})
+        return pipeline
+    accumulator = {"$sum": 1} if agg == "count" else {f"${agg}": f"${y_field}"}
+    pipeline += [
+        {"$group": {"_id": f"${x_field}", "value": accumulator}},
+        {"$sort": {"_id": 1}},
+    ]
+    return pipeline
+
+
+def _plot_rows(results: List[Dict[str, Any]], x_field: str, y_field: str, bins: int = None) -> List[Dict[str, Any]]:
+    if bins:
+        return [{x_field: f"{r['_id']['min']}-{r['_id']['max']}", y_field: r["count"]} for r in results]
+    return [{x_field: r["_id"], y_field: r["value"]} for r in results]
+
+
+def _plot_cache_key(*parts: Any) -> str:
+    """Content address: request parameters plus the plotted data itself (the data version)."""
+    blob = json.dumps(parts, sort_keys=True, default=str).encode()
+    return hashlib.sha256(blob).hexdigest()[:24]
+
+
+def _evict_plot_cache() -> None:
+    """Drop least-recently-used plots until the cache fits its file-count and byte budgets."""
+    entries = []
+    for name in os.listdir(OUTPUT_DIR):
+        if name.startswith("plot_") and name.endswith(".png"):
+            try:
+                st = os.stat(os.path.join(OUTPUT_DIR, name))
+            except FileNotFoundError:
+                continue
+            entries.append((st.st_mtime, st.st_size, name))
+    entries.sort()
+    total = sum(size for _, size, _ in entries)
+    while entries and (len(entries) > PLOT_CACHE_MAX_FILES or total > PLOT_CACHE_MAX_BYTES):
+        _, size, name = entries.pop(0)
+        try:
+            os.remove(os.path.join(OUTPUT_DIR, name))
+        except FileNotFoundError:
+            pass
+        total -= size
+
+
+def plot_backend():
+    """(pandas, matplotlib Figure), imported on first use; the import lock makes this thread-safe."""
+    import pandas as pd
+    from matplotlib.figure import Figure  # Agg via MPLBACKEND; the OO API keeps rendering thread-safe
+
+    return pd, Figure
+
+
+def warm_up() -> None:
+    """Import the plotting stack and render one tiny figure (fills matplotlib's font cache)."""
+    _, Figure = plot_backend()
+    Figure(figsize=(1, 1)).savefig(io.BytesIO(), format="png")
+
+
+def _render_plot(rows: List[Dict[str, Any]], x_field: str, y_field: str, kind: str, path: str) -> None:
+    """Render on a private Figure (no pyplot global state), then publish the file atomically."""
+    pd, Figure = plot_backend()
+    fig = Figure(figsize=(10, 6))
+    ax = fig.subplots()
+    pd.DataFrame(rows).plot(x=x_field, y=y_field, kind=kind, ax=ax)
+    fig.tight_layout()
+    tmp_path = f"{path}.{os.getpid()}.{id(fig)}.tmp"
+    fig.savefig(tmp_path, format="png")
+    os.replace(tmp_path, path)
+    _evict_plot_cache()
+
+
+@mcp.tool()
+async def create_plot(data_source: str, x_field: str, y_field: str, chart_type: str = "line",
+                      filter_dict: str = None, agg: str = None, bins: int = None) -> Dict[str, Any]:
+    """
+    Generate charts from Django API results.
+    Set `agg` (sum/avg/min/max/count) to group y_field by x_field inside MongoDB, or `bins`
+    to plot a histogram of y_field bucketed inside MongoDB. Identical requests over unchanged
+    data return the cached image.
+    """
+    try:
+        filter_ = json.loads(filter_dict) if filter_dict else {}
+        kind = chart_type.lower()
+        if agg and agg not in PLOT_AGGREGATIONS:
+            return {"error": f"Unsupported agg '{agg}' (use one of {sorted(PLOT_AGGREGATIONS)})"}
+        if bins:
+            snapshot_rows = None  # histogram buckets always come from MongoDB
+        elif agg:
+            snapshot_rows = await from_snapshot(data_source, lambda snap: snap.group(filter_, x_field, y_field, agg))
+        else:
+            snapshot_rows = await from_snapshot(data_source, lambda snap: snap.rows(filter_, [x_field, y_field], 500))
+        if agg and snapshot_rows is not None:
+            rows = _plot_rows(snapshot_rows, x_field, y_field)
+        elif agg or bins:
+            res = await run_aggregation(data_source, _plot_pipeline(filter_, x_field, y_field, agg, bins))
+            if "error" in res:
+                return {"error": res["error"]}
+            rows = _plot_rows(res.get("results", []), x_field, y_field, bins)
+            if bins and kind == "hist":
+                kind = "bar"  # already binned server-side
+        elif snapshot_rows is not None:
+            rows = [{x_field: r.get(x_field), y_field: r.get(y_field)} for r in snapshot_rows]
+        else:
+            rows = [{x_field: d.get(x_field), y_field: d.get(y_field)}
+                    async for d in iter_documents(data_source, filter_, limit=500,
+                                                  projection=[x_field, y_field])]
+        if not rows:
             return {"error": "No data found"}
-        filename = f"plot_{uuid.uuid4().hex[:8]}.png"
-        path = os.path.join(OUTPUT_DIR, filename)
-        plt.figure(figsize=(10, 6))
-        df.plot(x=x_field, y=y_field, kind=chart_type.lower(), ax=plt.gca())
-        plt.tight_layout()
-        plt.savefig(path)
-        plt.close()
-        return {"file_path": path, "status": "success"}
+
+        key = _plot_cache_key(data_source, filter_, x_field, y_field, kind, agg, bins, rows)
+        path = os.path.join(OUTPUT_DIR, f"plot_{key}.png")
+        if os.path.exists(path):
+            os.utime(path)  # mark as recently used
+            return {"file_path": path, "status": "success", "cached": True}
+        await asyncio.get_running_loop().run_in_executor(
+            _plot_pool, _render_plot, rows, x_field, y_field, kind, path
+        )
+        return {"file_path": path, "status": "success", "cached": False}
     except Exception as e:
         return {"error": str(e)}
 
@@ -304,10 +1007,17 @@ def create_plot(data_source: str, x_field: str, y_field: str, chart_type: str =
 if __name__ == "__main__":
     import argparse
     parser = argparse.ArgumentParser()
-    parser.add_argument("--transport", default="http", help="Transport type (http or stdio)")
+    parser.add_argument("--transport", default="http", choices=["http", "stdio", "sse", "streamable-http"],
+                        help="Transport type (http or stdio)")
     parser.add_argument("--host", default="0.0.0.0", help="Host for HTTP")
     parser.add_argument("--port", type=int, default=8000, help="Port for HTTP")
     args = parser.parse_args()
 
-    print(f"🚀 Starting MCP server (bi-universal) on {args.host}:{args.port}", file=sys.stderr)
-    mcp.run(transport="http", host=args.host, port=args.port)
\ No newline at end of file
+    if MCP_WARMUP:
+        threading.Thread(target=warm_up, name="warm-up", daemon=True).start()
+    if args.transport == "stdio":
+        print("🚀 Starting MCP server (bi-universal) on stdio", file=sys.stderr)
+        mcp.run(transport="stdio", show_banner=False)
+    else:
+        print(f"🚀 Starting MCP server (bi-universal) on {args.host}:{args.port} ({args.transport})", file=sys.stderr)
+        mcp.run(transport=args.transport, host=args.host, port=args.port)
@@ -0,0 +1,284 @@
+"""
+intents.py - Intent routing for smart_command.
+
+A command is tokenized once and walked once against a phrase trie; the same pass records
+intent features ("list", "employee", "own", ...) and fills slots (department, city, salary
+comparator, vehicle, name; "cities"/"departments" when several are named). Intents are declared as feature rules in a registry and the
+winning intent is memoized per feature signature, so routing cost depends on the command
+length, not on how many intents are registered.
+"""
+
+import re
+from typing import Any, Callable, Dict, FrozenSet, Iterable, List, NamedTuple, Optional, Tuple
+
+_THOUSANDS_RE = re.compile(r"(?<=\d),(?=\d{3}\b)")
+_TOKEN_RE = re.compile(r"[<>]=?|\d+\.\d+k?|[a-z0-9][a-z0-9\-']*")
+_NUMBER_RE = re.compile(r"(\d+(?:\.\d+)?)(k)?")
+
+DEPARTMENTS = {
+    "engineer": "Engineer", "engineers": "Engineer", "engineering": "Engineer",
+    "sales": "Sales", "finance": "Finance", "hr": "Hr",
+    "marketing": "Marketing", "frappe": "Frappe",
+}
+CITIES = {"pune": "Pune", "thane": "Thane", "mumbai": "Mumbai", "nashik": "Nashik", "nagpur": "Nagpur"}
+
+# phrase -> (kind, value); multi-word phrases win over their first word (longest match).
+DEFAULT_LEXICON: Dict[str, Tuple[str, Any]] = {
+    **{w: ("verb", "list") for w in ("list", "get all")},
+    **{w: ("verb", "show") for w in ("show", "display", "find", "filter", "search", "get")},
+    **{w: ("verb", "add") for w in ("add", "insert", "create", "hire")},
+    **{w: ("verb", "delete") for w in ("delete", "remove", "fire")},
+    **{w: ("verb", "compare") for w in ("compare", "versus", "vs")},
+    **{w: ("noun", "collection") for w in ("collection", "collections", "table", "tables")},
+    **{w: ("noun", "employee") for w in ("employee", "employees", "staff", "people", "person")},
+    **{w: ("wh", None) for w in ("who", "which", "whoever")},
+    **{w: ("own", None) for w in ("owns", "own", "has", "have", "owning", "drives", "drive")},
+    **{w: ("cmp", "$gt") for w in ("above", "over", "greater than", "more than", "higher than", ">")},
+    **{w: ("cmp", "$lt") for w in ("below", "under", "less than", "lower than", "<")},
+    **{w: ("cmp", "$gte") for w in ("at least", ">=")},
+    **{w: ("cmp", "$lte") for w in ("at most", "<=")},
+    "between": ("cmp", "between"),
+    **{w: ("place", None) for w in ("in", "at", "based in", "located in", "living in")},
+    "from": ("place", "from"),
+    **{w: ("named", None) for w in ("named", "called", "name")},
+    **{w: ("department", None) for w in ("department", "dept", "team")},
+    **{w: ("salary", None) for w in ("salary", "salaries", "earning", "earns", "paid", "pay")},
+    **{w: ("stop", None) for w in ("a", "an", "the", "is", "are", "with", "of", "and", "new", "me",
+                                   "please", "all", "to", "rs", "inr")},
+    **{w: ("dept", v) for w, v in DEPARTMENTS.items()},
+    **{w: ("city", v) for w, v in CITIES.items()},
+}
+
+FILTER_SLOTS = ("department", "city", "salary", "name")
+_NOT_VEHICLE = {"salary", "cmp", "dept", "city", "place", "department"}
+_END = object()  # trie terminal marker
+
+
+class Parse(NamedTuple):
+    features: FrozenSet[str]
+    slots: Dict[str, Any]
+
+
+class Intent(NamedTuple):
+    name: str
+    requires: FrozenSet[str]
+    any_of: FrozenSet[str]
+    excludes: FrozenSet[str]
+    priority: int
+    order: int
+    handler: Optional[Callable]
+
+
+class Route(NamedTuple):
+    intent: str
+    slots: Dict[str, Any]
+    handler: Optional[Callable]
+
+
+def _number(token: str) -> Optional[float]:
+    m = _NUMBER_RE.fullmatch(token)
+    if not m:
+        return None
+    value = float(m.group(1)) * (1000 if m.group(2) else 1)
+    return int(value) if value.is_integer() else value
+
+
+class IntentRouter:
+    """Phrase-trie tokenizer/slot extractor plus a feature-rule intent registry."""
+
+    def __init__(self, lexicon: Dict[str, Tuple[str, Any]] = None, memo_size: int = 4096):
+        self._trie: Dict[Any, Any] = {}
+        self._intents: Dict[str, Intent] = {}
+        self._index: Dict[Optional[str], List[Intent]] = {}
+        self._memo: Dict[FrozenSet[str], Optional[Intent]] = {}
+        self._memo_size = memo_size
+        self.add_phrases(DEFAULT_LEXICON if lexicon is None else lexicon)
+
+    # ---------- registry ----------
+    def add_phrases(self, lexicon: Dict[str, Tuple[str, Any]]) -> None:
+        """Add or override vocabulary, e.g. {"purge": ("verb", "delete"), "navi mumbai": ("city", "Navi Mumbai")}."""
+        for phrase, entry in lexicon.items():
+            node = self._trie
+            for word in _TOKEN_RE.findall(phrase.lower()):
+                node = node.setdefault(word, {})
+            node[_END] = entry
+        self._memo.clear()
+
+    def register(self, name: str, requires: Iterable[str] = (), any_of: Iterable[str] = (),
+                 excludes: Iterable[str] = (), priority: int = 0, handler: Callable = None) -> Intent:
+        """
+        Declare an intent: every feature in `requires`, at least one of `any_of` (if given) and
+        none of `excludes` must be present. Slots show up as "slot:<name>" features, plus
+        "has_filter" when any of department/city/salary/name is set. Highest priority wins.
+        """
+        intent = Intent(name, frozenset(requires), frozenset(any_of), frozenset(excludes),
+                        priority, len(self._intents), handler)
+        if name in self._intents:
+            self.unregister(name)
+        self._intents[name] = intent
+        # Index under one required feature (or each any_of feature) so resolution only
+        # looks at intents that could possibly match the features actually present.
+        keys = [min(intent.requires)] if intent.requires else (sorted(intent.any_of) or [None])
+        for key in keys:
+            self._index.setdefault(key, []).append(intent)
+        self._memo.clear()
+        return intent
+
+    def unregister(self, name: str) -> None:
+        intent = self._intents.pop(name)
+        for bucket in self._index.values():
+            if intent in bucket:
+                bucket.remove(intent)
+        self._memo.clear()
+
+    def intent(self, name: str, **rule) -> Callable:
+        """Decorator form of register() for handlers: @router.intent("list_employees", requires=...)."""
+        def decorator(fn):
+            self.register(name, handler=fn, **rule)
+            return fn
+        return decorator
+
+    @property
+    def intents(self) -> List[Intent]:
+        return sorted(self._intents.values(), key=lambda i: i.order)
+
+    # ---------- parsing ----------
+    def _match(self, words: List[str], i: int) -> Tuple[Optional[Tuple[str, Any]], int]:
+        """Longest lexicon phrase starting at words[i] -> (entry, next index)."""
+        node, entry, end = self._trie, None, i + 1
+        for j in range(i, len(words)):
+            node = node.get(words[j])
+            if node is None:
+                break
+            if _END in node:
+                entry, end = node[_END], j + 1
+        return entry, end
+
+    def parse(self, text: str) -> Parse:
+        """Single pass over the tokens collecting features and slots."""
+        words = _TOKEN_RE.findall(_THOUSANDS_RE.sub("", (text or "").lower()))
+        features = set()
+        slots: Dict[str, Any] = {}
+        cmp_op = None        # comparator waiting for its number(s)
+        between: List[Any] = []
+        salary_ctx = False   # "salary" seen: a bare number is an exact salary
+        place = None         # "from"/"in" seen: the next word is a city or department
+        name_words: Optional[List[str]] = None
+        mentions: Dict[str, List[str]] = {"department": [], "city": []}  # for "compare X and Y"
+
+        def put(slot, value):
+            slots.setdefault(slot, value)
+            if value not in mentions[slot]:
+                mentions[slot].append(value)
+
+        i = 0
+        while i < len(words):
+            entry, end = self._match(words, i)
+            kind, value = entry if entry else (None, None)
+            word = words[i]
+
+            if name_words is not None:
+                if kind is None and _number(word) is None:
+                    name_words.append(word)
+                    i = end
+                    continue
+                if name_words:
+                    slots.setdefault("name", " ".join(name_words).title())
+                name_words = None
+
+            if kind == "own":
+                rest = list(words[end:])
+                while rest and self._match(rest, 0)[0] == ("stop", None):
+                    rest.pop(0)
+                head = self._match(rest, 0)[0] if rest else None
+                # "who has salary above ..." is a filter, not a vehicle owner lookup.
+                if head is None or head[0] not in _NOT_VEHICLE:
+                    features.add("own")
+                    if rest:
+                        slots["vehicle"] = " ".join(rest)
+                    break
+            if kind in ("verb", "noun"):
+                features.add(value)
+                if value == "employee" and features & {"add", "delete"} and "name" not in slots:
+                    nxt = self._match(words, end)[0] if end < len(words) else ("stop", None)
+                    if nxt is None and _number(words[end]) is None:
+                        name_words = []
+            elif kind == "wh":
+                features.add("wh")
+            elif kind == "cmp":
+                cmp_op, between = value, []
+            elif kind == "salary":
+                features.add("salary")
+                salary_ctx = True
+            elif kind == "place":
+                place = value or "in"
+            elif kind == "named":
+                name_words = []
+            elif kind == "department":
+                features.add("department")
+            elif kind == "dept":
+                # A department word is never a city, even right after "from"/"in".
+                put("department", value)
+                place = None
+            elif kind == "city":
+                put("city", value)
+                place = None
+            elif kind is None:
+                number = _number(word)
+                if number is not None:
+                    if cmp_op == "between":
+                        between.append(number)
+                        if len(between) == 2:
+                            slots["salary"] = {"$gte": min(between), "$lte": max(between)}
+                            cmp_op = None
+                    elif cmp_op:
+                        slots["salary"] = {cmp_op: number}
+                        cmp_op = None
+                    elif salary_ctx and "salary" not in slots:
+                        slots["salary"] = number
+                elif place:
+                    follows = self._match(words, end)[0] if end < len(words) else None
+                    # "who is from Acme" / "remove X from Acme" name a department, as does
+                    # "... in the Acme dept"; otherwise an unknown place is a city.
+                    if (follows and follows[0] == "department") or (
+                            place == "from" and features & {"wh", "delete"}):
+                        put("department", word.title())
+                    else:
+                        put("city", word.capitalize())
+                    place = None
+            i = end
+
+        if name_words:
+            slots.setdefault("name", " ".join(name_words).title())
+        for slot, plural in (("department", "departments"), ("city", "cities")):
+            if len(mentions[slot]) > 1:
+                slots[plural] = mentions[slot]
+        features.update(f"slot:{k}" for k in slots)
+        if any(k in slots for k in FILTER_SLOTS):
+            features.add("has_filter")
+        return Parse(frozenset(features), slots)
+
+    # ---------- routing ----------
+    def _resolve(self, signature: FrozenSet[str]) -> Optional[Intent]:
+        if signature in self._memo:
+            return self._memo[signature]
+        best = None
+        candidates = {i.name: i for key in (*signature, None) for i in self._index.get(key, ())}
+        for intent in candidates.values():
+            if not intent.requires <= signature or intent.excludes & signature:
+                continue
+            if intent.any_of and not intent.any_of & signature:
+                continue
+            if best is None or (intent.priority, -intent.order) > (best.priority, -best.order):
+                best = intent
+        if len(self._memo) >= self._memo_size:
+            self._memo.clear()
+        self._memo[signature] = best
+        return best
+
+    def route(self, text: str) -> Optional[Route]:
+        parsed = self.parse(text)
+        intent = self._resolve(parsed.features)
+        if intent is None:
+            return None
+        return Route(intent.name, parsed.slots, intent.handler)
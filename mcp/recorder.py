@@ -0,0 +1,89 @@
+"""
+recorder.py - Opt-in JSONL trace of MCP tool calls, for replaying real workloads.
+
+With MCP_RECORD=/path/trace.jsonl every tool call appends one line when it finishes:
+
+    {"ts": 1760700000.123, "tool": "smart_command", "args": {"command": "..."}, "status": "ok",
+     "ms": 41.2, "stages": {"django_http_ms": 35.0, "django_view_ms": 30.1, "mongo_ms": 12.4,
+     "django_requests": 1}, "request_id": "..."}
+
+`ts` is when the call started, so the gaps between lines are the workload's real pacing. `ms` is
+the whole call as the middleware below the tracer sees it, including any admission queueing.
+`stages` breaks it down (see tracing.py). benchmarks/bench_replay.py replays such a trace.
+Arguments are written as sent, which for insert/update tools means user data, so keep traces
+out of shared storage. Other code (e.g. the replay benchmark) can subscribe with add_sink().
+"""
+
+import json
+import os
+import sys
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from fastmcp.server.middleware import Middleware
+
+from tracing import call_status, request_id, stages
+
+MCP_RECORD = os.getenv("MCP_RECORD", "")
+
+
+class RecorderMiddleware(Middleware):
+    """Hand a record of every tool call to each sink; a pass-through when there are none."""
+
+    def __init__(self, path: Optional[str] = MCP_RECORD or None):
+        self.path = path
+        self.recorded = 0
+        self._sinks: List[Callable[[Dict[str, Any]], None]] = []
+        self._file = None
+        if path:
+            self._file = open(path, "a", buffering=1, encoding="utf-8")  # line-buffered: one write per call
+            self.add_sink(lambda record: self._file.write(json.dumps(record, default=str) + "\n"))
+
+    def add_sink(self, sink: Callable[[Dict[str, Any]], None]) -> None:
+        self._sinks.append(sink)
+
+    def remove_sink(self, sink: Callable[[Dict[str, Any]], None]) -> None:
+        self._sinks.remove(sink)
+
+    async def on_call_tool(self, context, call_next):
+        if not self._sinks:
+            return await call_next(context)
+        ts = time.time()
+        started = time.perf_counter()
+        status = "exception"
+        try:
+            result = await call_next(context)
+            status = call_status(result)
+            return result
+        finally:
+            self._emit({
+                "ts": round(ts, 3),
+                "tool": context.message.name,
+                "args": context.message.arguments or {},
+                "status": status,
+                "ms": round((time.perf_counter() - started) * 1000, 3),
+                "stages": stage_breakdown(stages.get()),
+                "request_id": request_id.get(),
+            })
+
+    def _emit(self, record: Dict[str, Any]) -> None:
+        self.recorded += 1
+        for sink in list(self._sinks):
+            try:
+                sink(record)
+            except Exception as e:  # a broken sink must never fail the tool call
+                print(f"⚠️ Call recorder sink failed: {e}", file=sys.stderr)
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def stage_breakdown(spent: Optional[Dict[str, float]]) -> Dict[str, Any]:
+    """Stage seconds from tracing.stages -> rounded milliseconds, plus the Django request count."""
+    spent = spent or {}
+    out: Dict[str, Any] = {f"{name}_ms": round(spent.get(name, 0.0) * 1000, 3)
+                           for name in ("django_http", "django_view", "mongo")}
+    out["django_requests"] = int(spent.get("django_requests", 0))
+    return out
@@ -0,0 +1,135 @@
+"""
+shaping.py - Keep tool outputs small enough for the model's context.
+
+Results are cut to the rows that fit a byte budget (about OUTPUT_BYTES_PER_TOKEN bytes per
+token); the rest are parked behind an opaque handle for the `fetch_more` tool, and a compact
+summary (row count, distinct values, numeric aggregates) computed over *all* rows is attached
+so the model can still answer "how many" / "what range" questions without paging.
+"""
+
+import json
+import os
+import secrets
+import threading
+import time
+from collections import Counter, OrderedDict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+OUTPUT_TOKEN_BUDGET = int(os.getenv("OUTPUT_TOKEN_BUDGET", "4000"))
+OUTPUT_BYTES_PER_TOKEN = float(os.getenv("OUTPUT_BYTES_PER_TOKEN", "4"))
+OUTPUT_MAX_BYTES = int(OUTPUT_TOKEN_BUDGET * OUTPUT_BYTES_PER_TOKEN)
+OUTPUT_MIN_ROWS = int(os.getenv("OUTPUT_MIN_ROWS", "5"))
+OUTPUT_HANDLE_TTL = float(os.getenv("OUTPUT_HANDLE_TTL", "900"))
+OUTPUT_HANDLE_MAX = int(os.getenv("OUTPUT_HANDLE_MAX", "256"))
+SUMMARY_MAX_FIELDS = 25
+SUMMARY_TOP_VALUES = 5
+SUMMARY_MAX_DISTINCT = 1000
+
+
+def _cell(value: Any) -> str:
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False, default=str)
+    return str(value).replace("|", "\\|").replace("\n", " ")
+
+
+def row_size(row: Any) -> int:
+    return len(json.dumps(row, ensure_ascii=False, default=str, separators=(",", ":")).encode())
+
+
+def fit_rows(rows: Sequence[Any], max_bytes: int = OUTPUT_MAX_BYTES, min_rows: int = OUTPUT_MIN_ROWS) -> int:
+    """How many leading rows fit in `max_bytes` (never fewer than `min_rows`)."""
+    used = 0
+    for i, row in enumerate(rows):
+        used += row_size(row) + 1
+        if used > max_bytes and i >= min_rows:
+            return i
+    return len(rows)
+
+
+def format_table(docs: Sequence[Dict[str, Any]], keys: Sequence[str],
+                 max_bytes: Optional[int] = None) -> Tuple[str, List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """
+    Markdown table of `docs` (rows with a repeated "name" are dropped), built with str.join.
+    Returns (table, rows shown, rows left out because of `max_bytes`).
+    """
+    header = "| " + " | ".join(keys) + " |\n| " + " | ".join(["---"] * len(keys)) + " |\n"
+    lines: List[str] = []
+    shown: List[Dict[str, Any]] = []
+    rest: List[Dict[str, Any]] = []
+    seen = set()
+    used = len(header)
+    for d in docs:
+        name = d.get("name", "")
+        if name:
+            if name in seen:
+                continue
+            seen.add(name)
+        if rest:
+            rest.append(d)
+            continue
+        line = "| " + " | ".join(_cell(d.get(k, "")) for k in keys) + " |"
+        used += len(line) + 1
+        if max_bytes is not None and used > max_bytes and len(lines) >= OUTPUT_MIN_ROWS:
+            rest.append(d)
+            continue
+        lines.append(line)
+        shown.append(d)
+    return header + "\n".join(lines) + ("\n" if lines else ""), shown, rest
+
+
+def summarize(rows: Sequence[Dict[str, Any]]) -> Dict[str, Any]:
+    """Count, per-field distinct counts/top values, and min/max/mean of numeric fields."""
+    fields: Dict[str, Dict[str, Any]] = {}
+    for row in rows:
+        if not isinstance(row, dict):
+            continue
+        for key, value in row.items():
+            if key == "_id":
+                continue
+            f = fields.get(key)
+            if f is None:
+                if len(fields) >= SUMMARY_MAX_FIELDS:
+                    continue
+                f = fields[key] = {"present": 0, "values": Counter(), "nums": []}
+            f["present"] += 1
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                f["nums"].append(value)
+            elif isinstance(value, (str, bool)) and (value in f["values"] or len(f["values"]) < SUMMARY_MAX_DISTINCT):
+                f["values"][value] += 1
+    out: Dict[str, Any] = {}
+    for key, f in fields.items():
+        s: Dict[str, Any] = {"present": f["present"]}
+        if f["nums"]:
+            nums = f["nums"]
+            s.update(min=min(nums), max=max(nums), mean=round(sum(nums) / len(nums), 2))
+        if f["values"]:
+            s["distinct"] = len(f["values"])
+            if len(f["values"]) < f["present"]:  # skip unique-per-row fields such as names
+                s["top"] = f["values"].most_common(SUMMARY_TOP_VALUES)
+        out[key] = s
+    return {"count": len(rows), "fields": out}
+
+
+class HandleStore:
+    """TTL + LRU store of left-over rows (and how to fetch more) keyed by opaque handles."""
+
+    def __init__(self, max_handles: int = OUTPUT_HANDLE_MAX, ttl: float = OUTPUT_HANDLE_TTL):
+        self.max_handles = max_handles
+        self.ttl = ttl
+        self._data: "OrderedDict[str, Tuple[float, List[Any], Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def put(self, rows: List[Any], context: Dict[str, Any] = None) -> str:
+        handle = secrets.token_urlsafe(9)
+        with self._lock:
+            self._data[handle] = (time.monotonic() + self.ttl, list(rows), dict(context or {}))
+            while len(self._data) > self.max_handles:
+                self._data.popitem(last=False)
+        return handle
+
+    def pop(self, handle: str) -> Optional[Tuple[List[Any], Dict[str, Any]]]:
+        with self._lock:
+            entry = self._data.pop(handle, None)
+        if entry is None or entry[0] < time.monotonic():
+            return None
+        return entry[1], entry[2]
@@ -0,0 +1,179 @@
+"""
+tracing.py - Correlation IDs and latency metrics for the MCP server.
+
+Each tool call gets a correlation ID that call_django_api forwards as X-Request-ID, so one ID
+ties a tool call to the Django view and Mongo commands it caused (the Django API echoes it and
+puts it in its slow-query log). Tool time and Django HTTP time are recorded in histograms served
+as Prometheus text at /metrics. Each call also adds up the time it spent per stage (Django round
+trips, plus the view and Mongo time Django reports in Server-Timing) for the call recorder.
+"""
+
+import contextvars
+import os
+import re
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from fastmcp.server.middleware import Middleware
+
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "true").lower() in ("1", "true", "yes")
+REQUEST_ID_HEADER = "X-Request-ID"
+SERVER_TIMING_HEADER = "Server-Timing"
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+request_id: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("request_id", default=None)
+# Seconds per stage spent by the current tool call, plus the number of Django requests it made.
+stages: contextvars.ContextVar[Optional[Dict[str, float]]] = contextvars.ContextVar("stages", default=None)
+
+# Server-Timing metric names from the Django API -> stage names.
+SERVER_TIMING_STAGES = {"view": "django_view", "mongo": "mongo"}
+
+# collections/<name>/info/ -> collections/{name}/info/ so metric labels stay bounded.
+_COLLECTION_PATH_RE = re.compile(r"^collections/(?!(?:query|aggregate|multi|insert|update|delete|bulk|export)/)[^/]+/")
+
+
+def endpoint_label(endpoint: str) -> str:
+    return _COLLECTION_PATH_RE.sub("collections/{name}/", endpoint.split("?", 1)[0])
+
+
+def new_request_id() -> str:
+    return uuid.uuid4().hex
+
+
+def current_request_id() -> str:
+    """The active correlation ID, or a fresh one for calls made outside a tool."""
+    return request_id.get() or new_request_id()
+
+
+class Histogram:
+    """Per-label-set latency histogram rendered in the Prometheus text format."""
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str], buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._series: Dict[Tuple[Any, ...], List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values: Any) -> None:
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> str:
+        out = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted(self._series.items(), key=lambda kv: tuple(map(str, kv[0])))
+        for values, series in items:
+            base = ",".join(f'{k}="{v}"' for k, v in zip(self.labels, values))
+            sep = "," if base else ""
+            for bound, count in zip(self.buckets, series):
+                out.append(f'{self.name}_bucket{{{base}{sep}le="{bound}"}} {count}')
+            out.append(f'{self.name}_bucket{{{base}{sep}le="+Inf"}} {series[-1]}')
+            out.append(f"{self.name}_sum{{{base}}} {series[-2]:.6f}")
+            out.append(f"{self.name}_count{{{base}}} {series[-1]}")
+        return "\n".join(out)
+
+
+class Counter:
+    """Monotonic per-label-set counter rendered in the Prometheus text format."""
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str]):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self._values: Dict[Tuple[Any, ...], int] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values: Any, amount: int = 1) -> None:
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self) -> str:
+        out = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items(), key=lambda kv: tuple(map(str, kv[0])))
+        for values, count in items:
+            labels = ",".join(f'{k}="{v}"' for k, v in zip(self.labels, values))
+            out.append(f"{self.name}{{{labels}}} {count}")
+        return "\n".join(out)
+
+
+tool_seconds = Histogram("mcp_tool_seconds", "MCP tool call latency.", ("tool", "status"))
+http_seconds = Histogram("mcp_django_http_seconds", "Django API round trips from the MCP server.",
+                         ("endpoint", "method", "status"))
+METRICS = [tool_seconds, http_seconds]
+
+
+def register(metric):
+    """Add a metric defined elsewhere (e.g. admission.py) to the /metrics output."""
+    METRICS.append(metric)
+    return metric
+
+
+def render_metrics() -> str:
+    return "\n".join(m.render() for m in METRICS) + "\n"
+
+
+def observe_http(endpoint: str, method: str, status: Any, started: float, server_timing: Optional[str] = None) -> None:
+    elapsed = time.perf_counter() - started
+    if TRACING_ENABLED:
+        http_seconds.observe(elapsed, endpoint_label(endpoint), method, status)
+    spent = stages.get()
+    if spent is not None:
+        spent["django_http"] = spent.get("django_http", 0.0) + elapsed
+        spent["django_requests"] = spent.get("django_requests", 0) + 1
+        for name, seconds in parse_server_timing(server_timing).items():
+            stage = SERVER_TIMING_STAGES.get(name)
+            if stage:
+                spent[stage] = spent.get(stage, 0.0) + seconds
+
+
+def parse_server_timing(header: Optional[str]) -> Dict[str, float]:
+    """'view;dur=12.5, mongo;dur=3.1' -> {"view": 0.0125, "mongo": 0.0031}; unparsable entries are skipped."""
+    timings = {}
+    for entry in (header or "").split(","):
+        name, *params = entry.strip().split(";")
+        for param in params:
+            key, _, value = param.strip().partition("=")
+            if key == "dur":
+                try:
+                    timings[name] = float(value) / 1000
+                except ValueError:
+                    pass
+    return timings
+
+
+def call_status(result: Any) -> str:
+    """ok, error or busy, from a tool result's structured content."""
+    content = getattr(result, "structured_content", None)
+    if isinstance(content, dict) and "error" in content:
+        return "busy" if content.get("busy") else "error"
+    return "ok"
+
+
+class TracingMiddleware(Middleware):
+    """Give each tool call a correlation ID and time it (status "error"/"busy" when it returns one)."""
+
+    async def on_call_tool(self, context, call_next):
+        tokens = request_id.set(new_request_id()), stages.set({})
+        started = time.perf_counter()
+        status = "exception"
+        try:
+            result = await call_next(context)
+            status = call_status(result)
+            return result
+        finally:
+            request_id.reset(tokens[0])
+            stages.reset(tokens[1])
+            if TRACING_ENABLED:
+                tool_seconds.observe(time.perf_counter() - started, context.message.name, status)